@@ -0,0 +1,247 @@
+# bench.py
+"""
+Offline benchmarks for the translation pipeline.
+
+The LLM is replaced by a fake generation function with a fixed latency, through the llm_generation
+hook of ChapterTranslator, and the Hebrew comes from the chapters in saved_translations_json.
+Nothing touches the network.
+
+Results are written as JSON to benchmarks/results/<commit>.json, and two result files can be compared:
+    python benchmarks/bench.py
+    python benchmarks/bench.py --compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+from sefaria_translation.chapter_translator import ChapterTranslator
+from sefaria_translation.corpus_reader import chapter_files, read_corpus
+from sefaria_translation.sefaria_api.fetch_sefaria_text import clean_text
+from sefaria_translation.text_reference import ChapterReference
+from sefaria_translation.translation_prompt import ContextPolicy
+from sefaria_translation.translation_store import StoredChapter, TranslationStore
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURE_DIR = ROOT / "saved_translations_json" / "pardes_rimmonim"
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+TITLE = "Pardes_Rimmonim"
+
+# A slower result than this ratio of the old one is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+@dataclass
+class BenchResult:
+    name: str
+    seconds: float  # Median over the repeats
+    items: int  # Work done per repeat, in `unit`
+    unit: str
+
+    @property
+    def per_second(self) -> float:
+        return self.items / self.seconds if self.seconds else float("inf")
+
+
+def measure(
+    name: str, fn: Callable[[], Any], items: int, unit: str, repeat: int = 5
+) -> BenchResult:
+    times: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    result = BenchResult(name, statistics.median(times), items, unit)
+    print(f"{name:<40} {result.seconds * 1000:9.2f} ms  {result.per_second:12.1f} {unit}/s")
+    return result
+
+
+def load_fixtures() -> list[tuple[ChapterReference, list[str]]]:
+    """The Hebrew of every saved chapter, largest first"""
+    fixtures = []
+    for chapter_file in chapter_files(FIXTURE_DIR, TITLE):
+        ref = ChapterReference(TITLE, chapter_file.section_num, chapter_file.chapter_num)
+        ref.section_name = "Gate"
+        fixtures.append((ref, [hebrew for hebrew, _ in chapter_file.passages]))
+    return sorted(fixtures, key=lambda fixture: len(fixture[1]), reverse=True)
+
+
+def fake_generation(latency: float) -> Callable[[str], str]:
+    """Stands in for the LLM: waits like a network call, then answers with a fixed translation"""
+
+    def generation(prompt: str) -> str:
+        time.sleep(latency)
+        return "A fixed English translation of the passage."
+
+    return generation
+
+
+def bench_prompts(fixtures: list[tuple[ChapterReference, list[str]]]) -> list[BenchResult]:
+    ref, chapter = fixtures[0]
+    results = []
+    for label, policy in [
+        ("full", ContextPolicy()),
+        ("window", ContextPolicy(window=10, full_chapter_max_tokens=0)),
+        ("token budget", ContextPolicy(token_budget=5_000, full_chapter_max_tokens=0)),
+    ]:
+        translator = ChapterTranslator(ref, chapter, context_policy=policy)
+        results.append(
+            measure(
+                f"prompt construction ({label})",
+                lambda: [translator.passage_prompt(n) for n in range(1, len(chapter) + 1)],
+                len(chapter),
+                "prompts",
+            )
+        )
+    return results
+
+
+def bench_throughput(
+    fixtures: list[tuple[ChapterReference, list[str]]], latency: float
+) -> list[BenchResult]:
+    ref, chapter = fixtures[0]
+    results = []
+    for concurrency in (1, 2, 4, 8, 16):
+
+        def translate() -> None:
+            translator = ChapterTranslator(ref, chapter, fake_generation(latency))
+            with contextlib.redirect_stdout(io.StringIO()):
+                translator.translate_chapter(concurrency)
+
+        results.append(
+            measure(
+                f"translate chapter (concurrency {concurrency})",
+                translate,
+                len(chapter),
+                "passages",
+                repeat=3,
+            )
+        )
+    return results
+
+
+def bench_save_load() -> list[BenchResult]:
+    chapters = [
+        StoredChapter(TITLE, chapter_file.section_num, chapter_file.chapter_num, chapter_file.passages)
+        for chapter_file in chapter_files(FIXTURE_DIR, TITLE)
+    ]
+    passages = sum(len(chapter.passages) for chapter in chapters)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "json"
+        json_dir.mkdir()
+
+        def save_json() -> None:
+            for chapter in chapters:
+                path = json_dir / f"{TITLE.lower()}_{chapter.section_num}_{chapter.chapter_num}.json"
+                path.write_text(
+                    json.dumps(chapter.to_legacy_json(), ensure_ascii=False, indent=2),
+                    encoding="utf-8",
+                )
+
+        results.append(measure("json save (legacy layout)", save_json, passages, "passages"))
+        results.append(
+            measure("json load (read_corpus)", lambda: read_corpus(json_dir, TITLE), passages, "passages")
+        )
+        store = TranslationStore(Path(tmp) / "translations.sqlite3")
+        results.append(
+            measure("store save (one transaction)", lambda: store.save_chapters(chapters), passages, "passages")
+        )
+        results.append(
+            measure("store load (load_title)", lambda: store.load_title(TITLE), passages, "passages")
+        )
+        store.close()
+    return results
+
+
+def bench_clean_text(fixtures: list[tuple[ChapterReference, list[str]]]) -> list[BenchResult]:
+    chapters = [chapter for _, chapter in fixtures]
+    passages = sum(len(chapter) for chapter in chapters)
+    return [
+        measure(
+            "clean_text (all fixtures)",
+            lambda: [clean_text(chapter) for chapter in chapters],
+            passages,
+            "passages",
+        )
+    ]
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(latency: float) -> Path:
+    fixtures = load_fixtures()
+    results = (
+        bench_prompts(fixtures)
+        + bench_throughput(fixtures, latency)
+        + bench_save_load()
+        + bench_clean_text(fixtures)
+    )
+    commit = current_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fake_latency": latency,
+        "results": {
+            result.name: {**asdict(result), "per_second": result.per_second}
+            for result in results
+        },
+    }
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{commit}.json"
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nWrote {path}")
+    return path
+
+
+def compare(old_path: Path, new_path: Path) -> int:
+    """Prints the change of every benchmark. Returns the number of regressions."""
+    old = json.loads(old_path.read_text(encoding="utf-8"))
+    new = json.loads(new_path.read_text(encoding="utf-8"))
+    regressions = 0
+    print(f"{old['commit']} -> {new['commit']}")
+    for name, result in new["results"].items():
+        if name not in old["results"]:
+            print(f"{name:<40} new")
+            continue
+        ratio = result["seconds"] / old["results"][name]["seconds"]
+        flag = ""
+        if ratio > REGRESSION_RATIO:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<40} {ratio:6.2f}x time{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"))
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="Seconds the fake LLM waits per call"
+    )
+    args = parser.parse_args()
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+    run(args.latency)
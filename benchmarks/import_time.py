@@ -0,0 +1,71 @@
+# import_time.py
+"""
+Startup time of the package: how long importing each entry module takes in a fresh interpreter,
+and which heavy third party packages it loads. Nothing here needs an API key or the network.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 100 sefaria_translation.cli
+
+Exits 1 if any module is over the budget.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODULES = [
+    "sefaria_translation.cli",
+    "sefaria_translation.work_planner",
+    "sefaria_translation.translation_store",
+    "sefaria_translation.site_builder",
+    "sefaria_translation.chapter_translator",
+    "sefaria_translation.rimmonim_translation",
+]
+HEAVY_PACKAGES = ["anthropic", "pydantic", "requests", "numpy"]
+
+# Run in the child interpreter: prints the import time in seconds and the heavy packages it loaded
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps([time.perf_counter() - start, [name for name in {heavy!r} if name in sys.modules]]))
+"""
+
+
+def import_time(module: str, repeat: int) -> tuple[float, list[str]]:
+    """Median seconds to import a module in a fresh interpreter, and the heavy packages it loads"""
+    times: list[float] = []
+    loaded: list[str] = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_PACKAGES)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        seconds, loaded = json.loads(output.strip().splitlines()[-1])
+        times.append(seconds)
+    return statistics.median(times), loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, help="Fail if a module takes longer than this to import")
+    args = parser.parse_args()
+
+    over_budget = 0
+    for module in args.modules:
+        seconds, loaded = import_time(module, args.repeat)
+        flag = ""
+        if args.budget_ms is not None and seconds * 1000 > args.budget_ms:
+            flag = "  OVER BUDGET"
+            over_budget += 1
+        print(f"{module:<44} {seconds * 1000:8.1f} ms  loads: {', '.join(loaded) or '-'}{flag}")
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,236 @@
+# batch_translation.py
+"""
+Offline bulk translation through the Anthropic Message Batches API.
+
+Usage:
+    job = submit_gates([21, 27])   # Submits every pending passage prompt and saves the batch ids
+    ...                            # Later, possibly from a new process
+    resume_batch(BatchJob.from_file(job_path))
+
+Results are keyed by a hash of the prompt, so BatchResults can stand in for the llm_generation
+callable of a ChapterTranslator and the normal translate/save path is reused unchanged.
+Prompts are always one passage per request; packing is not used for batches.
+"""
+import hashlib
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal, Optional
+from pydantic import Field
+from sefaria_translation.chapter_translator import ChapterTranslator
+from sefaria_translation.claude import MODEL, message_metadata, message_params, response_text
+from sefaria_translation.rimmonim_translation import (
+    chapter_ref,
+    check_translation_exists,
+    context_policy,
+    fetch_gate,
+    save_chapter_translation,
+)
+from sefaria_translation.schemas.base_schema import BaseSchema
+from sefaria_translation.tracing import annotate, tracer
+
+BATCH_DIR: Path = Path("saved_batches")
+
+# The API allows 100,000 requests or 256 MB per batch, stay under both.
+MAX_BATCH_REQUESTS: int = 10_000
+MAX_BATCH_CHARS: int = 100_000_000
+
+
+def prompt_id(prompt: str) -> str:
+    """Batch custom_id for a prompt. A sha256 hex digest is exactly the 64 characters the API allows."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class BatchJob(BaseSchema):
+    """The state of a submitted batch job, saved so it can be resumed from another process"""
+
+    batch_ids: list[str]
+    gates: list[int]
+    chapters: list[tuple[int, int]]  # (gate_num, chapter_num)
+    submitted_at: datetime = Field(default_factory=datetime.now)
+    type: Literal["BatchJob"] = "BatchJob"
+
+    @property
+    def file_path(self) -> Path:
+        return BATCH_DIR / f"batch_{self.batch_ids[0]}.json"
+
+    @classmethod
+    def from_file(cls, file_path: Path) -> "BatchJob":
+        return cls.model_validate_json(file_path.read_text())
+
+
+class BatchResults:
+    """Completed batch responses, callable as an llm_generation function"""
+
+    def __init__(
+        self,
+        texts: dict[str, str],
+        errors: dict[str, str],
+        metadata: Optional[dict[str, dict[str, Any]]] = None,
+    ) -> None:
+        self.texts = texts
+        self.errors = errors
+        # The model and token usage of each response (see claude.message_metadata)
+        self.metadata = metadata or {}
+
+    def __call__(self, prompt: str) -> str:
+        custom_id = prompt_id(prompt)
+        if custom_id in self.texts:
+            # Recorded like a live call, so the saved chapter keeps the model and usage of each passage
+            with tracer.span("llm_call", requested_model=MODEL, batch=True):
+                annotate(**self.metadata.get(custom_id, {}))
+            return self.texts[custom_id]
+        if custom_id in self.errors:
+            raise ValueError(f"Batch request failed: {self.errors[custom_id]}")
+        raise ValueError("No batch result for prompt, it was not part of this batch")
+
+
+def default_client() -> Any:
+    from sefaria_translation.claude import get_client
+
+    return get_client()
+
+
+def submit_gates(gates: list[int], client: Optional[Any] = None) -> BatchJob:
+    """
+    Submits a prompt for every passage of every untranslated chapter in the gates.
+    The job is saved to BATCH_DIR before returning, so it can be resumed later.
+    """
+    client = client or default_client()
+    requests: dict[str, dict[str, Any]] = {}
+    chapters: list[tuple[int, int]] = []
+
+    for gate_num in gates:
+        gate_text = fetch_gate(gate_num)
+        for i, chapter_text in enumerate(gate_text):
+            chapter_num = i + 1
+            if check_translation_exists(gate_num, chapter_num):
+                print(
+                    f"Skipping Gate {gate_num} Chapter {chapter_num} - translation already exists"
+                )
+                continue
+            chapters.append((gate_num, chapter_num))
+            translator = ChapterTranslator(
+                chapter_ref(gate_num, chapter_num),
+                chapter_text,
+                context_policy=context_policy,
+            )
+            for passage_num in range(1, len(chapter_text) + 1):
+                prompt = translator.passage_prompt(passage_num)
+                # Identical prompts share a single request
+                requests[prompt_id(prompt)] = message_params(prompt)
+
+    if not requests:
+        raise ValueError(f"Nothing to translate in gates {gates}")
+
+    batch_ids: list[str] = []
+    chunk: list[dict[str, Any]] = []
+    chunk_chars = 0
+    for custom_id, params in requests.items():
+        request = {"custom_id": custom_id, "params": params}
+        request_chars = len(str(params))
+        if chunk and (
+            len(chunk) >= MAX_BATCH_REQUESTS
+            or chunk_chars + request_chars > MAX_BATCH_CHARS
+        ):
+            batch_ids.append(client.messages.batches.create(requests=chunk).id)
+            chunk, chunk_chars = [], 0
+        chunk.append(request)
+        chunk_chars += request_chars
+    batch_ids.append(client.messages.batches.create(requests=chunk).id)
+
+    job = BatchJob(batch_ids=batch_ids, gates=gates, chapters=chapters)
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    job.to_file(job.file_path)
+    print(
+        f"Submitted {len(requests)} passages from {len(chapters)} chapters "
+        f"in {len(batch_ids)} batch(es). Saved job to {job.file_path}"
+    )
+    return job
+
+
+def fetch_results(
+    job: BatchJob,
+    client: Optional[Any] = None,
+    wait: bool = True,
+    poll_interval: float = 60,
+) -> Optional[BatchResults]:
+    """
+    Polls the job's batches and downloads their results once they have all ended.
+
+    Returns:
+        The results, or None if wait is False and some batch is still processing.
+    """
+    client = client or default_client()
+    for batch_id in job.batch_ids:
+        while True:
+            batch = client.messages.batches.retrieve(batch_id)
+            if batch.processing_status == "ended":
+                break
+            if not wait:
+                print(f"Batch {batch_id} is still {batch.processing_status}.")
+                return None
+            time.sleep(poll_interval)
+
+    texts: dict[str, str] = {}
+    errors: dict[str, str] = {}
+    metadata: dict[str, dict[str, Any]] = {}
+    for batch_id in job.batch_ids:
+        for entry in client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                texts[entry.custom_id] = response_text(entry.result.message)
+                metadata[entry.custom_id] = message_metadata(entry.result.message)
+            else:
+                errors[entry.custom_id] = entry.result.type
+    return BatchResults(texts, errors, metadata)
+
+
+def resume_batch(
+    job: BatchJob,
+    client: Optional[Any] = None,
+    wait: bool = True,
+    poll_interval: float = 60,
+) -> list[tuple[int, int]]:
+    """
+    Waits for a submitted job and saves every chapter whose passages all succeeded.
+    Chapters with a failed passage are reported and left pending for a later run.
+
+    Returns:
+        The (gate_num, chapter_num) of each saved chapter
+    """
+    results = fetch_results(job, client, wait, poll_interval)
+    if results is None:
+        return []
+
+    saved: list[tuple[int, int]] = []
+    gate_texts: dict[int, list[list[str]]] = {}
+    for gate_num, chapter_num in job.chapters:
+        if gate_num not in gate_texts:
+            gate_texts[gate_num] = fetch_gate(gate_num)
+        translator = ChapterTranslator(
+            chapter_ref(gate_num, chapter_num),
+            gate_texts[gate_num][chapter_num - 1],
+            llm_generation=results,
+            context_policy=context_policy,
+        )
+        try:
+            translation = translator.translate_chapter()
+        except Exception as e:
+            print(f"Could not complete Gate {gate_num} Chapter {chapter_num}: {e}")
+            continue
+        save_chapter_translation(
+            translation, gate_num, chapter_num, translator.call_metadata(), translator.model_version
+        )
+        saved.append((gate_num, chapter_num))
+
+    print(f"Saved {len(saved)}/{len(job.chapters)} chapters from batch job.")
+    return saved
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        resume_batch(BatchJob.from_file(Path(sys.argv[1])))
+    else:
+        submit_gates([21, 27, 30, 32, 24, 31])
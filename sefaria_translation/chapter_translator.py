@@ -1,13 +1,34 @@
 # translate.py
-from ast import Pass
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from sefaria_translation.checkpoint import PassageCheckpoint
 from sefaria_translation.text_reference import (
     TextReference,
     ChapterReference,
     PassageReference,
 )
-from sefaria_translation.translation_prompt import translation_prompt
+from sefaria_translation.translation_prompt import (
+    FULL_CHAPTER,
+    ContextPolicy,
+    estimate_tokens,
+    packed_translation_prompt,
+    parse_packed_translation,
+    translation_prompt,
+)
 from sefaria_translation.claude import ask_claude
-from typing import Optional, Callable
+from sefaria_translation.tracing import Span, tracer
+from typing import TYPE_CHECKING, Any, Optional, Callable, NoReturn
+
+if TYPE_CHECKING:
+    # Only for annotations, the memory pulls in numpy and the schemas
+    from sefaria_translation.translation_memory import MemoryMatch, TranslationMemory
+
+
+class TranslationInterrupted(Exception):
+    """Raised when a translation stops early because its stop_event or cancel_event was set"""
 
 
 class ChapterTranslator:
@@ -16,14 +37,47 @@ class ChapterTranslator:
         chapter_ref: ChapterReference,
         chapter: list[str],
         llm_generation: Callable[[str], str] = ask_claude,
+        pack_token_budget: Optional[int] = None,
+        checkpoint: Optional[PassageCheckpoint] = None,
+        stop_event: Optional[threading.Event] = None,
+        context_policy: ContextPolicy = FULL_CHAPTER,
+        translation_memory: Optional["TranslationMemory"] = None,
+        cancel_event: Optional[threading.Event] = None,
     ) -> None:
+        """
+        Args:
+            pack_token_budget: If set, consecutive passages are packed into a single LLM call
+                up to this many estimated tokens of Hebrew. Keep it well below the output token limit,
+                since the translations of the whole group come back in one response.
+            checkpoint: If set, every completed passage is recorded to it (see ChapterTranslator.resume).
+            stop_event: If set, no new LLM calls are started once the event is set,
+                and calls already in flight are allowed to finish and are recorded.
+            context_policy: How much of the chapter is sent as context with each passage.
+                Use a window or token budget for very large chapters (see ContextPolicy).
+            translation_memory: If set, passages that were translated before, exactly or nearly,
+                reuse the stored translation instead of calling the LLM, and new translations are added to it.
+            cancel_event: Stops this chapter like stop_event, which is usually shared by a whole run.
+                Set e.g. when the chapter's queue lease is lost and another worker may have it.
+        """
         if not chapter:
             raise ValueError("Chapter cannot be empty")
 
         self.chapter_ref: ChapterReference = chapter_ref
         self.chapter: list[str] = chapter
         self.llm_generation = llm_generation
+        self.pack_token_budget = pack_token_budget
+        self.checkpoint = checkpoint
+        self.stop_event = stop_event
+        self.context_policy = context_policy
+        self.translation_memory = translation_memory
+        self.cancel_event = cancel_event
         self.translations: list[str] = []
+        # Passages restored from a checkpoint that were completed out of order, by passage number
+        self.recovered: dict[int, str] = {}
+        # What the LLM call behind each passage reported (model, tokens, stop_reason...), by passage number
+        self.calls: dict[int, dict[str, Any]] = {}
+        # Passages that will reuse a translation from the translation memory, by passage number
+        self.reused: dict[int, "MemoryMatch"] = {}
 
     @property
     def is_complete(self) -> bool:
@@ -47,56 +101,345 @@ class ChapterTranslator:
     @classmethod
     def clone(Cls, state: "ChapterTranslator") -> "ChapterTranslator":
         """Gets new chapter translator from an existing chapter translator"""
-        translator = Cls(state.chapter_ref, state.chapter)
+        translator = Cls(
+            state.chapter_ref,
+            state.chapter,
+            state.llm_generation,
+            state.pack_token_budget,
+            state.checkpoint,
+            state.stop_event,
+            state.context_policy,
+            state.translation_memory,
+            state.cancel_event,
+        )
         translator.translations = state.translations
+        translator.recovered = state.recovered
+        translator.calls = state.calls
+        translator.reused = state.reused
+        return translator
+
+    @classmethod
+    def resume(
+        Cls, state: "ChapterTranslator", checkpoint: PassageCheckpoint
+    ) -> "ChapterTranslator":
+        """
+        Gets a clone of the translator with the passages recorded in the checkpoint restored,
+        along with the metadata of the LLM calls that translated them.
+        Recorded passages whose Hebrew no longer matches the chapter are translated again.
+        New passages are recorded to the same checkpoint.
+        """
+        translator = Cls.clone(state)
+        translator.checkpoint = checkpoint
+        translator.translations = list(state.translations)
+        translator.recovered = dict(state.recovered)
+        translator.calls = dict(state.calls)
+        for passage_num, record in sorted(checkpoint.records().items()):
+            if passage_num <= len(translator.translations):
+                continue
+            if (
+                passage_num > len(translator.chapter)
+                or translator.chapter[passage_num - 1] != record["hebrew"]
+            ):
+                continue
+            translator.recovered[passage_num] = record["english"]
+            if record.get("llm_call") is not None:
+                translator.calls[passage_num] = record["llm_call"]
+        while translator.next_passage_num in translator.recovered:
+            translator.translations.append(
+                translator.recovered.pop(translator.next_passage_num)
+            )
+        if translator.translations or translator.recovered:
+            print(
+                f"Resumed {translator.chapter_ref.display_text(2)} with "
+                f"{len(translator.translations) + len(translator.recovered)}/{len(translator.chapter)} passages from checkpoint."
+            )
         return translator
 
-    def translate_passage(self) -> Optional[str]:
-        """Translate a single passage with full chapter context"""
-        self.chapter_ref.passage_num = self.next_passage_num
-        if self.chapter_ref.passage_num is None:
-            # Translation is complete
+    def passage_ref(self, passage_num: int) -> PassageReference:
+        """
+        Returns a reference to a passage in this chapter.
+        The shared chapter_ref is copied rather than mutated, so this is safe to call concurrently.
+        """
+        return PassageReference.from_ref(replace(self.chapter_ref, passage_num=passage_num))
+
+    def passage_prompt(self, passage_num: int) -> str:
+        """Builds the translation prompt for a 1-based passage number"""
+        return translation_prompt(
+            self.passage_ref(passage_num), self.chapter, self.context_policy
+        )
+
+    def memory_match(self, passage_num: int) -> Optional["MemoryMatch"]:
+        if self.translation_memory is None:
             return None
-        passage_ref = PassageReference.from_ref(self.chapter_ref)
-        prompt = translation_prompt(passage_ref, self.chapter)
+        return self.translation_memory.lookup(self.chapter[passage_num - 1])
+
+    def remember(self, passage_nums: list[int], translations: list[str]) -> None:
+        """Adds new translations to the translation memory, so later repeats can reuse them"""
+        if self.translation_memory is None:
+            return
+        for passage_num, translation in zip(passage_nums, translations):
+            self.translation_memory.add(
+                self.chapter[passage_num - 1],
+                translation,
+                (self.chapter_ref.section_num, self.chapter_ref.chapter_num or 0, passage_num),
+            )
+
+    def needs_llm(self, passage_num: int) -> bool:
+        return passage_num not in self.recovered and passage_num not in self.reused
+
+    def passage_groups(self) -> list[list[int]]:
+        """
+        Groups the remaining passage numbers into LLM calls.
+        Without packing each passage is its own call. With packing, consecutive passages
+        are grouped until the next one would take the group over pack_token_budget.
+        """
+        first_passage_num = self.next_passage_num
+        if first_passage_num is None:
+            return []
+
+        groups: list[list[int]] = []
+        group_tokens = 0
+        for passage_num in range(first_passage_num, len(self.chapter) + 1):
+            if passage_num not in self.recovered and passage_num not in self.reused:
+                match = self.memory_match(passage_num)
+                if match is not None:
+                    self.reused[passage_num] = match
+            tokens = estimate_tokens(self.chapter[passage_num - 1])
+            # Recovered and reused passages are never packed, so they do not need an LLM call
+            if (
+                self.pack_token_budget is not None
+                and groups
+                and self.needs_llm(passage_num)
+                and self.needs_llm(groups[-1][-1])
+                and group_tokens + tokens <= self.pack_token_budget
+            ):
+                groups[-1].append(passage_num)
+                group_tokens += tokens
+            else:
+                groups.append([passage_num])
+                group_tokens = tokens
+        return groups
+
+    def translate_group(self, passage_nums: list[int]) -> list[str]:
+        """
+        Translates a group of consecutive passages and returns one translation per passage.
+        Falls back to one call per passage if the packed response cannot be aligned with the passages.
+        Does not modify self.translations.
+        """
+        if passage_nums[0] in self.recovered:
+            return [self.recovered.pop(passage_nums[0])]
+        if passage_nums[0] in self.reused:
+            match = self.reused.pop(passage_nums[0])
+            self.calls[passage_nums[0]] = match.flag()
+            return [match.english]
+        with tracer.span(
+            "translate_group",
+            chapter=self.chapter_ref.display_text(2),
+            first_passage=passage_nums[0],
+            passages=len(passage_nums),
+        ) as span:
+            translations = self._translate_group(passage_nums)
+        summary = call_summary(span)
+        for passage_num in passage_nums:
+            self.calls[passage_num] = summary
+        self.remember(passage_nums, translations)
+        return translations
+
+    def _translate_group(self, passage_nums: list[int]) -> list[str]:
+        if len(passage_nums) == 1:
+            with tracer.span("prompt_build"):
+                prompt = self.passage_prompt(passage_nums[0])
+            return [self.llm_generation(prompt)]
+
+        with tracer.span("prompt_build"):
+            prompt = packed_translation_prompt(
+                self.passage_ref(passage_nums[0]),
+                self.chapter,
+                len(passage_nums),
+                self.context_policy,
+            )
         response = self.llm_generation(prompt)
-        self.translations.append(response)
-        return response
+        with tracer.span("parse"):
+            translations = parse_packed_translation(response, passage_nums)
+        if translations is None:
+            print(
+                f"Could not align packed translation of passages {passage_nums[0]}-{passage_nums[-1]}, "
+                "translating them one at a time."
+            )
+            return [
+                self.llm_generation(self.passage_prompt(passage_num))
+                for passage_num in passage_nums
+            ]
+        return translations
+
+    def record(self, passage_nums: list[int], translations: list[str]) -> None:
+        """Records completed passages to the checkpoint, if there is one"""
+        if self.checkpoint is None:
+            return
+        for passage_num, translation in zip(passage_nums, translations):
+            self.checkpoint.record(
+                passage_num,
+                self.chapter[passage_num - 1],
+                translation,
+                self.calls.get(passage_num),
+            )
+
+    def check_stop(self) -> None:
+        if any(event is not None and event.is_set() for event in (self.stop_event, self.cancel_event)):
+            raise TranslationInterrupted(
+                f"Stopped {self.chapter_ref.display_text(2)} at passage {self.next_passage_num}."
+            )
 
     def zip_translations(self) -> list[tuple[str, str]]:
         """Returns list of (original, translation) pairs for completed translations"""
         return list(zip(self.chapter[: len(self.translations)], self.translations))
 
-    def translate_chapter(self) -> list[tuple[str, str]]:
+    def call_metadata(self) -> list[Optional[dict[str, Any]]]:
+        """LLM call metadata for each completed passage, None for passages recorded without it"""
+        return [self.calls.get(n) for n in range(1, len(self.translations) + 1)]
+
+    @property
+    def model_version(self) -> Optional[str]:
+        """The model that answered most of the calls, if any call reported one"""
+        models = [call["model"] for call in self.calls.values() if call.get("model")]
+        return max(set(models), key=models.count) if models else None
+
+    def translate_chapter(self, max_concurrency: int = 1) -> list[tuple[str, str]]:
         """
         Translates all remaining passages in the chapter
 
+        Args:
+            max_concurrency: Number of passages to keep in flight at once. 1 translates sequentially.
+
         Returns:
             List of (original, translation) pairs for the entire chapter
         """
+        if max_concurrency > 1:
+            return asyncio.run(self.translate_chapter_async(max_concurrency))
         try:
-            while not self.is_complete:
-                translation = self.translate_passage()
-                if translation is None:
-                    print(
-                        f"Translation of {self.chapter_ref.display_text(2)} complete."
-                    )
-                    break
+            for passage_nums in self.passage_groups():
+                self.check_stop()
+                translations = self.translate_group(passage_nums)
+                self.record(passage_nums, translations)
+                self.translations.extend(translations)
                 print(f"Passage {len(self.translations)} translated.")
+            print(f"Translation of {self.chapter_ref.display_text(2)} complete.")
             return self.zip_translations()
+        except TranslationInterrupted:
+            raise
         except Exception as e:
-            error_message = str(e).lower()
-            # TODO: This is Anthropic specific, in future I may want to make the error handling use dependency injection, but for now this is ok.
-            if (
-                "overloaded_error" in error_message
-                or "error code: 529" in error_message
-            ):
-                raise Exception("Anthropic server is busy, try again later.") from e
-            else:
-                # Include partial translations in the error
-                completed_translations = self.zip_translations()
-                raise Exception(
-                    f"Translation failed at passage {self.next_passage_num}."
-                    f"Completed {len(completed_translations)}/{len(self.chapter)} passages. "
-                    f"Error: {str(e)}"
-                ) from e
+            self.raise_translation_error(e)
+
+    async def translate_chapter_async(
+        self, max_concurrency: int = 4
+    ) -> list[tuple[str, str]]:
+        """
+        Translates all remaining passages with up to max_concurrency LLM calls in flight.
+
+        Each prompt carries its own context, so passages can be translated independently.
+        Results are appended to self.translations in passage order, so the output is the same as translate_chapter.
+
+        Returns:
+            List of (original, translation) pairs for the entire chapter
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_concurrency)
+        # Finished passages that are waiting for an earlier passage before they can be appended
+        finished: dict[int, str] = {}
+
+        def complete(passage_nums: list[int], translations: list[str]) -> None:
+            self.record(passage_nums, translations)
+            finished.update(zip(passage_nums, translations))
+            while self.next_passage_num in finished:
+                self.translations.append(finished.pop(self.next_passage_num))
+
+        async def translate(
+            passage_nums: list[int], executor: ThreadPoolExecutor
+        ) -> None:
+            async with semaphore:
+                self.check_stop()
+                # Executor threads do not inherit the context, so pass it along for tracing
+                call = loop.run_in_executor(
+                    executor,
+                    contextvars.copy_context().run,
+                    self.translate_group,
+                    passage_nums,
+                )
+                try:
+                    translations = await asyncio.shield(call)
+                except asyncio.CancelledError:
+                    # The call has already been paid for, so let it finish and keep the result
+                    await asyncio.wait([call])
+                    if call.exception() is None:
+                        complete(passage_nums, call.result())
+                    raise
+            complete(passage_nums, translations)
+            print(f"Passage {passage_nums[-1]} translated.")
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            tasks = [
+                asyncio.create_task(translate(passage_nums, executor))
+                for passage_nums in self.passage_groups()
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except asyncio.CancelledError:
+                print(
+                    f"Interrupted {self.chapter_ref.display_text(2)}, in-flight passages were kept."
+                )
+                raise
+            except Exception as e:
+                # Stop launching passages, but let the ones in flight finish and be recorded
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                if isinstance(e, TranslationInterrupted):
+                    raise
+                self.raise_translation_error(e)
+
+        print(f"Translation of {self.chapter_ref.display_text(2)} complete.")
+        return self.zip_translations()
+
+    def raise_translation_error(self, e: Exception) -> NoReturn:
+        error_message = str(e).lower()
+        # TODO: This is Anthropic specific, in future I may want to make the error handling use dependency injection, but for now this is ok.
+        if "overloaded_error" in error_message or "error code: 529" in error_message:
+            raise Exception("Anthropic server is busy, try again later.") from e
+        else:
+            # Include partial translations in the error
+            completed_translations = self.zip_translations()
+            raise Exception(
+                f"Translation failed at passage {self.next_passage_num}."
+                f"Completed {len(completed_translations)}/{len(self.chapter)} passages. "
+                f"Error: {str(e)}"
+            ) from e
+
+
+def call_summary(span: Span) -> dict[str, Any]:
+    """
+    Sums the LLM calls made inside a translate_group span.
+    A group makes several calls when a packed response had to be retranslated passage by passage.
+    """
+    calls = span.child_attributes("llm_call")
+    summary: dict[str, Any] = {
+        "calls": len(calls),
+        "duration": span.duration,
+        "passages_in_call": span.attributes.get("passages", 1),
+    }
+    if span.attributes.get("cache_hit"):
+        summary["cache_hit"] = True
+    for key in (
+        "input_tokens",
+        "output_tokens",
+        "cache_creation_input_tokens",
+        "cache_read_input_tokens",
+        "retries",
+    ):
+        summary[key] = sum(call.get(key) or 0 for call in calls)
+    if calls:
+        summary["model"] = calls[-1].get("model")
+        summary["stop_reason"] = calls[-1].get("stop_reason")
+    return summary
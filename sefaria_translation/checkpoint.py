@@ -0,0 +1,76 @@
+# checkpoint.py
+"""
+Passage-level checkpoints, so an interrupted chapter loses at most the passages that were in flight.
+
+Each completed passage is appended to a JSON lines file and fsynced before the translator moves on.
+ChapterTranslator.resume rebuilds a translator's state from the file.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+from sefaria_translation.text_reference import ChapterReference
+
+CHECKPOINT_DIR: Path = Path("checkpoints")
+
+
+class PassageCheckpoint:
+    """Append-only record of the completed passages of one chapter"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_chapter(cls, chapter_ref: ChapterReference) -> "PassageCheckpoint":
+        return cls(CHECKPOINT_DIR / f"{chapter_ref.get_file_name()}.jsonl")
+
+    def record(
+        self, passage_num: int, hebrew: str, english: str, call: Optional[dict[str, Any]] = None
+    ) -> None:
+        """
+        Durably appends a completed passage, with the metadata of the LLM call that translated it.
+        A line left without its newline by a crash is ended first, so it does not swallow this one.
+        """
+        record: dict[str, Any] = {"passage_num": passage_num, "hebrew": hebrew, "english": english}
+        if call is not None:
+            record["llm_call"] = call
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a+b") as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def records(self) -> dict[int, dict[str, Any]]:
+        """
+        Returns each recorded passage by passage number.
+        A line cut short by a crash is ignored.
+        """
+        if not self.path.exists():
+            return {}
+        records: dict[int, dict[str, Any]] = {}
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["passage_num"]] = record
+        return records
+
+    def load(self) -> dict[int, tuple[str, str]]:
+        """Returns the (hebrew, english) of each recorded passage by passage number"""
+        return {
+            passage_num: (record["hebrew"], record["english"])
+            for passage_num, record in self.records().items()
+        }
+
+    def remove(self) -> None:
+        """Deletes the checkpoint once the chapter has been saved"""
+        self.path.unlink(missing_ok=True)
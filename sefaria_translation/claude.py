@@ -1,20 +1,139 @@
-from anthropic import Anthropic
-from sefaria_translation.secret import anthropic_api_key
+import os
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Generator, Iterator, Optional, Union
+from sefaria_translation.concurrency import is_overload, llm_governor
+from sefaria_translation.tracing import annotate, tracer
+from sefaria_translation.translation_prompt import TranslationPrompt
 
-client = Anthropic(api_key=anthropic_api_key)
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+    from anthropic.lib.streaming import MessageStream
 
+# The anthropic package takes over a second to import, so the client is only built on first use
+_client: Optional["Anthropic"] = None
+_client_lock = Lock()
 
-def ask_claude(prompt: str) -> str:
-    response = client.messages.create(
-        max_tokens=1024,
-        messages=[
+
+def api_key() -> str:
+    """ANTHROPIC_API_KEY if set, otherwise anthropic_api_key from sefaria_translation/secret.py"""
+    key = os.environ.get("ANTHROPIC_API_KEY")
+    if key:
+        return key
+    try:
+        from sefaria_translation.secret import anthropic_api_key
+    except ImportError:
+        raise Exception(
+            "No Anthropic API key. Set ANTHROPIC_API_KEY or define anthropic_api_key in sefaria_translation/secret.py"
+        )
+    key_from_file: str = anthropic_api_key
+    return key_from_file
+
+
+def get_client() -> "Anthropic":
+    """The shared Anthropic client, created on the first call"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from anthropic import Anthropic
+
+            # Retries are left to llm_governor, so it sees every 429 and 529 and can slow down
+            _client = Anthropic(api_key=api_key(), max_retries=0)
+        return _client
+
+
+MODEL: str = "claude-3-5-sonnet-latest"
+MAX_TOKENS: int = 1024
+
+
+@dataclass
+class TokenUsage:
+    """Running token counts across all calls to Claude in this process"""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def add(self, usage: Any) -> None:
+        """Adds the usage block of a Claude response"""
+        with self._lock:
+            self.input_tokens += usage.input_tokens or 0
+            self.output_tokens += usage.output_tokens or 0
+            self.cache_creation_input_tokens += (
+                getattr(usage, "cache_creation_input_tokens", None) or 0
+            )
+            self.cache_read_input_tokens += (
+                getattr(usage, "cache_read_input_tokens", None) or 0
+            )
+
+    def summary(self) -> str:
+        return (
+            f"Tokens: input={self.input_tokens}, "
+            f"cache write={self.cache_creation_input_tokens}, "
+            f"cache read={self.cache_read_input_tokens}, "
+            f"output={self.output_tokens}"
+        )
+
+
+token_usage = TokenUsage()
+
+
+def prompt_content(prompt: str) -> Union[str, list[dict[str, Any]]]:
+    """
+    Converts a prompt to message content.
+    The chapter prefix of a TranslationPrompt is sent as a cached block so it is only paid for in full once per chapter.
+    """
+    if isinstance(prompt, TranslationPrompt) and prompt.prefix:
+        return [
+            {
+                "type": "text",
+                "text": prompt.prefix,
+                "cache_control": {"type": "ephemeral"},
+            },
+            {"type": "text", "text": prompt.suffix},
+        ]
+    return str(prompt)
+
+
+def message_params(prompt: str) -> dict[str, Any]:
+    """Request parameters for a translation call, shared by ask_claude and the batch backend"""
+    return {
+        "max_tokens": MAX_TOKENS,
+        "messages": [
             {
                 "role": "user",
-                "content": prompt,
+                "content": prompt_content(prompt),
             }
         ],
-        model="claude-3-5-sonnet-latest",
-    ).content[0]
+        "model": MODEL,
+    }
+
+
+def message_metadata(message: Any) -> dict[str, Any]:
+    """The model, stop_reason and token usage of a Claude message"""
+    usage = message.usage
+    return {
+        "model": getattr(message, "model", None),
+        "stop_reason": getattr(message, "stop_reason", None),
+        "input_tokens": usage.input_tokens or 0,
+        "output_tokens": usage.output_tokens or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+
+
+def record_message(message: Any) -> None:
+    """Adds the usage of a Claude message to token_usage and to the current trace span"""
+    token_usage.add(message.usage)
+    annotate(**message_metadata(message))
+
+
+def response_text(message: Any) -> str:
+    """Gets the text of a Claude message and records its token usage"""
+    record_message(message)
+    response = message.content[0]
 
     if not hasattr(response, "text") or not isinstance(response.text, str):
         raise ValueError(
@@ -24,5 +143,73 @@ def ask_claude(prompt: str) -> str:
         return response.text
 
 
+def ask_claude(prompt: str) -> str:
+    with tracer.span("llm_call", requested_model=MODEL):
+        return response_text(
+            llm_governor.call(get_client().messages.create, **message_params(prompt))
+        )
+
+
+class ClaudeStream:
+    """
+    Text deltas of one streamed call, see stream_claude.
+    close() may be called from another thread than the one reading, e.g. when the stream stalls.
+    """
+
+    def __init__(self, prompt: str) -> None:
+        self.prompt = prompt
+        self._stream: Optional["MessageStream"] = None
+        self._closed = False
+        self._deltas = self._generate()
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        return next(self._deltas)
+
+    def _generate(self) -> Generator[str, None, None]:
+        llm_governor.acquire()
+        try:
+            with tracer.span("llm_call", requested_model=MODEL, streamed=True):
+                with get_client().messages.stream(**message_params(self.prompt)) as stream:
+                    self._stream = stream
+                    if self._closed:
+                        return
+                    yield from stream.text_stream
+                    record_message(stream.get_final_message())
+        except Exception as e:
+            if is_overload(e):
+                llm_governor.on_overload()
+            raise
+        else:
+            llm_governor.on_success()
+        finally:
+            llm_governor.release()
+
+    def close(self) -> None:
+        """
+        Closes the HTTP response. A read blocked on another thread then fails,
+        which ends the stream there and releases its llm_governor slot.
+        """
+        self._closed = True
+        if self._stream is not None:
+            self._stream.close()
+        try:
+            self._deltas.close()
+        except ValueError:
+            pass  # Still running on the reading thread, where the closed response ends it
+
+
+def stream_claude(prompt: str) -> ClaudeStream:
+    """
+    Streaming version of ask_claude that yields text deltas as they arrive.
+    The stream holds an llm_governor slot until it ends or is closed. Nothing is retried, since
+    part of the response may already have been consumed.
+    """
+    return ClaudeStream(prompt)
+
+
 if __name__ == "__main__":
     print(ask_claude("Hi there, are you fishing?"))
+    print(token_usage.summary())
@@ -0,0 +1,163 @@
+# cli.py
+"""
+Command line entry point for unattended translation runs. Nothing here ever waits for input.
+
+    sefaria-translate plan [--gates 21,27]
+    sefaria-translate run --gates 21,27 --workers 8 --overwrite if-newer [--queue saved_translations/jobs.sqlite3] [--trace]
+    sefaria-translate status [--gates 21,27]
+
+Every setting is per run: two runs in one process, or many runs on many machines, never share an overwrite answer.
+
+Each command imports what it needs when it runs. Translating pulls in the Anthropic client and the schemas,
+which take well over a second to import, so plan and status do not import the translation modules at all.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Optional, Sequence
+from sefaria_translation.job_queue import QUEUE_PATH, JobQueue
+from sefaria_translation.tracing import TRACE_PATH
+from sefaria_translation.translation_store import OVERWRITE_POLICIES, STORE_PATH
+
+# Same as rimmonim_translation.TITLE, which is not imported for plan and status
+TITLE = "Pardes_Rimmonim"
+
+
+def parse_gates(value: str) -> list[int]:
+    """"21,27" or "21-24,30" to a list of gate numbers"""
+    gates: list[int] = []
+    try:
+        for part in value.split(","):
+            if "-" in part:
+                first, last = part.split("-")
+                gates.extend(range(int(first), int(last) + 1))
+            elif part.strip():
+                gates.append(int(part))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid gate list: {value}")
+    return gates
+
+
+def plan(args: argparse.Namespace) -> int:
+    from sefaria_translation.work_planner import WorkPlan, plan_title
+
+    work_plan = plan_title(TITLE, store_path=args.store)
+    if args.gates is not None:
+        work_plan = WorkPlan(TITLE, [unit for unit in work_plan.units if unit.section_num in args.gates])
+    print(work_plan.summary())
+    for unit in work_plan.pending:
+        print(
+            f"  Gate {unit.section_num} Chapter {unit.chapter_num}: {unit.status}, "
+            f"{unit.done_passages}/{unit.passages} passages done"
+        )
+    return 0
+
+
+def run(args: argparse.Namespace) -> int:
+    from sefaria_translation import rimmonim_translation
+    from sefaria_translation.tracing import tracer
+
+    if args.trace is not None:
+        tracer.path = args.trace
+    queue = JobQueue(args.queue) if args.queue is not None else None
+    failures = rimmonim_translation.translate_gates(
+        args.gates if args.gates is not None else rimmonim_translation.DEFAULT_GATES,
+        workers=args.workers,
+        max_concurrency=args.concurrency,
+        pack_token_budget=args.pack_token_budget,
+        queue=queue,
+        overwrite=args.overwrite,
+        near_duplicates=args.near_duplicates,
+    )
+    return 1 if failures else 0
+
+
+def status(args: argparse.Namespace) -> int:
+    from sefaria_translation.work_planner import saved_chapters
+
+    # The same chapters plan counts as complete: in the store or in either JSON layout
+    saved = sorted(
+        key for key in saved_chapters(TITLE, store_path=args.store)
+        if args.gates is None or key[0] in args.gates
+    )
+    print(f"{len(saved)} chapters saved")
+    gates: dict[int, int] = {}
+    for gate_num, _ in saved:
+        gates[gate_num] = gates.get(gate_num, 0) + 1
+    for gate_num, count in sorted(gates.items()):
+        print(f"  Gate {gate_num}: {count} chapters")
+    if args.queue.exists():
+        queue = JobQueue(args.queue)
+        print(f"Queue {args.queue}: {queue.status(TITLE)}")
+        for _, gate_num, chapter_num, error in queue.dead_jobs(TITLE):
+            print(f"  Dead: Gate {gate_num} Chapter {chapter_num}: {error}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="sefaria-translate",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = commands.add_parser("plan", help="Show what is left to translate")
+    plan_parser.add_argument("--gates", type=parse_gates, help="Only plan these gates")
+    plan_parser.add_argument("--store", type=Path, default=STORE_PATH)
+    plan_parser.set_defaults(handler=plan)
+
+    run_parser = commands.add_parser("run", help="Translate and save the pending chapters of some gates")
+    run_parser.add_argument(
+        "--gates", type=parse_gates, help="e.g. 21,27 or 21-24. Defaults to rimmonim_translation.DEFAULT_GATES"
+    )
+    run_parser.add_argument("--workers", type=int, default=1, help="Chapters translated at once")
+    run_parser.add_argument("--concurrency", type=int, default=1, help="LLM calls at once per chapter")
+    run_parser.add_argument("--pack-token-budget", type=int, help="Pack short passages into calls of up to this many tokens")
+    run_parser.add_argument(
+        "--overwrite",
+        choices=OVERWRITE_POLICIES,
+        default="skip",
+        help=(
+            "What to do with saved chapters. if-newer translates them again if they were saved with an older "
+            "prompt version, where prompts sent before are still answered from the LLM cache. "
+            "replace calls the LLM for every passage again."
+        ),
+    )
+    run_parser.add_argument(
+        "--near-duplicates",
+        action="store_true",
+        help="Also reuse saved translations of nearly identical passages, not only of exact repeats",
+    )
+    run_parser.add_argument(
+        "--queue",
+        type=Path,
+        nargs="?",
+        const=QUEUE_PATH,
+        help=f"Pull chapters from a shared job queue, so several machines can split the run (default {QUEUE_PATH})",
+    )
+    run_parser.add_argument(
+        "--trace",
+        type=Path,
+        nargs="?",
+        const=TRACE_PATH,
+        help=f"Write a span for every stage of the run to a JSONL file (default {TRACE_PATH})",
+    )
+    run_parser.set_defaults(handler=run)
+
+    status_parser = commands.add_parser("status", help="Show saved chapters and the job queue")
+    status_parser.add_argument("--gates", type=parse_gates, help="Only count chapters of these gates")
+    status_parser.add_argument("--queue", type=Path, default=QUEUE_PATH)
+    status_parser.add_argument("--store", type=Path, default=STORE_PATH)
+    status_parser.set_defaults(handler=status)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    code: int = args.handler(args)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# client_pool.py
+"""
+Pool of Anthropic clients over several API keys and endpoints, so a run is not capped by one key's rate limit.
+
+Every member has its own client and its own ConcurrencyGovernor, so its in-flight limit adapts to its own
+429s and 529s. Each call goes to the healthy member with the lowest load (in flight / limit). A member that
+keeps failing, or rejects its key, is taken out of rotation for a cool-down and the call is retried on another.
+Each client keeps its HTTP connections open between calls.
+
+Members are configured in llm_pool.json. Keys are named by environment variable, so the file holds no secrets:
+    [
+        {"name": "main", "api_key_env": "ANTHROPIC_API_KEY", "max_concurrency": 16},
+        {"name": "second", "api_key_env": "ANTHROPIC_API_KEY_2"},
+        {"name": "gateway", "base_url": "https://llm-gateway.internal", "api_key_env": "GATEWAY_KEY"}
+    ]
+
+Usage:
+    pool = ClientPool.from_config()
+    translator = ChapterTranslator(chapter_ref, chapter, pool.ask)
+    print(pool.status())
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
+from sefaria_translation.concurrency import (
+    ConcurrencyGovernor,
+    is_overload,
+    is_transient,
+    retry_after,
+    status_code,
+)
+from sefaria_translation.tracing import annotate, tracer
+
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
+R = TypeVar("R")
+
+POOL_CONFIG_PATH: Path = Path("llm_pool.json")
+
+# The key or endpoint is wrong, so the member is useless until someone fixes its configuration
+AUTH_STATUS_CODES = (401, 403)
+
+
+@dataclass
+class MemberConfig:
+    name: str
+    api_key: Optional[str] = field(default=None, repr=False)
+    api_key_env: Optional[str] = None  # Environment variable holding the key, used if api_key is not set
+    base_url: Optional[str] = None  # None for the default Anthropic endpoint
+    max_concurrency: int = 8
+
+    def key(self) -> str:
+        if self.api_key:
+            return self.api_key
+        if self.api_key_env:
+            key = os.environ.get(self.api_key_env)
+            if not key:
+                raise Exception(f"Pool member {self.name}: {self.api_key_env} is not set")
+            return key
+        from sefaria_translation.claude import api_key
+
+        return api_key()
+
+
+class PoolMember:
+    def __init__(self, config: MemberConfig) -> None:
+        self.config = config
+        self.governor = ConcurrencyGovernor(
+            initial_limit=config.max_concurrency,
+            max_limit=config.max_concurrency,
+        )
+        self.cooldown_until = 0.0  # time.monotonic() until which no calls are routed here
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.busy_seconds = 0.0  # Total time spent in calls, summed over concurrent calls
+        self._client: Optional["Anthropic"] = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    @property
+    def client(self) -> "Anthropic":
+        """Created on first use and reused, so its connection pool is kept warm"""
+        with self._client_lock:
+            if self._client is None:
+                from anthropic import Anthropic
+
+                # Retries are left to the pool, so it can move them to another member
+                self._client = Anthropic(
+                    api_key=self.config.key(), base_url=self.config.base_url, max_retries=0
+                )
+            return self._client
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+
+class ClientPool:
+    """
+    Args:
+        cooldown: Seconds a failing member is left out of rotation
+        failure_threshold: Consecutive overloads or transient errors before a member cools down
+        max_retries: Retries of one call, across all members
+    """
+
+    def __init__(
+        self,
+        members: list[MemberConfig],
+        cooldown: float = 60.0,
+        failure_threshold: int = 3,
+        max_retries: int = 8,
+    ) -> None:
+        if not members:
+            raise ValueError("A client pool needs at least one member")
+        self.members = [PoolMember(config) for config in members]
+        self.cooldown = cooldown
+        self.failure_threshold = failure_threshold
+        self.max_retries = max_retries
+        self.started_at = time.monotonic()
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_config(cls, path: Path = POOL_CONFIG_PATH, **options: Any) -> Optional["ClientPool"]:
+        """The pool configured in a JSON file, or None if there is no file"""
+        if not path.exists():
+            return None
+        members = json.loads(path.read_text(encoding="utf-8"))
+        return cls([MemberConfig(**member) for member in members], **options)
+
+    def acquire(self) -> PoolMember:
+        """Takes a slot on the least loaded healthy member, waiting until one has a free slot"""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                healthy = sorted(
+                    (member for member in self.members if member.healthy(now)),
+                    key=lambda member: member.governor.load,
+                )
+                for member in healthy:
+                    if member.governor.try_acquire():
+                        return member
+                # Wake when a slot is released, or when the first cool-down ends
+                cooling = [member.cooldown_until - now for member in self.members if not member.healthy(now)]
+                self._condition.wait(timeout=min(cooling) if cooling else None)
+
+    def release(self, member: PoolMember, seconds: float) -> None:
+        member.governor.release()
+        with self._condition:
+            member.busy_seconds += seconds
+            self._condition.notify_all()
+
+    def on_success(self, member: PoolMember) -> None:
+        member.governor.on_success()
+        with self._condition:
+            member.calls += 1
+            member.consecutive_failures = 0
+
+    def on_failure(self, member: PoolMember, error: Exception) -> None:
+        """Counts a failed call, and takes the member out of rotation if it keeps failing"""
+        if is_overload(error):
+            member.governor.on_overload()
+        with self._condition:
+            member.calls += 1
+            member.failures += 1
+            member.consecutive_failures += 1
+            cooldown = 0.0
+            if status_code(error) in AUTH_STATUS_CODES or member.consecutive_failures >= self.failure_threshold:
+                cooldown = self.cooldown
+            server_delay = retry_after(error)
+            if server_delay is not None:
+                # The key is rate limited for this long, other members can take its calls meanwhile
+                cooldown = max(cooldown, server_delay)
+            if cooldown:
+                member.cooldown_until = max(member.cooldown_until, time.monotonic() + cooldown)
+                print(f"LLM pool member {member.name} out of rotation for {cooldown:.0f}s after: {error}")
+            self._condition.notify_all()
+
+    def call(self, fn: Callable[[PoolMember], R]) -> R:
+        """
+        Calls fn with the least loaded healthy member. Overloads and transient errors are retried, on
+        another member where there is one. Rejected keys are retried only on another healthy member.
+        Other errors are raised. Every failure is counted against its member.
+        """
+        attempt = 0
+        while True:
+            member = self.acquire()
+            annotate(pool_member=member.name, retries=attempt)
+            start = time.monotonic()
+            try:
+                result = fn(member)
+            except Exception as e:
+                self.release(member, time.monotonic() - start)
+                self.on_failure(member, e)
+                rejected = status_code(e) in AUTH_STATUS_CODES
+                if not (is_overload(e) or is_transient(e) or rejected) or attempt >= self.max_retries:
+                    raise
+                # A rejected key will not recover by waiting out its cool-down, so fail unless another member can retry
+                if rejected and not any(other is not member and other.healthy(time.monotonic()) for other in self.members):
+                    raise
+                error = e
+            else:
+                self.release(member, time.monotonic() - start)
+                self.on_success(member)
+                return result
+
+            attempt += 1
+            now = time.monotonic()
+            # Another member can take the retry straight away, otherwise back off like a single client
+            if not any(other is not member and other.healthy(now) for other in self.members):
+                time.sleep(member.governor.backoff_delay(attempt - 1, error) if member.healthy(now) else 0)
+
+    def ask(self, prompt: str) -> str:
+        """llm_generation function for ChapterTranslator, like claude.ask_claude but spread over the pool"""
+        from sefaria_translation.claude import MODEL, message_params, response_text
+
+        with tracer.span("llm_call", requested_model=MODEL):
+            message = self.call(
+                lambda member: member.client.messages.create(**message_params(prompt))
+            )
+            return response_text(message)
+
+    def utilization(self) -> dict[str, dict[str, Any]]:
+        """Per member: calls, failures, current limit and in-flight calls, average calls in flight, cool-down left"""
+        with self._condition:
+            elapsed = max(time.monotonic() - self.started_at, 1e-9)
+            now = time.monotonic()
+            return {
+                member.name: {
+                    "calls": member.calls,
+                    "failures": member.failures,
+                    "in_flight": member.governor.in_flight,
+                    "limit": member.governor.current_limit,
+                    "average_in_flight": member.busy_seconds / elapsed,
+                    "cooldown_left": max(0.0, member.cooldown_until - now),
+                }
+                for member in self.members
+            }
+
+    def status(self) -> str:
+        lines = ["LLM pool:"]
+        for name, usage in self.utilization().items():
+            state = f", cooling down {usage['cooldown_left']:.0f}s" if usage["cooldown_left"] else ""
+            lines.append(
+                f"  {name}: {usage['calls']} calls, {usage['failures']} failed, "
+                f"{usage['in_flight']}/{usage['limit']} in flight, "
+                f"{usage['average_in_flight']:.1f} on average{state}"
+            )
+        return "\n".join(lines)
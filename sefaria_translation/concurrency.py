@@ -0,0 +1,204 @@
+# concurrency.py
+"""
+Process-wide concurrency control for LLM calls.
+
+All calls share one ConcurrencyGovernor, which limits how many are in flight at once.
+The limit grows additively while calls succeed and is cut multiplicatively when the API
+reports overload (529) or rate limiting (429), so a run slows down under load instead of dying.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional, TypeVar
+from sefaria_translation.tracing import annotate
+
+R = TypeVar("R")
+
+OVERLOAD_STATUS_CODES = (429, 529)
+TRANSIENT_STATUS_CODES = (500, 502, 503, 504)
+TRANSIENT_ERROR_NAMES = ("APIConnectionError", "APITimeoutError")
+
+
+def status_code(error: Exception) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_overload(error: Exception) -> bool:
+    if status_code(error) in OVERLOAD_STATUS_CODES:
+        return True
+    error_message = str(error).lower()
+    return "overloaded_error" in error_message or "error code: 529" in error_message
+
+
+def is_transient(error: Exception) -> bool:
+    """Errors worth retrying that do not mean the API wants us to slow down"""
+    return (
+        status_code(error) in TRANSIENT_STATUS_CODES
+        or type(error).__name__ in TRANSIENT_ERROR_NAMES
+    )
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait according to the retry-after headers of an API error, if it has them"""
+    response: Any = getattr(error, "response", None)
+    headers: Any = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class ConcurrencyGovernor:
+    """
+    Additive increase / multiplicative decrease limit on in-flight calls.
+
+    Each success raises the limit by increase / limit, so it grows by about `increase`
+    for every limit-worth of successful calls. An overload cuts it by decrease_factor,
+    at most once per cut_interval so a burst of failures from one spike only counts once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        cut_interval: float = 2.0,
+        max_retries: int = 8,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        if not min_limit <= initial_limit <= max_limit:
+            raise ValueError("initial_limit must be between min_limit and max_limit")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cut_interval = cut_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.in_flight = 0
+        self.retries = 0
+        self.overloads = 0
+        self._last_cut = float("-inf")
+        self._condition = threading.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= self.current_limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """Takes a slot if one is free, without waiting"""
+        with self._condition:
+            if self.in_flight >= self.current_limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    @property
+    def load(self) -> float:
+        """Fraction of the current limit in flight"""
+        return self.in_flight / self.current_limit
+
+    def release(self) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+    def on_overload(self) -> None:
+        with self._condition:
+            self.overloads += 1
+            now = time.monotonic()
+            if now - self._last_cut >= self.cut_interval:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_cut = now
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, but never shorter than the server's retry-after"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        server_delay = retry_after(error)
+        if server_delay is not None:
+            delay = max(delay, server_delay)
+        return delay
+
+    def call(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Calls fn once a slot is free, retrying overloaded and transient errors with backoff.
+        Other errors, and the last error once max_retries is used up, are raised.
+        """
+        attempt = 0
+        while True:
+            annotate(retries=attempt)
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                overloaded = is_overload(e)
+                if not (overloaded or is_transient(e)) or attempt >= self.max_retries:
+                    raise
+                if overloaded:
+                    self.on_overload()
+                error = e
+            else:
+                self.on_success()
+                return result
+            finally:
+                self.release()
+
+            delay = self.backoff_delay(attempt, error)
+            attempt += 1
+            with self._condition:
+                self.retries += 1
+            print(
+                f"LLM call failed ({error}), retry {attempt}/{self.max_retries} in {delay:.1f}s. "
+                f"Concurrency limit is {self.current_limit}."
+            )
+            time.sleep(delay)
+
+    def wrap(self, generation: Callable[[str], str]) -> Callable[[str], str]:
+        """Wraps an llm_generation function so every call goes through this governor"""
+
+        def governed_generation(prompt: str) -> str:
+            return self.call(generation, prompt)
+
+        return governed_generation
+
+    def status(self) -> str:
+        return (
+            f"Concurrency: limit={self.current_limit}, in flight={self.in_flight}, "
+            f"overloads={self.overloads}, retries={self.retries}"
+        )
+
+
+# Shared by every LLM call in the process
+llm_governor = ConcurrencyGovernor()
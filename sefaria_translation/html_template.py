@@ -0,0 +1,74 @@
+# html_template.py
+"""
+HTML rendering shared by the site builder and the old per-chapter HTML saver.
+The site builder fingerprints this file, so editing it re-renders every page on the next build.
+"""
+from datetime import datetime
+from typing import Optional
+
+
+def create_html_template(
+    title: str, content: str, disclaimer: str, styles: Optional[str] = None
+) -> str:
+    """
+    Creates an HTML document from components
+    """
+    default_styles = """
+        .passage { margin-bottom: 2em; }
+        .hebrew { direction: rtl; margin-bottom: 1em; }
+        nav { margin-bottom: 2em; }
+        footer { margin-top: 3em; font-size: 0.8em; color: #666; }
+    """
+
+    return f"""<!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>{title}</title>
+        <style>
+            {styles or default_styles}
+        </style>
+    </head>
+    <body>
+        <main>
+            <h3>{title}</h3>
+            {content}
+        </main>
+        {disclaimer}
+    </body>
+    </html>
+    """
+
+
+def get_disclaimer(retrieved_at: Optional[datetime] = None) -> str:
+    """retrieved_at is when the Hebrew was fetched from Sefaria. The date is left out if it is not known."""
+    retrieved = f"\n            on {retrieved_at.strftime('%Y-%m-%d')}" if retrieved_at is not None else ""
+    return f"""
+        <footer>
+            <p>Disclaimer: The English text is translated by AI and may not be 100% accurate.
+            The original Hebrew text was retrieved from
+            <a href="https://sefaria.org" target="_blank">sefaria.org</a>{retrieved}.</p>
+        </footer>
+        """
+
+
+def format_translations(translations: list[tuple[str, str]]) -> str:
+    """Format (hebrew, english) pairs as HTML"""
+    return "\n\n".join(
+        f"<div class='passage'>\n"
+        f"<div class='hebrew'>{hebrew}</div>\n"
+        f"<div class='english'>{english}</div>\n"
+        "</div>"
+        for hebrew, english in translations
+    )
+
+
+def format_links(links: list[tuple[str, str]]) -> str:
+    """Format (href, text) pairs as an HTML list"""
+    items = "\n".join(f"<li><a href='{href}'>{text}</a></li>" for href, text in links)
+    return f"<ul>\n{items}\n</ul>"
+
+
+def format_nav(links: list[tuple[str, str]]) -> str:
+    """Format (href, text) pairs as a navigation bar"""
+    return "<nav>" + " | ".join(f"<a href='{href}'>{text}</a>" for href, text in links) + "</nav>"
@@ -0,0 +1,290 @@
+# job_queue.py
+"""
+Durable work queue of chapters, shared by every worker on every machine of a run.
+
+Each (title, section, chapter) is one row. A worker claims the biggest pending chapter with a lease,
+renews the lease with heartbeats while it translates, and marks the chapter done or failed.
+A lease that is not renewed, because its worker crashed, expires and the chapter is claimed again.
+A chapter that fails max_attempts times is moved to `dead` and left for a person to look at.
+
+    pending -> leased -> done
+                      -> pending (failed or lease expired, attempts left)
+                      -> dead    (no attempts left)
+
+The queue is one SQLite file. Claims take the write lock, so two workers never get the same chapter.
+It uses a rollback journal rather than WAL, since WAL needs shared memory that only works on one host:
+machines can share the file on a network volume, as long as the volume supports POSIX file locks
+(NFS with a lock manager does, some SMB and FUSE mounts do not).
+
+Usage:
+    queue = JobQueue()
+    queue.enqueue("Pardes_Rimmonim", [(30, 1, 12_000), (30, 2, 8_000)])
+    while (lease := queue.claim("worker-1")) is not None:
+        with queue.keep_alive(lease):
+            ...
+        queue.complete(lease)
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+QUEUE_PATH: Path = Path("saved_translations/jobs.sqlite3")
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+
+@dataclass
+class Lease:
+    title: str
+    section_num: int
+    chapter_num: int
+    worker: str
+    attempt: int  # 1 for the first claim of the chapter
+    expires_at: float  # time.time() at which the lease is up for grabs
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return (self.section_num, self.chapter_num)
+
+
+def worker_id(index: int = 0) -> str:
+    """Unique across the machines and processes of a run"""
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+class JobQueue:
+    """
+    Args:
+        lease_seconds: How long a claim holds without a heartbeat
+        max_attempts: Claims of a chapter before it is moved to dead
+    """
+
+    def __init__(
+        self, path: Path = QUEUE_PATH, lease_seconds: float = 600, max_attempts: int = 3
+    ) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Opens this thread's connection on first use"""
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    title TEXT NOT NULL,
+                    section_num INTEGER NOT NULL,
+                    chapter_num INTEGER NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_expires REAL,
+                    last_error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (title, section_num, chapter_num)
+                ) WITHOUT ROWID"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, priority)"
+            )
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Takes the write lock for the whole block, so a read and the update after it can not interleave"""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def enqueue(
+        self, title: str, jobs: Iterable[tuple[int, int, int]], reopen_done: bool = False
+    ) -> int:
+        """
+        Adds (section_num, chapter_num, priority) jobs, biggest priority claimed first.
+        Chapters already in the queue keep their state, unless reopen_done puts finished ones back,
+        e.g. to translate them again. Returns the number added or reopened.
+        """
+        now = time.time()
+        jobs = list(jobs)
+        with self.transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO jobs (title, section_num, chapter_num, priority, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (title, section_num, chapter_num, priority, PENDING, now)
+                    for section_num, chapter_num, priority in jobs
+                ),
+            )
+            if reopen_done:
+                connection.executemany(
+                    "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? "
+                    "WHERE title = ? AND section_num = ? AND chapter_num = ? AND status = ?",
+                    (
+                        (PENDING, now, title, section_num, chapter_num, DONE)
+                        for section_num, chapter_num, _ in jobs
+                    ),
+                )
+            return connection.total_changes - before
+
+    def _expire_leases(self, connection: sqlite3.Connection, now: float) -> None:
+        """Returns chapters whose worker stopped sending heartbeats to the queue, or to dead"""
+        connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "worker = NULL, lease_expires = NULL, last_error = 'lease expired', updated_at = ? "
+            "WHERE status = ? AND lease_expires < ?",
+            (self.max_attempts, DEAD, PENDING, now, LEASED, now),
+        )
+
+    def claim(self, worker: str, title: Optional[str] = None) -> Optional[Lease]:
+        """Leases the biggest pending chapter, of one title or any. None once nothing is pending."""
+        now = time.time()
+        title_filter = "AND title = ?" if title is not None else ""
+        with self.transaction() as connection:
+            self._expire_leases(connection, now)
+            row = connection.execute(
+                f"SELECT title, section_num, chapter_num, attempts FROM jobs WHERE status = ? {title_filter} "
+                "ORDER BY priority DESC, section_num, chapter_num LIMIT 1",
+                (PENDING, title) if title is not None else (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            job_title, section_num, chapter_num, attempts = row
+            expires_at = now + self.lease_seconds
+            connection.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, worker = ?, lease_expires = ?, updated_at = ? "
+                "WHERE title = ? AND section_num = ? AND chapter_num = ?",
+                (LEASED, attempts + 1, worker, expires_at, now, job_title, section_num, chapter_num),
+            )
+        return Lease(job_title, section_num, chapter_num, worker, attempts + 1, expires_at)
+
+    def _update_lease(self, lease: Lease, assignments: str, params: tuple[object, ...]) -> bool:
+        """Applies an update only while the lease is still held. Returns whether it was."""
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? "
+                "WHERE title = ? AND section_num = ? AND chapter_num = ? AND status = ? AND worker = ?",
+                (*params, time.time(), lease.title, lease.section_num, lease.chapter_num, LEASED, lease.worker),
+            )
+            return cursor.rowcount == 1
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extends a lease. False if it already expired and may have been claimed by another worker."""
+        expires_at = time.time() + self.lease_seconds
+        held = self._update_lease(lease, "lease_expires = ?", (expires_at,))
+        if held:
+            lease.expires_at = expires_at
+        return held
+
+    def complete(self, lease: Lease) -> bool:
+        return self._update_lease(
+            lease, "status = ?, worker = NULL, lease_expires = NULL, last_error = NULL", (DONE,)
+        )
+
+    def fail(self, lease: Lease, error: str) -> bool:
+        """Puts the chapter back for another attempt, or moves it to dead after max_attempts"""
+        status = DEAD if lease.attempt >= self.max_attempts else PENDING
+        return self._update_lease(
+            lease, "status = ?, worker = NULL, lease_expires = NULL, last_error = ?", (status, error)
+        )
+
+    def release(self, lease: Lease) -> bool:
+        """Gives a chapter back without counting the attempt, e.g. when a worker is stopped"""
+        return self._update_lease(
+            lease,
+            "status = ?, attempts = attempts - 1, worker = NULL, lease_expires = NULL",
+            (PENDING,),
+        )
+
+    @contextmanager
+    def keep_alive(self, lease: Lease) -> Iterator[threading.Event]:
+        """
+        Sends heartbeats on a background thread every third of the lease until the block ends.
+        The yielded event is set if the lease is lost, so the work can be abandoned.
+        """
+        stopped = threading.Event()
+        lost = threading.Event()
+
+        def beat() -> None:
+            while not stopped.wait(self.lease_seconds / 3):
+                if not self.heartbeat(lease):
+                    lost.set()
+                    return
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield lost
+        finally:
+            stopped.set()
+            thread.join()
+
+    def counts(self, title: Optional[str] = None) -> dict[str, int]:
+        """
+        Number of chapters in each state.
+        Expired leases are counted where the next claim will move them, but left for it to update,
+        so reading the counts never takes the write lock from the workers.
+        """
+        rows = self.connection.execute(
+            "SELECT CASE WHEN status = ? AND lease_expires < ? "
+            "THEN CASE WHEN attempts >= ? THEN ? ELSE ? END ELSE status END AS state, COUNT(*) "
+            "FROM jobs WHERE ? IS NULL OR title = ? GROUP BY state",
+            (LEASED, time.time(), self.max_attempts, DEAD, PENDING, title, title),
+        )
+        counts = {status: 0 for status in (PENDING, LEASED, DONE, DEAD)}
+        counts.update(dict(rows.fetchall()))
+        return counts
+
+    def dead_jobs(self, title: Optional[str] = None) -> list[tuple[str, int, int, str]]:
+        """(title, section_num, chapter_num, last_error) of every chapter out of attempts, like counts"""
+        rows = self.connection.execute(
+            "SELECT title, section_num, chapter_num, CASE WHEN status = ? THEN 'lease expired' ELSE last_error END "
+            "FROM jobs WHERE (status = ? OR (status = ? AND lease_expires < ? AND attempts >= ?)) "
+            "AND (? IS NULL OR title = ?) ORDER BY title, section_num, chapter_num",
+            (LEASED, DEAD, LEASED, time.time(), self.max_attempts, title, title),
+        )
+        return rows.fetchall()
+
+    def retry_dead(self, title: Optional[str] = None) -> int:
+        """Gives dead chapters a fresh set of attempts. Returns how many."""
+        with self.transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? "
+                "WHERE status = ? AND (? IS NULL OR title = ?)",
+                (PENDING, time.time(), DEAD, title, title),
+            )
+            return cursor.rowcount
+
+    def status(self, title: Optional[str] = None) -> str:
+        counts = self.counts(title)
+        return ", ".join(f"{count} {status}" for status, count in counts.items())
+
+    def close(self) -> None:
+        """Closes this thread's connection"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
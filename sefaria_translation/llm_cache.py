@@ -0,0 +1,182 @@
+# llm_cache.py
+"""
+Persistent cache of LLM responses, so re-running a gate does not pay for the same completions twice.
+
+Usage:
+    cache = LLMCache()
+    generation = cache.wrap(ask_claude, MODEL, MAX_TOKENS)
+    translator = ChapterTranslator(chapter_ref, chapter, generation)
+
+    with refreshing():
+        translator.translate_chapter()  # Calls the LLM again, and caches the new responses
+"""
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from sefaria_translation.tracing import annotate
+from sefaria_translation.translation_prompt import PROMPT_VERSION
+
+CACHE_PATH: Path = Path("llm_cache/responses.sqlite3")
+
+# Eviction is checked after this many writes, rather than on every write
+EVICT_EVERY: int = 100
+
+_refresh: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_refresh", default=False)
+
+
+@contextmanager
+def refreshing(refresh: bool = True) -> Iterator[None]:
+    """
+    Within the block, wrapped generations ignore cached responses and cache the new ones,
+    e.g. to translate chapters again with unchanged prompts. Follows the context into threads that copy it.
+    """
+    token = _refresh.set(refresh)
+    try:
+        yield
+    finally:
+        _refresh.reset(token)
+
+
+class LLMCache:
+    """
+    SQLite cache of responses keyed on a hash of the prompt, model, max_tokens and prompt version.
+
+    The database runs in WAL mode, so several processes can share one cache file.
+    Each thread gets its own connection, so a single cache can be used by concurrent translators.
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_PATH,
+        max_bytes: Optional[int] = 500_000_000,
+        max_age: Optional[timedelta] = timedelta(days=180),
+        prompt_version: int = PROMPT_VERSION,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Opens this thread's connection on first use"""
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )"""
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def key(self, prompt: str, model: str, max_tokens: int) -> str:
+        data = json.dumps(
+            [str(prompt), model, max_tokens, self.prompt_version], ensure_ascii=False
+        )
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is not None and (
+            self.max_age is None or now - row[1] <= self.max_age.total_seconds()
+        ):
+            self.connection.execute(
+                "UPDATE responses SET used_at = ? WHERE key = ?", (now, key)
+            )
+            with self._lock:
+                self.hits += 1
+            return row[0]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, response, len(response.encode("utf-8")), now, now),
+        )
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes expired responses, then the least recently used ones until the cache fits in max_bytes"""
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if self.max_age is not None:
+                connection.execute(
+                    "DELETE FROM responses WHERE created_at < ?",
+                    (time.time() - self.max_age.total_seconds(),),
+                )
+            if self.max_bytes is not None:
+                connection.execute(
+                    """DELETE FROM responses WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS total
+                            FROM responses
+                        ) WHERE total > ?
+                    )""",
+                    (self.max_bytes,),
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def wrap(
+        self, generation: Callable[[str], str], model: str, max_tokens: int
+    ) -> Callable[[str], str]:
+        """
+        Wraps an llm_generation function so its responses are cached.
+        The model and max_tokens must be the ones the generation function actually uses.
+        """
+
+        def cached_generation(prompt: str) -> str:
+            key = self.key(prompt, model, max_tokens)
+            response = None if _refresh.get() else self.get(key)
+            if response is None:
+                response = generation(prompt)
+                self.put(key, response)
+            else:
+                annotate(cache_hit=True)
+            return response
+
+        return cached_generation
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0
+        return f"LLM cache: {self.hits} hits, {self.misses} misses ({hit_rate:.0%} hit rate)"
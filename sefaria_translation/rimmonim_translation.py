@@ -1,11 +1,85 @@
 # rimmonim_translation.py:
 from sefaria_translation.sefaria_api.fetch_sefaria_text import fetch_sefaria_text, clean_text
-from sefaria_translation.chapter_translator import ChapterTranslator
+from sefaria_translation.chapter_translator import ChapterTranslator, TranslationInterrupted
+from sefaria_translation.checkpoint import PassageCheckpoint
 from sefaria_translation.text_reference import TextReference, ChapterReference
-from sefaria_translation.save_translation import SaveTranslation
+from sefaria_translation.claude import MAX_TOKENS, MODEL, ask_claude, token_usage
+from sefaria_translation.llm_cache import LLMCache, refreshing
+from sefaria_translation.concurrency import llm_governor
+from sefaria_translation.scheduler import ETATracker, estimate_chapter_tokens, longest_first
+from sefaria_translation.translation_prompt import PROMPT_VERSION, ContextPolicy
+from sefaria_translation.translation_store import OverwritePolicy, StoredChapter, TranslationStore, saved_prompt_version, should_overwrite
+from sefaria_translation.tracing import tracer
+from sefaria_translation.job_queue import JobQueue, worker_id
+from sefaria_translation.client_pool import ClientPool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from dataclasses import dataclass
 from pathlib import Path
 import json
-from typing import TypeGuard
+import math
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeGuard
+
+if TYPE_CHECKING:
+    # Loads numpy, so it is imported where a run builds its memory
+    from sefaria_translation.translation_memory import TranslationMemory
+
+# The largest chapters are too big to send whole with every passage, so they get the passages around it.
+# Chapters up to ContextPolicy.full_chapter_max_tokens still get the full chapter.
+context_policy = ContextPolicy(token_budget=20_000)
+
+TITLE = "Pardes_Rimmonim"
+SAVE_DIR = Path("saved_translations_json/pardes_rimmonim")
+
+# Like claude.get_client, these are only created on first use, so importing this module
+# reads no configuration and creates no files
+_client_pool: Optional[ClientPool] = None
+_client_pool_loaded = False
+_llm_cache: Optional[LLMCache] = None
+_cached_generation: Optional[Callable[[str], str]] = None
+_translation_store: Optional[TranslationStore] = None
+_lazy_lock = threading.Lock()
+
+
+def get_client_pool() -> Optional[ClientPool]:
+    """The pool configured in llm_pool.json, which spreads calls over several API keys or endpoints. None without one."""
+    global _client_pool, _client_pool_loaded
+    with _lazy_lock:
+        if not _client_pool_loaded:
+            _client_pool = ClientPool.from_config()
+            _client_pool_loaded = True
+        return _client_pool
+
+
+def get_llm_cache() -> LLMCache:
+    """Completions are cached on disk, so re-running a gate after a crash does not pay for them again"""
+    global _llm_cache
+    with _lazy_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
+
+
+def get_translation_store() -> TranslationStore:
+    """Saved chapters are committed to the store first, then exported to the JSON layout in SAVE_DIR"""
+    global _translation_store
+    with _lazy_lock:
+        if _translation_store is None:
+            _translation_store = TranslationStore()
+        return _translation_store
+
+
+def cached_ask_claude(prompt: str) -> str:
+    """llm_generation function of every chapter: the client pool, or ask_claude without one, behind the LLM cache"""
+    global _cached_generation
+    if _cached_generation is None:
+        client_pool = get_client_pool()
+        generation = get_llm_cache().wrap(client_pool.ask if client_pool is not None else ask_claude, MODEL, MAX_TOKENS)
+        with _lazy_lock:
+            if _cached_generation is None:
+                _cached_generation = generation
+    return _cached_generation(prompt)
+
 
 def is_list_of_str_lists(obj: object) -> TypeGuard[list[list[str]]]:
     return (isinstance(obj, list) and
@@ -15,80 +89,331 @@ def is_list_of_str_lists(obj: object) -> TypeGuard[list[list[str]]]:
 def fetch_gate (gate_num: int) -> list[list[str]]:
     gate_ref = TextReference("Pardes_Rimmonim", gate_num)
     gate_ref.section_name = "Gate"
-    gate_text = fetch_sefaria_text(gate_ref)
+    with tracer.span("fetch", gate=gate_num):
+        gate_text = fetch_sefaria_text(gate_ref)
     if not is_list_of_str_lists(gate_text):
         raise TypeError("Expected list[list[str]]")
     return [clean_text(chapter) for chapter in gate_text]
 
 
-def translate_chapter (chapter_text: list[str], gate_num: int, chapter_num: int ) -> list[tuple[str, str]]:
-
+def chapter_ref(gate_num: int, chapter_num: int) -> ChapterReference:
     chapt_ref = ChapterReference("Pardes_Rimmonim", gate_num, chapter_num)
     chapt_ref.section_name = "Gate"
-    translator = ChapterTranslator(chapt_ref, chapter_text)
-    translation:list[tuple[str, str]] = translator.translate_chapter()
+    return chapt_ref
+
+
+# Set to stop all running chapters cleanly, e.g. on Ctrl-C
+stop_event = threading.Event()
+
+
+class LeaseLost(Exception):
+    """Raised when a chapter's queue lease expired before it could be saved"""
+
+def chapter_translator(chapter_text: list[str], gate_num: int, chapter_num: int, pack_token_budget: Optional[int] = None, translation_memory: Optional["TranslationMemory"] = None, cancel_event: Optional[threading.Event] = None) -> ChapterTranslator:
+    chapt_ref = chapter_ref(gate_num, chapter_num)
+    translator = ChapterTranslator(chapt_ref, chapter_text, cached_ask_claude, pack_token_budget, stop_event=stop_event, context_policy=context_policy, translation_memory=translation_memory, cancel_event=cancel_event)
+    # Picks up any passages completed by an earlier, interrupted run
+    return ChapterTranslator.resume(translator, PassageCheckpoint.for_chapter(chapt_ref))
+
+def translate_chapter (chapter_text: list[str], gate_num: int, chapter_num: int, max_concurrency: int = 1, pack_token_budget: Optional[int] = None) -> list[tuple[str, str]]:
+    translator = chapter_translator(chapter_text, gate_num, chapter_num, pack_token_budget)
+    translation:list[tuple[str, str]] = translator.translate_chapter(max_concurrency)
     return translation
 
-def save_chapter_translation(translation: list[tuple[str, str]], gate_num: int, chapter_num: int) -> None:
-    # Create directory structure if it doesn't exist
-    save_dir = Path("saved_translations_json/pardes_rimmonim")
-    save_dir.mkdir(parents=True, exist_ok=True)
+def save_chapter_translation(translation: list[tuple[str, str]], gate_num: int, chapter_num: int, calls: Optional[list[Optional[dict[str, Any]]]] = None, model: Optional[str] = None) -> None:
+    """
+    Args:
+        calls: LLM call metadata for each passage (see ChapterTranslator.call_metadata)
+        model: The model that actually answered, defaults to the one requested
+    """
+    with tracer.span("save", gate=gate_num, chapter=chapter_num):
+        _save_chapter_translation(translation, gate_num, chapter_num, calls, model or MODEL)
 
-    # Create filename
-    filename = f"pardes_rimmonim_{gate_num}_{chapter_num}.json"
-    filepath = save_dir / filename
+def _save_chapter_translation(translation: list[tuple[str, str]], gate_num: int, chapter_num: int, calls: Optional[list[Optional[dict[str, Any]]]], model: str) -> None:
+    get_translation_store().save_chapter(
+        StoredChapter(TITLE, gate_num, chapter_num, translation, model=model, metadata={"prompt_version": PROMPT_VERSION, "calls": calls})
+    )
+
+    # Create directory structure if it doesn't exist
+    SAVE_DIR.mkdir(parents=True, exist_ok=True)
+    filepath = saved_json_path(gate_num, chapter_num)
 
     # Convert list of tuples to list of dictionaries for better JSON formatting
-    translation_dict = {
+    translation_dict: dict[str, Any] = {
         "title": "Pardes Rimmonim",
         "gate_num": gate_num,
         "chapter_num": chapter_num,
+        "model": model,
+        "prompt_version": PROMPT_VERSION,
         "translation": [{"hebrew": heb, "english": eng} for heb, eng in translation]
     }
+    if calls is not None:
+        for passage, call in zip(translation_dict["translation"], calls):
+            if call is not None:
+                passage["llm_call"] = call
 
     # Write to JSON file
     with open(filepath, 'w', encoding='utf-8') as f:
         json.dump(translation_dict, f, ensure_ascii=False, indent=2)
 
+def saved_json_path(gate_num: int, chapter_num: int) -> Path:
+    return SAVE_DIR / f"pardes_rimmonim_{gate_num}_{chapter_num}.json"
+
 def check_translation_exists(gate_num: int, chapter_num: int) -> bool:
-    save_dir = Path("saved_translations_json/pardes_rimmonim")
-    filename = f"pardes_rimmonim_{gate_num}_{chapter_num}.json"
-    filepath = save_dir / filename
-    return filepath.exists()
+    if get_translation_store().exists(TITLE, gate_num, chapter_num):
+        return True
+    return saved_json_path(gate_num, chapter_num).exists()
 
-def translate_gate(gate_num: int):
-    gate_text = fetch_gate(gate_num)
+@dataclass
+class ChapterJob:
+    gate_num: int
+    chapter_num: int
+    chapter_text: list[str]
 
+    @property
+    def estimated_tokens(self) -> int:
+        return estimate_chapter_tokens(chapter_ref(self.gate_num, self.chapter_num), self.chapter_text, context_policy).total_tokens
 
+
+def pending_chapters(gate_num: int, overwrite: OverwritePolicy = "skip") -> list[ChapterJob]:
+    """
+    Fetches a gate and returns the chapters that have not been saved yet,
+    plus the saved chapters the overwrite policy translates again
+    """
+    gate_text = fetch_gate(gate_num)
+    # One query for the whole title, the JSON files are only checked for chapters missing from the store
+    stored = get_translation_store().prompt_versions(TITLE)
+    jobs: list[ChapterJob] = []
     for i, chapter_text in enumerate(gate_text):
         chapter_num = i + 1
-        if check_translation_exists(gate_num, chapter_num):
-            print(f"Skipping Gate {gate_num} Chapter {chapter_num} - translation already exists")
+        key = (gate_num, chapter_num)
+        if key in stored:
+            prompt_version = stored[key]
+        elif saved_json_path(gate_num, chapter_num).exists():
+            prompt_version = json_prompt_version(gate_num, chapter_num) if overwrite == "if-newer" else None
+        else:
+            jobs.append(ChapterJob(gate_num, chapter_num, chapter_text))
             continue
+        if should_overwrite(overwrite, prompt_version):
+            print(f"Translating Gate {gate_num} Chapter {chapter_num} again - saved with prompt version {prompt_version}")
+            jobs.append(ChapterJob(gate_num, chapter_num, chapter_text))
+        else:
+            print(f"Skipping Gate {gate_num} Chapter {chapter_num} - translation already exists")
+    return jobs
 
-        print(f"\nTranslating gate {gate_num}, chapter {chapter_num} / {len(gate_text)}.")
-        print(f"Chapter {chapter_num} has {len(chapter_text)} passages.")
 
-        translated_chapter: list[tuple[str, str]] = translate_chapter(chapter_text, gate_num, chapter_num)
-        save_chapter_translation(translated_chapter, gate_num, chapter_num)
+def json_prompt_version(gate_num: int, chapter_num: int) -> Optional[int]:
+    with open(saved_json_path(gate_num, chapter_num), encoding="utf-8") as f:
+        return saved_prompt_version(json.load(f))
 
 
+# Near-duplicate reuse is opt-in, since a passage that differs by a word can differ in meaning
+NEAR_DUPLICATE_THRESHOLD = 0.9
 
+def load_translation_memory(overwrite: OverwritePolicy = "skip", near_duplicates: bool = False) -> Optional["TranslationMemory"]:
+    """
+    Saved translations a run can reuse, only for exact repeats unless near_duplicates is set.
+    A run replacing saved chapters reuses none of them, and an if-newer run only reuses chapters saved with the current prompts.
+    """
+    from sefaria_translation.translation_memory import TranslationMemory
 
-def main() -> None:
+    if overwrite == "replace":
+        return None
+    threshold = NEAR_DUPLICATE_THRESHOLD if near_duplicates else math.inf
+    return TranslationMemory.from_corpus(SAVE_DIR, TITLE, PROMPT_VERSION if overwrite == "if-newer" else None, threshold=threshold)
 
-    # Meditation and divine names
-    translate_gate(21)
-    translate_gate(27)
-    translate_gate(30)
 
-    # Mystical communion
-    translate_gate(32)
+def run_chapter(job: ChapterJob, max_concurrency: int = 1, pack_token_budget: Optional[int] = None, translation_memory: Optional["TranslationMemory"] = None, lease_lost: Optional[threading.Event] = None, refresh_cache: bool = False) -> None:
+    """
+    Args:
+        lease_lost: Set when the chapter's queue lease is lost (see JobQueue.keep_alive). The translation stops
+            and nothing is saved, since the chapter may now belong to another worker.
+        refresh_cache: Call the LLM even for prompts in the LLM cache, as a replace run must
+    """
+    print(f"\nTranslating gate {job.gate_num}, chapter {job.chapter_num}.")
+    print(f"Chapter {job.chapter_num} has {len(job.chapter_text)} passages.")
+
+    with tracer.span("chapter", gate=job.gate_num, chapter=job.chapter_num, passages=len(job.chapter_text)), refreshing(refresh_cache):
+        translator = chapter_translator(job.chapter_text, job.gate_num, job.chapter_num, pack_token_budget, translation_memory, lease_lost)
+        translated_chapter: list[tuple[str, str]] = translator.translate_chapter(max_concurrency)
+        if lease_lost is not None and lease_lost.is_set():
+            raise LeaseLost(f"Lease on Gate {job.gate_num} Chapter {job.chapter_num} was lost, not saving it")
+        save_chapter_translation(translated_chapter, job.gate_num, job.chapter_num, translator.call_metadata(), translator.model_version)
+    PassageCheckpoint.for_chapter(chapter_ref(job.gate_num, job.chapter_num)).remove()
+
+
+def run_chapters(jobs: list[ChapterJob], workers: int = 1, max_concurrency: int = 1, pack_token_budget: Optional[int] = None, use_translation_memory: bool = True, overwrite: OverwritePolicy = "skip", near_duplicates: bool = False) -> dict[tuple[int, int], Exception]:
+    """
+    Translates and saves chapters on a pool of worker threads, biggest chapters first.
+    A failed chapter is recorded and the remaining chapters carry on.
+    With use_translation_memory, passages repeated from any saved chapter, or from a chapter
+    finished earlier in the run, reuse that translation instead of calling the LLM.
+    near_duplicates also reuses the translation of a nearly identical passage.
+
+    Returns:
+        The exception for each (gate_num, chapter_num) that failed
+    """
+    failures: dict[tuple[int, int], Exception] = {}
+    done = 0
+    sizes = {id(job): job.estimated_tokens for job in jobs}
+    jobs = longest_first(jobs, lambda job: sizes[id(job)])
+    eta = ETATracker(sum(sizes.values()))
+    stop_event.clear()
+    translation_memory = load_translation_memory(overwrite, near_duplicates) if use_translation_memory else None
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+    futures = {executor.submit(run_chapter, job, max_concurrency, pack_token_budget, translation_memory, refresh_cache=overwrite == "replace"): job for job in jobs}
+    try:
+        for future in as_completed(futures):
+            job = futures[future]
+            done += 1
+            eta.complete(sizes[id(job)])
+            error = future.exception()
+            if error is not None and not isinstance(error, Exception):
+                raise error
+            if error is None:
+                print(f"[{done}/{len(jobs)}] Saved Gate {job.gate_num} Chapter {job.chapter_num}. {eta.progress()}")
+            else:
+                failures[(job.gate_num, job.chapter_num)] = error
+                print(f"[{done}/{len(jobs)}] Failed Gate {job.gate_num} Chapter {job.chapter_num}: {error}")
+            print(token_usage.summary())
+            print(get_llm_cache().stats())
+            if translation_memory is not None:
+                print(translation_memory.stats())
+            client_pool = get_client_pool()
+            print(llm_governor.status() if client_pool is None else client_pool.status())
+    except KeyboardInterrupt:
+        print("\nInterrupted, waiting for in-flight passages to finish and be checkpointed...")
+        stop_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    if failures:
+        print(f"\n{len(failures)}/{len(jobs)} chapters failed:")
+        for (gate_num, chapter_num), error in sorted(failures.items()):
+            print(f"  Gate {gate_num} Chapter {chapter_num}: {error}")
+    return failures
+
+
+def run_queue(queue: JobQueue, workers: int = 1, max_concurrency: int = 1, pack_token_budget: Optional[int] = None, use_translation_memory: bool = True, known_jobs: Optional[list[ChapterJob]] = None, overwrite: OverwritePolicy = "skip", near_duplicates: bool = False) -> dict[tuple[int, int], Exception]:
+    """
+    Translates chapters claimed from a shared queue until none are left pending.
+    Any number of processes, on any number of machines, can run this against the same queue file,
+    and each chapter is only translated by the worker holding its lease.
+
+    Args:
+        known_jobs: Chapters already fetched. Chapters of other gates are fetched when they are claimed.
+
+    Returns:
+        The last exception for each (gate_num, chapter_num) this process failed and did not later finish
+    """
+    failures: dict[tuple[int, int], Exception] = {}
+    chapter_texts = {(job.gate_num, job.chapter_num): job.chapter_text for job in known_jobs or []}
+    fetch_lock = threading.Lock()
+    stop_event.clear()
+    translation_memory = load_translation_memory(overwrite, near_duplicates) if use_translation_memory else None
+
+    def chapter_text(gate_num: int, chapter_num: int) -> list[str]:
+        with fetch_lock:
+            if (gate_num, chapter_num) not in chapter_texts:
+                for i, text in enumerate(fetch_gate(gate_num)):
+                    chapter_texts[(gate_num, i + 1)] = text
+            return chapter_texts[(gate_num, chapter_num)]
 
+    def work(index: int) -> None:
+        worker = worker_id(index)
+        while not stop_event.is_set():
+            lease = queue.claim(worker, TITLE)
+            if lease is None:
+                return
+            lost: Optional[threading.Event] = None
+            try:
+                job = ChapterJob(lease.section_num, lease.chapter_num, chapter_text(*lease.key))
+                with queue.keep_alive(lease) as lost:
+                    run_chapter(job, max_concurrency, pack_token_budget, translation_memory, lost, overwrite == "replace")
+            except (TranslationInterrupted, LeaseLost):
+                if lost is not None and lost.is_set():
+                    # Another worker may have the chapter now, and it picks up the checkpoint
+                    print(f"Lease on Gate {lease.section_num} Chapter {lease.chapter_num} lost, moving on")
+                    continue
+                queue.release(lease)
+                return
+            except Exception as error:
+                failures[lease.key] = error
+                queue.fail(lease, f"{type(error).__name__}: {error}")
+                print(f"Failed Gate {lease.section_num} Chapter {lease.chapter_num} (attempt {lease.attempt}): {error}")
+                continue
+            except BaseException:
+                queue.release(lease)
+                raise
+            failures.pop(lease.key, None)
+            if not queue.complete(lease):
+                print(f"Lease on Gate {lease.section_num} Chapter {lease.chapter_num} expired before it was saved")
+            print(f"Saved Gate {lease.section_num} Chapter {lease.chapter_num}. Queue: {queue.status(TITLE)}")
+
+    threads = [threading.Thread(target=work, args=(index,), daemon=True) for index in range(max(workers, 1))]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        print("\nInterrupted, waiting for in-flight passages to finish and be checkpointed...")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        raise
+
+    print(token_usage.summary())
+    print(get_llm_cache().stats())
+    if translation_memory is not None:
+        print(translation_memory.stats())
+    client_pool = get_client_pool()
+    if client_pool is not None:
+        print(client_pool.status())
+    dead = queue.dead_jobs(TITLE)
+    if dead:
+        print(f"\n{len(dead)} chapters ran out of attempts:")
+        for _, gate_num, chapter_num, error in dead:
+            print(f"  Gate {gate_num} Chapter {chapter_num}: {error}")
+    return failures
+
+
+def translate_gates(gates: list[int], max_concurrency: int = 1, pack_token_budget: Optional[int] = None, workers: int = 1, queue: Optional[JobQueue] = None, overwrite: OverwritePolicy = "skip", near_duplicates: bool = False) -> dict[tuple[int, int], Exception]:
+    """
+    Translates the pending chapters of several gates, sharing one pool of workers across all of them.
+    With a queue, the chapters are added to it and the workers pull from it, so other machines
+    running the same gates against the same queue split the work instead of repeating it.
+    With overwrite "replace", start the run from one machine and join it from the others with "skip",
+    or each machine puts the finished chapters back in the queue.
+    """
+    jobs = [job for gate_num in gates for job in pending_chapters(gate_num, overwrite)]
+    if queue is None:
+        return run_chapters(jobs, workers, max_concurrency, pack_token_budget, overwrite=overwrite, near_duplicates=near_duplicates)
+    queue.enqueue(TITLE, [(job.gate_num, job.chapter_num, job.estimated_tokens) for job in jobs], reopen_done=overwrite != "skip")
+    return run_queue(queue, workers, max_concurrency, pack_token_budget, known_jobs=jobs, overwrite=overwrite, near_duplicates=near_duplicates)
+
+
+def translate_gate(gate_num: int, max_concurrency: int = 1, pack_token_budget: Optional[int] = None, workers: int = 1, queue: Optional[JobQueue] = None, overwrite: OverwritePolicy = "skip", near_duplicates: bool = False) -> dict[tuple[int, int], Exception]:
+    return translate_gates([gate_num], max_concurrency, pack_token_budget, workers, queue, overwrite, near_duplicates)
+
+
+DEFAULT_GATES = [
+    # Meditation and divine names
+    21,
+    27,
+    30,
+    # Mystical communion
+    32,
     # Prophecy
-    translate_gate(24)
-    translate_gate(31)
+    24,
+    31,
+]
+
+
+def main() -> None:
+    translate_gates(DEFAULT_GATES, workers=8)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
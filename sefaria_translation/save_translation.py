@@ -9,17 +9,25 @@ from sefaria_translation.schemas.whole_text_meta import WholeTextMeta
 from datetime import datetime
 from sefaria_translation.text_reference import TextReference
 from sefaria_translation.chapter_translator import ChapterTranslator
+from sefaria_translation.translation_prompt import PROMPT_VERSION
+from sefaria_translation.translation_store import OverwritePolicy, saved_prompt_version, should_overwrite
 from typing import Literal, Optional, Tuple
 
 OverwriteChoice = Literal["y", "n", "Y", "N"]
 
-
 class SaveTranslation:
     BASE_DIR: Path = Path("saved_translations")
-    _global_overwrite: Optional[Literal["Y", "N"]] = None
 
-    def __init__(self, meta: WholeTextMeta):
+    def __init__(self, meta: WholeTextMeta, overwrite: Optional[OverwritePolicy] = None):
+        """
+        Args:
+            overwrite: What to do with chapters that are already saved.
+                None asks on the terminal, so only use it for interactive runs.
+        """
         self.meta = meta
+        self.overwrite = overwrite
+        # Answer to "yes/no to all" when asking, kept for this instance only
+        self._overwrite_all: Optional[Literal["Y", "N"]] = None
 
         # Create directory structure for the whole work on initialization
         self.get_whole_text_path.mkdir(parents=True, exist_ok=True)
@@ -69,9 +77,9 @@ class SaveTranslation:
         Returns:
             bool: True if file should be overwritten, False otherwise
         """
-        # Check if we have a global choice
-        if self.__class__._global_overwrite is not None:
-            return self.__class__._global_overwrite
+        # Check if we have a choice for all files
+        if self._overwrite_all is not None:
+            return self._overwrite_all
 
         while True:
             choice = input(
@@ -86,9 +94,18 @@ class SaveTranslation:
 
             # Handle global choices
             if choice in ["Y", "N"]:
-                self.__class__._global_overwrite = choice
+                self._overwrite_all = choice
             return choice
 
+    def should_overwrite(self, file_path: Path) -> bool:
+        """Applies the overwrite policy to an existing file, asking only if there is none"""
+        if self.overwrite is None:
+            return self.prompt_overwrite(file_path).lower() == "y"
+        if self.overwrite == "if-newer":
+            data = json.loads(file_path.read_text(encoding="utf-8"))
+            return should_overwrite(self.overwrite, saved_prompt_version(data))
+        return should_overwrite(self.overwrite, None)
+
     def save_chapter(self, translator: ChapterTranslator) -> Tuple[int, bool]:
         """Saves a single chapter to json"""
         text_ref = translator.text_ref
@@ -96,18 +113,28 @@ class SaveTranslation:
             return (text_ref.chapter_num, False)
 
         file_path: Path = self.get_chapter_file_path(text_ref)
-        if file_path.exists() and self.prompt_overwrite(file_path).lower() == "n":
+        if file_path.exists() and not self.should_overwrite(file_path):
             print(f"Skipping existing: {file_path}")
             return (translator.chapter_num, True)
 
-        translation_tuples = enumerate(translator.zip_translations())
+        translation_tuples = enumerate(
+            zip(translator.zip_translations(), translator.call_metadata())
+        )
 
         passages = [
-            TranslatedPassage(hebrew, english, i + 1)
-            for i, (hebrew, english) in translation_tuples
+            TranslatedPassage(
+                hebrew=hebrew, english=english, passage_num=i + 1, llm_call=call
+            )
+            for i, ((hebrew, english), call) in translation_tuples
         ]
 
-        data = TranslatedChapter(text_ref.section_num, text_ref.chapter_num, passages)
+        data = TranslatedChapter(
+            section_num=text_ref.section_num,
+            chapter_num=text_ref.chapter_num,
+            passages=passages,
+            ai_model_version=translator.model_version,
+            prompt_version=PROMPT_VERSION,
+        )
 
         # Writes data to the file
         data.to_file(file_path)
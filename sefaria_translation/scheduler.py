@@ -0,0 +1,106 @@
+# scheduler.py
+"""
+Size-aware scheduling for multi-chapter runs.
+
+Chapter sizes vary from 1 passage to 244, and every passage prompt carries its chapter (or a window of it)
+as context, so the work per chapter varies by orders of magnitude. Starting the biggest chapters first
+(longest processing time first) keeps one huge chapter from running alone at the end of a parallel run.
+"""
+import time
+from dataclasses import dataclass, replace
+from threading import Lock
+from typing import Callable, Optional, TypeVar
+from sefaria_translation.text_reference import ChapterReference, PassageReference
+from sefaria_translation.translation_prompt import (
+    FULL_CHAPTER,
+    ContextPolicy,
+    estimate_tokens,
+    translation_prompt,
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class ChapterEstimate:
+    input_tokens: int
+    output_tokens: int  # The English is assumed to be about as long as the Hebrew
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+def estimate_chapter_tokens(
+    chapter_ref: ChapterReference,
+    chapter: list[str],
+    context_policy: ContextPolicy = FULL_CHAPTER,
+) -> ChapterEstimate:
+    """
+    Estimates the tokens needed to translate a chapter one passage per call.
+    The prompt is only built once, for the first passage. The rest is extrapolated from it
+    using the size of each passage's context.
+    """
+    if not chapter:
+        return ChapterEstimate(0, 0)
+    passage_ref = PassageReference.from_ref(replace(chapter_ref, passage_num=1))
+    prompt = translation_prompt(passage_ref, chapter, context_policy)
+    passage_tokens = [estimate_tokens(passage) for passage in chapter]
+
+    def context_tokens(passage_index: int) -> int:
+        start, end = context_policy.context_range(chapter, passage_index, passage_index)
+        return sum(passage_tokens[start:end])
+
+    # Everything in a prompt except the passage itself and its context
+    overhead = estimate_tokens(prompt) - passage_tokens[0] - context_tokens(0)
+    return ChapterEstimate(
+        input_tokens=sum(
+            overhead + context_tokens(i) + passage_tokens[i] for i in range(len(chapter))
+        ),
+        output_tokens=sum(passage_tokens),
+    )
+
+
+def longest_first(jobs: list[T], size: Callable[[T], int]) -> list[T]:
+    """
+    Orders jobs largest first. Handing them to a worker pool in this order is the
+    longest-processing-time-first rule, which keeps the makespan within 4/3 of optimal.
+    """
+    return sorted(jobs, key=size, reverse=True)
+
+
+class ETATracker:
+    """Throughput based progress and ETA, measured in estimated tokens"""
+
+    def __init__(self, total_tokens: int) -> None:
+        self.total_tokens = total_tokens
+        self.done_tokens = 0
+        self.start = time.monotonic()
+        self._lock = Lock()
+
+    def complete(self, tokens: int) -> None:
+        with self._lock:
+            self.done_tokens += tokens
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the throughput so far, or None before anything has finished"""
+        elapsed = time.monotonic() - self.start
+        if self.done_tokens == 0 or elapsed == 0:
+            return None
+        throughput = self.done_tokens / elapsed
+        return (self.total_tokens - self.done_tokens) / throughput
+
+    def progress(self) -> str:
+        percent = self.done_tokens / self.total_tokens if self.total_tokens else 1
+        eta = self.eta
+        eta_text = "unknown" if eta is None else format_duration(eta)
+        return f"{percent:.0%} of estimated tokens done, ETA {eta_text}"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m{seconds:02d}s"
@@ -1,6 +1,6 @@
 # schemas.py
 from datetime import datetime
-from typing import Literal
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, Field
 from pathlib import Path
 
@@ -17,6 +17,8 @@ class TranslatedPassage(BaseSchema):
     hebrew: str
     english: str
     passage_num: int
+    # What the LLM call reported: model, tokens, stop_reason, retries... (see ChapterTranslator.calls)
+    llm_call: Optional[dict[str, Any]] = None
     type: Literal["TranslatedPassage"] = "TranslatedPassage"
 
 
@@ -27,7 +29,10 @@ class TranslatedChapter(BaseSchema):
     passages: list[TranslatedPassage]
     retrieved_at: datetime = Field(default_factory=datetime.now)
     translated_at: datetime = Field(default_factory=datetime.now)
-    ai_model_version: str = "claude-3-sonnet-20240229"
+    # The model that actually answered, as reported by the API. None if unknown.
+    ai_model_version: Optional[str] = None
+    # PROMPT_VERSION of the prompts the chapter was translated with. None if unknown.
+    prompt_version: Optional[int] = None
     type: Literal["TranslatedChapter"] = "TranslatedChapter"
 
     @classmethod
@@ -0,0 +1,143 @@
+# flat_jagged_array.py
+"""
+Compact form of jagged array content, like a CSR sparse matrix.
+
+Nested content such as sections > chapters > passages is stored as one flat list of passages
+plus one numpy offset array per level. offsets[k][i]:offsets[k][i + 1] are the indices at level k + 1
+of the children of node i at level k, where the last level is the passages themselves.
+
+    content  = [["a", "b"], [], ["c"]]
+    passages = ["a", "b", "c"]
+    offsets  = [array([0, 2, 2, 3])]
+
+Addresses are 0-based indices into the nested lists, so content[2][0] is passage((2, 0)).
+"""
+from typing import Any, Optional
+import numpy as np
+import numpy.typing as npt
+
+IntArray = npt.NDArray[np.int64]
+
+
+class FlatJaggedArray:
+    def __init__(self, passages: list[str], offsets: list[IntArray]) -> None:
+        self.passages = passages
+        self.offsets = offsets
+        self._length_sums: Optional[IntArray] = None
+
+    @classmethod
+    def from_nested(cls, content: list[Any]) -> "FlatJaggedArray":
+        """
+        Flattens nested lists of strings one level at a time.
+        Unlike calculate_depth, every branch is checked, so content with branches of different depths is rejected.
+        """
+        if not isinstance(content, list):
+            raise ValueError(f"Expected a list, got {type(content)}")
+        offsets: list[IntArray] = []
+        level: list[Any] = content
+        while level and not all(isinstance(item, str) for item in level):
+            if not all(isinstance(item, list) for item in level):
+                raise ValueError(
+                    f"Level {len(offsets) + 1} mixes strings and lists, the branches have different depths"
+                )
+            offsets.append(
+                np.concatenate(
+                    ([0], np.cumsum([len(item) for item in level], dtype=np.int64))
+                )
+            )
+            level = [child for item in level for child in item]
+        return cls(level, offsets)
+
+    @property
+    def depth(self) -> int:
+        return len(self.offsets) + 1
+
+    def __len__(self) -> int:
+        """Number of passages"""
+        return len(self.passages)
+
+    def node_count(self, level: int) -> int:
+        """Number of nodes at a 0-based level, where level depth - 1 is the passages"""
+        if level == self.depth - 1:
+            return len(self.passages)
+        return len(self.offsets[level]) - 1
+
+    def passage_starts(self, level: int) -> IntArray:
+        """
+        For every node at a level, the index of its first passage, followed by the passage count.
+        Node i covers passages starts[i]:starts[i + 1].
+        """
+        starts = np.arange(self.node_count(level) + 1, dtype=np.int64)
+        for offsets in self.offsets[level:]:
+            starts = offsets[starts]
+        return starts
+
+    def passage_counts(self, level: int = 0) -> IntArray:
+        """Number of passages under each node at a level"""
+        return np.diff(self.passage_starts(level))
+
+    def child_counts(self, level: int = 0) -> IntArray:
+        """Number of children of each node at a level, e.g. chapters per section"""
+        return np.diff(self.offsets[level])
+
+    def passage_lengths(self, level: int = 0) -> IntArray:
+        """Total characters of the passages under each node at a level"""
+        if self._length_sums is None:
+            lengths = np.fromiter(
+                (len(passage) for passage in self.passages),
+                dtype=np.int64,
+                count=len(self.passages),
+            )
+            self._length_sums = np.concatenate(([0], np.cumsum(lengths)))
+        starts = self.passage_starts(level)
+        return self._length_sums[starts[1:]] - self._length_sums[starts[:-1]]
+
+    def index(self, address: tuple[int, ...]) -> int:
+        """Flat index of the node at an address, at the level of the address length"""
+        if not 1 <= len(address) <= self.depth:
+            raise ValueError(f"Address {address} does not fit depth {self.depth}")
+        node = address[0]
+        if not 0 <= node < self.node_count(0):
+            raise IndexError(f"Address {address} is out of range")
+        for offsets, child in zip(self.offsets, address[1:]):
+            start, end = offsets[node], offsets[node + 1]
+            if not 0 <= child < end - start:
+                raise IndexError(f"Address {address} is out of range")
+            node = int(start + child)
+        return node
+
+    def passage(self, address: tuple[int, ...]) -> str:
+        """The passage at a full address, in constant time for a given depth"""
+        if len(address) != self.depth:
+            raise ValueError(f"A passage address needs {self.depth} indices, got {address}")
+        return self.passages[self.index(address)]
+
+    def passage_range(self, address: tuple[int, ...]) -> tuple[int, int]:
+        """[start, end) flat passage indices under the node at an address"""
+        level = len(address) - 1
+        node = self.index(address)
+        start = np.array([node, node + 1], dtype=np.int64)
+        for offsets in self.offsets[level:]:
+            start = offsets[start]
+        return int(start[0]), int(start[1])
+
+    def node(self, address: tuple[int, ...]) -> Any:
+        """The content under an address, as nested lists"""
+        if len(address) == self.depth:
+            return self.passage(address)
+        node = self.index(address)
+        # Slice the offsets of each level below the node, rebased to start at 0
+        first, last = node, node + 1
+        sub_offsets: list[IntArray] = []
+        for offsets in self.offsets[len(address) - 1 :]:
+            sub_offsets.append(offsets[first : last + 1] - offsets[first])
+            first, last = int(offsets[first]), int(offsets[last])
+        return FlatJaggedArray(self.passages[first:last], sub_offsets).to_nested()[0]
+
+    def to_nested(self) -> list[Any]:
+        """Rebuilds the nested lists, deepest level first"""
+        level: list[Any] = self.passages
+        for offsets in reversed(self.offsets):
+            bounds = offsets.tolist()
+            level = [level[start:end] for start, end in zip(bounds, bounds[1:])]
+        return level
@@ -10,6 +10,7 @@ from typing import (
     TypeAlias,
 )
 from pydantic import BaseModel, Field, computed_field, model_validator
+from sefaria_translation.schemas.flat_jagged_array import FlatJaggedArray
 from sefaria_translation.sefaria_api.sefaria_index import (
     SefariaTitleNode,
     SefariJaggedArrayNodeSchema,
@@ -157,6 +158,12 @@ class JaggedArrayNode(BaseModel):
             )
         return self.content_schema.section_names[depth_level - 1]
 
+    def to_flat(self) -> FlatJaggedArray:
+        """The content as one flat passage list with offset arrays, see FlatJaggedArray"""
+        if isinstance(self.content, str):
+            return FlatJaggedArray.from_nested([self.content])
+        return FlatJaggedArray.from_nested(self.content)
+
 
 # Example usage:
 if __name__ == "__main__":
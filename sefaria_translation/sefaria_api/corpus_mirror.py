@@ -0,0 +1,193 @@
+# corpus_mirror.py
+"""
+Local mirror of a whole Sefaria title, so fetches need no network.
+
+A mirror is a directory with three files:
+    passages.dat  The raw text of every passage, UTF-8, back to back
+    index.bin     One INDEX_RECORD per passage: (section, chapter, passage, offset, length)
+    meta.json     Title, section name and the shape (passages per chapter per section)
+
+passages.dat is memory mapped, so opening a mirror only reads the index.
+
+Usage:
+    build_mirror("Pardes_Rimmonim", "Gate")
+    fetch_sefaria_text(ref)  # Now served from the mirror
+"""
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+from typing import Optional, Union
+from sefaria_translation.text_reference import TextReference
+
+MIRROR_DIR: Path = Path("sefaria_mirror")
+
+# section, chapter, passage (1-based), byte offset, byte length
+INDEX_RECORD = struct.Struct("<HHIQI")
+
+
+class MirrorMiss(ValueError):
+    """Raised for a reference outside the shape the mirror was built with"""
+
+
+class CorpusMirror:
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.title: str = meta["title"]
+        self.section_name: str = meta["section_name"]
+        self.shape: list[list[int]] = meta["shape"]
+
+        self.index: dict[tuple[int, int, int], tuple[int, int]] = {
+            (section, chapter, passage): (offset, length)
+            for section, chapter, passage, offset, length in INDEX_RECORD.iter_unpack(
+                (directory / "index.bin").read_bytes()
+            )
+        }
+        data_path = directory / "passages.dat"
+        self._file = open(data_path, "rb")
+        # mmap cannot map an empty file
+        self._data: Union[mmap.mmap, bytes] = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if data_path.stat().st_size
+            else b""
+        )
+
+    @staticmethod
+    def title_directory(title: str) -> Path:
+        return MIRROR_DIR / title.lower()
+
+    def passage(self, section_num: int, chapter_num: int, passage_num: int) -> str:
+        offset, length = self.index[(section_num, chapter_num, passage_num)]
+        return self._data[offset : offset + length].decode("utf-8")
+
+    def chapter(self, section_num: int, chapter_num: int) -> list[str]:
+        passage_count = self.shape[section_num - 1][chapter_num - 1]
+        return [
+            self.passage(section_num, chapter_num, passage_num)
+            for passage_num in range(1, passage_count + 1)
+        ]
+
+    def section(self, section_num: int) -> list[list[str]]:
+        return [
+            self.chapter(section_num, chapter_num)
+            for chapter_num in range(1, len(self.shape[section_num - 1]) + 1)
+        ]
+
+    def text(self, text_ref: TextReference) -> Union[str, list[str], list[list[str]]]:
+        """The same text fetch_sefaria_text returns for a section, chapter or passage reference"""
+        if text_ref.section_num > len(self.shape):
+            raise MirrorMiss(f"{text_ref.display_text()} is not in the mirror")
+        if text_ref.chapter_num is None:
+            return self.section(text_ref.section_num)
+        if text_ref.chapter_num > len(self.shape[text_ref.section_num - 1]):
+            raise MirrorMiss(f"{text_ref.display_text()} is not in the mirror")
+        if text_ref.passage_num is None:
+            return self.chapter(text_ref.section_num, text_ref.chapter_num)
+        if text_ref.passage_num > self.shape[text_ref.section_num - 1][text_ref.chapter_num - 1]:
+            raise MirrorMiss(f"{text_ref.display_text()} is not in the mirror")
+        # Sefaria returns a single passage as a string, not a list
+        return self.passage(text_ref.section_num, text_ref.chapter_num, text_ref.passage_num)
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+_open_mirrors: dict[str, CorpusMirror] = {}
+_open_lock = Lock()
+
+
+def get_mirror(title: str) -> Optional[CorpusMirror]:
+    """Returns the mirror for a title if one has been built, opening it once per process"""
+    with _open_lock:
+        if title not in _open_mirrors:
+            directory = CorpusMirror.title_directory(title)
+            if not (directory / "meta.json").exists():
+                return None
+            _open_mirrors[title] = CorpusMirror(directory)
+        return _open_mirrors[title]
+
+
+def write_mirror(
+    directory: Path, title: str, section_name: str, sections: list[list[list[str]]]
+) -> None:
+    """
+    Writes sections of text as a mirror. meta.json is written last, so a half-written mirror is never used.
+    Each file is written to a temporary file and renamed over the old one, since a mirror open in another
+    process keeps reading the old files, and truncating a memory mapped file under it crashes it.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "meta.json").unlink(missing_ok=True)
+
+    records = bytearray()
+    offset = 0
+    data_tmp_path = directory / f"passages.{os.getpid()}.tmp"
+    with open(data_tmp_path, "wb") as data:
+        for section_num, section in enumerate(sections, start=1):
+            for chapter_num, chapter in enumerate(section, start=1):
+                for passage_num, passage in enumerate(chapter, start=1):
+                    encoded = passage.encode("utf-8")
+                    data.write(encoded)
+                    records += INDEX_RECORD.pack(
+                        section_num, chapter_num, passage_num, offset, len(encoded)
+                    )
+                    offset += len(encoded)
+    os.replace(data_tmp_path, directory / "passages.dat")
+    index_tmp_path = directory / f"index.{os.getpid()}.tmp"
+    index_tmp_path.write_bytes(records)
+    os.replace(index_tmp_path, directory / "index.bin")
+
+    meta = {
+        "title": title,
+        "section_name": section_name,
+        "shape": [[len(chapter) for chapter in section] for section in sections],
+        "built_at": datetime.now().isoformat(),
+    }
+    tmp_path = directory / f"meta.{os.getpid()}.tmp"
+    tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp_path, directory / "meta.json")
+
+
+def build_mirror(
+    title: str, section_name: str = "Section", workers: int = 4
+) -> CorpusMirror:
+    """
+    Downloads every section of a title, at most `workers` at a time, and writes it as a mirror.
+    Any mirror already open for the title in this process is replaced.
+    """
+    from sefaria_translation.sefaria_api.fetch_sefaria_text import (
+        fetch_sefaria_shape,
+        fetch_sefaria_text,
+    )
+
+    section_count = len(fetch_sefaria_shape(title)["chapters"])
+
+    def fetch_section(section_num: int) -> list[list[str]]:
+        section_ref = TextReference(title, section_num)
+        section_ref.section_name = section_name
+        section = fetch_sefaria_text(section_ref, use_mirror=False)
+        print(f"Fetched {section_ref.display_text()}")
+        return [chapter if isinstance(chapter, list) else [chapter] for chapter in section]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sections = list(executor.map(fetch_section, range(1, section_count + 1)))
+
+    directory = CorpusMirror.title_directory(title)
+    with _open_lock:
+        old_mirror = _open_mirrors.pop(title, None)
+        if old_mirror is not None:
+            old_mirror.close()
+        write_mirror(directory, title, section_name, sections)
+    mirror = get_mirror(title)
+    assert mirror is not None
+    return mirror
+
+
+if __name__ == "__main__":
+    build_mirror("Pardes_Rimmonim", "Gate")
@@ -1,5 +1,5 @@
 # api_client.py
-import requests
+from sefaria_translation.sefaria_api.sefaria_client import SefariaRequestError, sefaria_client
 from sefaria_translation.schemas.whole_text_meta import WholeTextMeta
 from sefaria_translation.sefaria_api.sefaria_index import SefariaIndex
 
@@ -9,14 +9,13 @@ index_endpoint: str = "https://www.sefaria.org/api/v2/raw/index"
 
 def fetch_sefaria_meta(title: str, authors_display_names: str = "") -> WholeTextMeta:
     url = f"{index_endpoint}/{title}"
+
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raises an exception for 400/500 status codes
-        data: SefariaIndex = response.json()
+        data: SefariaIndex = sefaria_client.get_json(url)
         if not isinstance(data, dict):
             raise ValueError("Response is not a dictionary")
         return WholeTextMeta.from_json(data, authors_display_names, title)
-    except requests.RequestException as e:
+    except SefariaRequestError as e:
         raise Exception(f"Failed to fetch from Sefaria API: {str(e)}")
 
 
@@ -1,7 +1,8 @@
 # api_client.py
-import requests
+from sefaria_translation.sefaria_api.sefaria_client import SefariaRequestError, sefaria_client
+from sefaria_translation.sefaria_api.corpus_mirror import MirrorMiss, get_mirror
 import re
-from typing import TypedDict, Union
+from typing import TypedDict, Union, cast
 from sefaria_translation.text_reference import TextReference, ReferenceLevel
 from pathlib import Path
 
@@ -20,37 +21,70 @@ class SefariaIndex(TypedDict):
     pass
 
 
+class SefariaShape(TypedDict):
+    title: str
+    length: int  # Number of sections
+    chapters: list[list[int]]  # Number of passages in each chapter of each section
+
+
 index_endpoint: str = "https://www.sefaria.org/api/v2/raw/index"
 texts_endpoint: str = "https://www.sefaria.org/api/v3/texts"
+shape_endpoint: str = "https://www.sefaria.org/api/shape"
 
 
 def fetch_sefaria_index(title: str) -> SefariaIndex:
     url = f"{index_endpoint}/{title}"
+
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raises an exception for 400/500 status codes
-        data: SefariaIndex = response.json()
+        data: SefariaIndex = sefaria_client.get_json(url)
         if not isinstance(data, dict):
             raise ValueError("Response is not a dictionary")
         return data
-    except requests.RequestException as e:
+    except SefariaRequestError as e:
         raise Exception(f"Failed to fetch from Sefaria API: {str(e)}")
 
 
-def fetch_sefaria_text(text_ref: TextReference) -> Union[list[str], list[list[str]]]:
+def fetch_sefaria_shape(title: str) -> SefariaShape:
+    """Fetches the number of passages in each chapter of each section of a depth 3 text"""
+    url = f"{shape_endpoint}/{title}"
+
+    try:
+        data = sefaria_client.get_json(url)
+        # The shape endpoint returns a list with one entry per text that matches the title
+        if isinstance(data, list):
+            data = next((d for d in data if isinstance(d, dict) and "chapters" in d), None)
+        if not isinstance(data, dict) or "chapters" not in data:
+            raise ValueError("No shape in response")
+        return cast(SefariaShape, data)
+    except SefariaRequestError as e:
+        raise Exception(f"Failed to fetch from Sefaria API: {str(e)}")
+
+
+def fetch_sefaria_text(
+    text_ref: TextReference, use_mirror: bool = True
+) -> Union[str, list[str], list[list[str]]]:
     """
-    Fetches text from Sefaria API
+    Fetches text from Sefaria API.
+    Served from the local corpus mirror instead, if one has been built for the title
+    and the reference is within the shape it was built with.
+    A passage reference returns the passage as a string.
 
     Returns:
         dict: API response data
     """
     level = text_ref.ref_level
+    if use_mirror:
+        mirror = get_mirror(text_ref.title)
+        if mirror is not None:
+            try:
+                return mirror.text(text_ref)
+            except MirrorMiss:
+                pass  # Sefaria may have text the mirror was built without
+
     url = f"{texts_endpoint}/{text_ref.to_url_path(level)}"
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()  # Raises an exception for 400/500 status codes
-        data: SefariaTextResponse = response.json()
+        data: SefariaTextResponse = sefaria_client.get_json(url)
 
         if not isinstance(data, dict):
             raise ValueError("Response is not a dictionary")
@@ -61,7 +95,7 @@ def fetch_sefaria_text(text_ref: TextReference) -> Union[list[str], list[list[st
 
         return data["versions"][0]["text"]
 
-    except requests.RequestException as e:
+    except SefariaRequestError as e:
         raise Exception(f"Failed to fetch from Sefaria API: {str(e)}")
 
 
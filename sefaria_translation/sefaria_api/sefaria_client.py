@@ -0,0 +1,143 @@
+# sefaria_client.py
+"""
+Shared HTTP client for the Sefaria API.
+
+All fetches go through one pooled requests.Session and an on-disk response cache.
+Cached responses newer than max_age are served without touching the network, older ones are
+revalidated with ETag / Last-Modified, and in offline mode only cached data is served.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+CACHE_DIR: Path = Path("sefaria_cache")
+
+
+class SefariaOfflineError(Exception):
+    """Raised in offline mode when a response is not in the cache"""
+
+
+class SefariaRequestError(Exception):
+    """Raised when a request to the Sefaria API fails, so callers need not import requests to catch it"""
+
+
+class SefariaClient:
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = CACHE_DIR,
+        timeout: tuple[float, float] = (5, 60),  # (connect, read) seconds
+        max_age: float = 24 * 60 * 60,  # Seconds before a cached response is revalidated
+        offline: bool = False,
+        pool_size: int = 10,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_age = max_age
+        self.offline = offline
+        self.pool_size = pool_size
+        self._session: Optional["requests.Session"] = None
+
+    @property
+    def session(self) -> "requests.Session":
+        """The pooled session, created on first use so cached and offline reads never import requests"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size,
+                pool_maxsize=self.pool_size,
+                max_retries=Retry(
+                    total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504]
+                ),
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    @session.setter
+    def session(self, session: "requests.Session") -> None:
+        self._session = session
+
+    def cache_path(self, url: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def read_cache(self, url: str) -> Optional[dict[str, Any]]:
+        path = self.cache_path(url)
+        if path is None or not path.exists():
+            return None
+        entry: dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        return entry
+
+    def write_cache(self, url: str, entry: dict[str, Any]) -> None:
+        path = self.cache_path(url)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so concurrent readers never see a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def get_json(self, url: str) -> Any:
+        """
+        Gets the JSON body of a Sefaria API url, using the cache where possible.
+
+        Raises:
+            SefariaOfflineError: In offline mode, if the url is not cached
+            SefariaRequestError: If the request fails
+        """
+        entry = self.read_cache(url)
+        if entry is not None and (
+            self.offline or time.time() - entry["fetched_at"] < self.max_age
+        ):
+            return entry["data"]
+        if self.offline:
+            raise SefariaOfflineError(f"No cached response for {url} in offline mode")
+
+        headers: dict[str, str] = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        import requests
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                entry["fetched_at"] = time.time()
+                self.write_cache(url, entry)
+                return entry["data"]
+
+            response.raise_for_status()  # Raises an exception for 400/500 status codes
+            data = response.json()
+        except requests.RequestException as e:
+            raise SefariaRequestError(str(e)) from e
+        self.write_cache(
+            url,
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "data": data,
+            },
+        )
+        return data
+
+
+# Shared by all fetch functions. Set SEFARIA_OFFLINE=1 to only serve cached data.
+sefaria_client = SefariaClient(offline=os.environ.get("SEFARIA_OFFLINE") == "1")
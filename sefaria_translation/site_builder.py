@@ -0,0 +1,281 @@
+# site_builder.py
+"""
+Builds a static HTML site from saved translations.
+
+Every saved chapter becomes a page, with an index page for each section and one for the book:
+    saved_translation_html/pardes_rimmonim/index.html
+    saved_translation_html/pardes_rimmonim/Gate_30/index.html
+    saved_translation_html/pardes_rimmonim/Gate_30/pardes_rimmonim_30_1.html
+
+A manifest records a hash of the inputs of every page (the saved chapter and the template),
+so a rebuild only renders pages whose inputs changed. Chapters are rendered in a process pool.
+Pages of chapters and sections that are no longer saved are deleted.
+
+Usage:
+    build_site("Pardes_Rimmonim", "Gate")
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+from sefaria_translation import html_template
+from sefaria_translation.html_template import (
+    create_html_template,
+    format_links,
+    format_nav,
+    format_translations,
+    get_disclaimer,
+)
+from sefaria_translation.corpus_reader import ChapterFile, chapter_files, chapter_passages
+from sefaria_translation.text_reference import ChapterReference, TextReference
+from sefaria_translation.work_planner import SAVED_DIR
+
+SITE_DIR: Path = Path("saved_translation_html")
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class ChapterPage:
+    """A chapter page to render. Passed to worker processes, so it only holds plain data."""
+
+    title: str
+    section_name: str
+    section_num: int
+    chapter_num: int
+    source: Path
+    output: Path
+
+
+@dataclass
+class SiteBuild:
+    rendered: int
+    skipped: int
+    index_pages: int
+    removed: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"Rendered {self.rendered} chapters, {self.skipped} unchanged, "
+            f"{self.index_pages} index pages written, {self.removed} stale pages removed."
+        )
+
+
+def template_fingerprint() -> str:
+    """Hash of the template module, so a template change invalidates every page"""
+    return hashlib.sha256(Path(html_template.__file__).read_bytes()).hexdigest()
+
+
+def content_hash(data: bytes, fingerprint: str) -> str:
+    return hashlib.sha256(fingerprint.encode() + data).hexdigest()
+
+
+def section_dir_name(section_name: str, section_num: int) -> str:
+    return f"{section_name}_{section_num}"
+
+
+def retrieved_at(data: dict[str, Any]) -> Optional[datetime]:
+    """When the Hebrew of a saved chapter was fetched from Sefaria, if it was recorded"""
+    value = data.get("retrieved_at")
+    return datetime.fromisoformat(value) if isinstance(value, str) else None
+
+
+def render_chapter(page: ChapterPage) -> Path:
+    """Renders one chapter page. Runs in a worker process."""
+    data = ChapterFile(page.source, page.section_num, page.chapter_num).data
+    passages = chapter_passages(data)
+    ref = ChapterReference(page.title, page.section_num, page.chapter_num)
+    ref.section_name = page.section_name
+    section_ref = TextReference(page.title, page.section_num)
+    section_ref.section_name = page.section_name
+
+    nav = format_nav(
+        [
+            ("../index.html", page.title.replace("_", " ")),
+            ("index.html", section_ref.display_text()),
+        ]
+    )
+    html = create_html_template(
+        title=ref.display_text(2),
+        content=nav + "\n" + format_translations(passages),
+        disclaimer=get_disclaimer(retrieved_at(data)),
+    )
+    write_page(page.output, html)
+    return page.output
+
+
+def write_page(path: Path, html: str) -> None:
+    """Writes a page atomically, so a reader never sees a half written page"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(html, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def load_manifest(path: Path) -> dict[str, str]:
+    if not path.exists():
+        return {}
+    try:
+        manifest: dict[str, str] = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        # A corrupt manifest only costs a full rebuild
+        return {}
+    return manifest
+
+
+def write_index_pages(
+    title: str,
+    section_name: str,
+    chapters: list[tuple[int, int]],
+    title_dir: Path,
+    manifest: dict[str, str],
+    fingerprint: str,
+) -> int:
+    """Writes the book index and one index per section, skipping any whose chapter list is unchanged"""
+    book_title = title.replace("_", " ")
+    sections: dict[int, list[int]] = {}
+    for section_num, chapter_num in sorted(chapters):
+        sections.setdefault(section_num, []).append(chapter_num)
+
+    pages: dict[Path, tuple[str, str]] = {}
+    pages[title_dir / "index.html"] = (
+        book_title,
+        format_links(
+            [
+                (
+                    f"{section_dir_name(section_name, section_num)}/index.html",
+                    f"{section_name} {section_num}",
+                )
+                for section_num in sections
+            ]
+        ),
+    )
+    for section_num, chapter_nums in sections.items():
+        section_ref = TextReference(title, section_num)
+        section_ref.section_name = section_name
+        links = format_links(
+            [
+                (
+                    f"{title.lower()}_{section_num}_{chapter_num}.html",
+                    f"Chapter {chapter_num}",
+                )
+                for chapter_num in chapter_nums
+            ]
+        )
+        pages[
+            title_dir / section_dir_name(section_name, section_num) / "index.html"
+        ] = (section_ref.display_text(), format_nav([("../index.html", book_title)]) + "\n" + links)
+
+    written = 0
+    for path, (page_title, content) in pages.items():
+        key = path.relative_to(title_dir).as_posix()
+        digest = content_hash((page_title + content).encode("utf-8"), fingerprint)
+        if manifest.get(key) == digest and path.exists():
+            continue
+        write_page(
+            path,
+            create_html_template(
+                title=page_title, content=content, disclaimer=get_disclaimer()
+            ),
+        )
+        manifest[key] = digest
+        written += 1
+    return written
+
+
+def remove_stale_pages(title_dir: Path, keep: set[str], manifest: dict[str, str]) -> int:
+    """
+    Deletes pages that are not in keep, e.g. of chapters removed from the saved translations,
+    and their manifest entries. Returns the number of pages deleted.
+    """
+    removed = 0
+    for path in title_dir.rglob("*.html") if title_dir.is_dir() else []:
+        key = path.relative_to(title_dir).as_posix()
+        if key not in keep:
+            path.unlink()
+            removed += 1
+            if path.parent != title_dir and not any(path.parent.iterdir()):
+                path.parent.rmdir()
+    for key in list(manifest):
+        if key not in keep:
+            del manifest[key]
+    return removed
+
+
+def build_site(
+    title: str = "Pardes_Rimmonim",
+    section_name: str = "Gate",
+    saved_dir: Optional[Path] = None,
+    site_dir: Path = SITE_DIR,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> SiteBuild:
+    """
+    Renders the saved chapters of a title whose translation or template changed since the last build.
+
+    Args:
+        saved_dir: Directory of saved chapter JSON, in either layout. Defaults to saved_translations_json/<title>.
+        workers: Worker processes for rendering. Defaults to the number of CPUs.
+        force: Render every page, ignoring the manifest.
+    """
+    saved_dir = saved_dir or SAVED_DIR / title.lower()
+    title_dir = site_dir / title.lower()
+    manifest_path = title_dir / MANIFEST_NAME
+    manifest = {} if force else load_manifest(manifest_path)
+    fingerprint = template_fingerprint()
+
+    sources = {
+        chapter_file.key: chapter_file.path
+        for chapter_file in chapter_files(saved_dir, title)
+    }
+    stale: list[ChapterPage] = []
+    digests: dict[str, str] = {}
+    keep = {"index.html"}
+    for (section_num, chapter_num), source in sources.items():
+        output = (
+            title_dir
+            / section_dir_name(section_name, section_num)
+            / f"{title.lower()}_{section_num}_{chapter_num}.html"
+        )
+        key = output.relative_to(title_dir).as_posix()
+        keep.add(key)
+        keep.add(f"{section_dir_name(section_name, section_num)}/index.html")
+        digest = content_hash(source.read_bytes(), fingerprint)
+        if manifest.get(key) == digest and output.exists():
+            continue
+        digests[key] = digest
+        stale.append(
+            ChapterPage(title, section_name, section_num, chapter_num, source, output)
+        )
+
+    # Starting worker processes costs more than rendering a handful of pages
+    if len(stale) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(render_chapter, stale, chunksize=8))
+    else:
+        for page in stale:
+            render_chapter(page)
+    manifest.update(digests)
+
+    removed = remove_stale_pages(title_dir, keep, manifest)
+    index_pages = write_index_pages(
+        title, section_name, list(sources), title_dir, manifest, fingerprint
+    )
+    title_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp_path, manifest_path)
+
+    return SiteBuild(
+        rendered=len(stale),
+        skipped=len(sources) - len(stale),
+        index_pages=index_pages,
+        removed=removed,
+    )
+
+
+if __name__ == "__main__":
+    print(build_site("Pardes_Rimmonim", "Gate").summary())
@@ -0,0 +1,189 @@
+# streaming.py
+"""
+Streaming LLM generation.
+
+A stream generation function takes a prompt and yields text deltas (see claude.stream_claude).
+streaming_generation turns one into an ordinary llm_generation function that:
+- passes each delta to a StreamConsumer as it arrives, so partial output can be shown or written,
+- records the time to first token,
+- raises StreamStalled when no delta arrives for stall_timeout seconds, instead of waiting for the HTTP timeout.
+
+Usage:
+    generation = streaming_generation(stream_claude, PartialFileWriter(Path("partial")), stall_timeout=30)
+    translator = ChapterTranslator(chapter_ref, chapter, generation)
+"""
+import contextvars
+import hashlib
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Callable, Iterator, Optional, Union
+
+
+class StreamStalled(Exception):
+    """Raised when a stream goes too long without a new delta"""
+
+
+@dataclass
+class StreamStats:
+    time_to_first_token: Optional[float]  # Seconds, None if no text arrived
+    total_time: float  # Seconds
+    deltas: int
+    chars: int
+
+
+class StreamConsumer:
+    """Receives streamed output. The base class ignores everything; override what you need."""
+
+    def on_start(self, prompt: str) -> None:
+        pass
+
+    def on_delta(self, prompt: str, delta: str) -> None:
+        pass
+
+    def on_complete(self, prompt: str, text: str, stats: StreamStats) -> None:
+        pass
+
+
+class PrintStream(StreamConsumer):
+    """Prints deltas to stdout as they arrive. Best used with sequential translation."""
+
+    def on_delta(self, prompt: str, delta: str) -> None:
+        sys.stdout.write(delta)
+        sys.stdout.flush()
+
+    def on_complete(self, prompt: str, text: str, stats: StreamStats) -> None:
+        ttft = (
+            f"{stats.time_to_first_token:.1f}s"
+            if stats.time_to_first_token is not None
+            else "n/a"
+        )
+        print(f"\n(first token after {ttft}, total {stats.total_time:.1f}s)")
+
+
+class PartialFileWriter(StreamConsumer):
+    """
+    Writes each in-progress response to its own file, so concurrent calls can be followed with tail -f.
+    A file is deleted once its response is complete, so leftovers are responses that failed or stalled.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    def partial_path(self, prompt: str) -> Path:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+        return self.directory / f"{digest}.partial.txt"
+
+    def on_start(self, prompt: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.partial_path(prompt).write_text("", encoding="utf-8")
+
+    def on_delta(self, prompt: str, delta: str) -> None:
+        with open(self.partial_path(prompt), "a", encoding="utf-8") as f:
+            f.write(delta)
+
+    def on_complete(self, prompt: str, text: str, stats: StreamStats) -> None:
+        self.partial_path(prompt).unlink(missing_ok=True)
+
+
+_END = object()
+
+
+def close_stream(deltas: Iterator[str]) -> None:
+    """Closes a stream that has a close(). A generator running on another thread can not be closed yet."""
+    close = getattr(deltas, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except ValueError:
+        pass
+
+
+def with_stall_timeout(
+    deltas: Iterator[str],
+    stall_timeout: float,
+    first_token_timeout: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    Re-yields deltas, raising StreamStalled if the next one takes longer than stall_timeout.
+    The stream is read on a daemon thread. A stalled stream is closed, straight away if its close() works
+    while a read is blocked (see claude.ClaudeStream), otherwise when its next delta arrives,
+    so its cleanup, such as releasing an llm_governor slot, still runs.
+    """
+    queue: Queue[Union[str, BaseException, object]] = Queue()
+    stalled = threading.Event()
+
+    def read() -> None:
+        try:
+            for delta in deltas:
+                if stalled.is_set():
+                    break
+                queue.put(delta)
+        except BaseException as e:
+            queue.put(e)
+        finally:
+            close_stream(deltas)
+        queue.put(_END)
+
+    # The reader runs in a copy of this context, so trace spans opened by the stream nest under ours
+    threading.Thread(target=contextvars.copy_context().run, args=(read,), daemon=True).start()
+    timeout = first_token_timeout if first_token_timeout is not None else stall_timeout
+    while True:
+        try:
+            item = queue.get(timeout=timeout)
+        except Empty:
+            stalled.set()
+            close_stream(deltas)
+            raise StreamStalled(f"No response from the LLM for {timeout:.0f}s")
+        if item is _END:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        timeout = stall_timeout
+        yield str(item)
+
+
+def streaming_generation(
+    stream_generation: Callable[[str], Iterator[str]],
+    consumer: Optional[StreamConsumer] = None,
+    stall_timeout: float = 60,
+    first_token_timeout: Optional[float] = None,
+) -> Callable[[str], str]:
+    """
+    Wraps a stream generation function as an llm_generation function.
+
+    Args:
+        consumer: Receives deltas as they arrive
+        stall_timeout: Seconds allowed between deltas
+        first_token_timeout: Seconds allowed before the first delta. Defaults to stall_timeout.
+    """
+    consumer = consumer or StreamConsumer()
+
+    def generation(prompt: str) -> str:
+        start = time.monotonic()
+        first_token: Optional[float] = None
+        parts: list[str] = []
+        consumer.on_start(prompt)
+        for delta in with_stall_timeout(
+            stream_generation(prompt), stall_timeout, first_token_timeout
+        ):
+            if first_token is None:
+                first_token = time.monotonic() - start
+            parts.append(delta)
+            consumer.on_delta(prompt, delta)
+
+        text = "".join(parts)
+        stats = StreamStats(
+            time_to_first_token=first_token,
+            total_time=time.monotonic() - start,
+            deltas=len(parts),
+            chars=len(text),
+        )
+        consumer.on_complete(prompt, text, stats)
+        return text
+
+    return generation
@@ -0,0 +1,184 @@
+# tracing.py
+"""
+Span based tracing of the translation pipeline, written to JSONL.
+
+A span times one stage (fetch, prompt build, LLM call, parse, save) and carries attributes
+such as token counts, stop_reason and the model that actually answered. Spans nest through a
+context variable, so the spans of one chapter share a trace_id and can be summed per chapter or gate.
+
+Usage:
+    with tracer.span("fetch", gate=30):
+        ...
+    annotate(stop_reason="end_turn")  # Adds attributes to the innermost open span, if any
+
+Tracing to a file is opt-in: set SEFARIA_TRACE_PATH, e.g. to traces/spans.jsonl, or pass
+--trace to sefaria-translate run. Each finished span is then one JSON line in that file.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO
+
+# Where --trace writes spans, and where summarize reads them from
+TRACE_PATH: Path = Path("traces/spans.jsonl")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    started_at: datetime = field(default_factory=datetime.now)
+    duration: Optional[float] = None  # Seconds, set when the span ends
+    attributes: dict[str, Any] = field(default_factory=dict)
+    # Finished child spans, kept so a caller can read what happened inside a stage
+    children: list["Span"] = field(default_factory=list, repr=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def child_attributes(self, name: str) -> list[dict[str, Any]]:
+        """Attributes and durations of the finished descendants with a name, in finishing order"""
+        found: list[dict[str, Any]] = []
+        for child in self.children:
+            found.extend(child.child_attributes(name))
+            if child.name == name:
+                found.append({**child.attributes, "duration": child.duration})
+        return found
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "started_at": self.started_at.isoformat(),
+            "duration": self.duration,
+            **self.attributes,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def annotate(**attributes: Any) -> None:
+    """Sets attributes on the innermost open span. Does nothing outside a span."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+class Tracer:
+    """
+    Opens spans and appends them to a JSONL file as they finish.
+    With path None spans are still timed and nested, but nothing is written.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+        self._path = path
+
+    @property
+    def path(self) -> Optional[Path]:
+        return self._path
+
+    @path.setter
+    def path(self, path: Optional[Path]) -> None:
+        """Starts writing to another file, or stops writing with None"""
+        with self._lock:
+            self._close()
+            self._path = path
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        span_id = uuid.uuid4().hex[:16]
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent is not None else span_id,
+            span_id=span_id,
+            parent_id=parent.span_id if parent is not None else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            if parent is not None:
+                parent.children.append(span)
+            self.write(span)
+
+    def write(self, span: Span) -> None:
+        """Appends a span to the file, which is opened on the first write and kept open"""
+        if self._path is None:
+            return
+        line = json.dumps(span.to_json(), ensure_ascii=False, default=str)
+        with self._lock:
+            if self._path is None:
+                return
+            if self._file is None:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self._path, "a", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+def summarize(path: Path = TRACE_PATH) -> dict[str, dict[str, float]]:
+    """Total count, seconds and tokens per span name in a trace file"""
+    totals: dict[str, dict[str, float]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            total = totals.setdefault(
+                span["name"],
+                {"count": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0},
+            )
+            total["count"] += 1
+            total["seconds"] += span.get("duration") or 0
+            total["input_tokens"] += span.get("input_tokens") or 0
+            total["output_tokens"] += span.get("output_tokens") or 0
+    return totals
+
+
+# Shared by every stage of the pipeline. Only writes spans if SEFARIA_TRACE_PATH is set.
+tracer = Tracer(Path(os.environ["SEFARIA_TRACE_PATH"]) if os.environ.get("SEFARIA_TRACE_PATH") else None)
+
+
+if __name__ == "__main__":
+    for name, total in summarize().items():
+        print(
+            f"{name:<16} {int(total['count']):>6} spans {total['seconds']:10.1f}s "
+            f"in={int(total['input_tokens'])} out={int(total['output_tokens'])}"
+        )
@@ -0,0 +1,237 @@
+# translation_memory.py
+"""
+Translation memory: reuses saved translations for Hebrew passages that were translated before.
+
+Two indexes over every saved (hebrew, english) pair:
+    exact   Hash of the passage with whitespace normalised. Tags are kept, since the English must keep them.
+    near    MinHash signatures of word shingles, with LSH banding to find candidates. A candidate is only
+            used if the Jaccard similarity of its shingles is at least `threshold`.
+
+Usage:
+    memory = TranslationMemory.from_corpus(Path("saved_translations_json/pardes_rimmonim"), "Pardes_Rimmonim")
+    translator = ChapterTranslator(chapter_ref, chapter, translation_memory=memory)
+"""
+import hashlib
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from sefaria_translation.corpus_reader import chapter_files
+
+# (section_num, chapter_num, passage_num) of the passage a translation came from. (0, 0, 0) if unknown.
+Source = tuple[int, int, int]
+
+HTML_TAG = re.compile(r"<[^>]+>")
+# Cantillation marks and vowel points
+NIQQUD = re.compile(r"[֑-ׇ]")
+NON_WORD = re.compile(r"[^\w\s]")
+
+
+@dataclass
+class MemoryMatch:
+    english: str
+    source: Source
+    similarity: float  # Jaccard similarity of the shingles, 1.0 for an exact match
+    exact: bool
+
+    def flag(self) -> dict[str, object]:
+        """How a reused passage is marked in its saved call metadata"""
+        return {
+            "translation_memory": "exact" if self.exact else "near",
+            "similarity": round(self.similarity, 3),
+            "source": list(self.source),
+        }
+
+
+def exact_key(hebrew: str) -> str:
+    return hashlib.sha256(" ".join(hebrew.split()).encode("utf-8")).hexdigest()
+
+
+def words(hebrew: str) -> list[str]:
+    """Words of a passage without tags, niqqud or punctuation"""
+    text = NON_WORD.sub(" ", NIQQUD.sub("", HTML_TAG.sub(" ", hebrew)))
+    return text.split()
+
+
+def shingles(hebrew: str, size: int) -> frozenset[int]:
+    passage_words = words(hebrew)
+    grams = [
+        " ".join(passage_words[i : i + size])
+        for i in range(max(1, len(passage_words) - size + 1))
+    ]
+    return frozenset(zlib.crc32(gram.encode("utf-8")) for gram in grams)
+
+
+def jaccard(a: frozenset[int], b: frozenset[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TranslationMemory:
+    """
+    Thread safe, so concurrent translators can share one memory and add to it as they go.
+
+    Args:
+        threshold: Minimum Jaccard similarity of word shingles for a near-duplicate match.
+            Set above 1 to only reuse exact matches.
+        min_words: Passages shorter than this are only matched exactly, since a few shared words
+            say little about whether two short passages mean the same thing.
+        num_perm: MinHash signature length. bands must divide it.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        min_words: int = 8,
+        shingle_size: int = 3,
+        num_perm: int = 64,
+        bands: int = 16,
+        seed: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("bands must divide num_perm")
+        self.threshold = threshold
+        self.min_words = min_words
+        self.shingle_size = shingle_size
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash functions, one per permutation. uint64 arithmetic wraps, which is intended.
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+        self.english: list[str] = []
+        self.sources: list[Source] = []
+        self.shingle_sets: list[frozenset[int]] = []
+        self.exact: dict[str, int] = {}
+        self.buckets: dict[tuple[int, bytes], list[int]] = {}
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def signature(self, shingle_set: frozenset[int]) -> np.ndarray:
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        with np.errstate(over="ignore"):
+            hashed = (values[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return hashed.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> list[tuple[int, bytes]]:
+        return [
+            (band, rows.tobytes())
+            for band, rows in enumerate(np.split(signature, self.bands))
+        ]
+
+    @property
+    def exact_only(self) -> bool:
+        return self.threshold > 1
+
+    def add(self, hebrew: str, english: str, source: Source = (0, 0, 0)) -> None:
+        key = exact_key(hebrew)
+        shingle_set = shingles(hebrew, self.shingle_size)
+        # An exact-only memory never looks at the near-duplicate index, so it is not built
+        signature = None if self.exact_only else self.signature(shingle_set)
+        with self._lock:
+            if key in self.exact:
+                return
+            entry = len(self.english)
+            self.english.append(english)
+            self.sources.append(source)
+            self.shingle_sets.append(shingle_set)
+            self.exact[key] = entry
+            if signature is not None and len(words(hebrew)) >= self.min_words:
+                for band_key in self.band_keys(signature):
+                    self.buckets.setdefault(band_key, []).append(entry)
+
+    def lookup(self, hebrew: str, exclude: Optional[Source] = None) -> Optional[MemoryMatch]:
+        """
+        The stored translation of the same or a near-duplicate passage, if there is one.
+
+        Args:
+            exclude: Ignore the entry from this source, e.g. the passage itself when evaluating the memory
+        """
+        entry = self.exact.get(exact_key(hebrew))
+        if entry is not None and self.sources[entry] != exclude:
+            with self._lock:
+                self.exact_hits += 1
+            return MemoryMatch(self.english[entry], self.sources[entry], 1.0, True)
+
+        match = self._near_match(hebrew, exclude)
+        with self._lock:
+            if match is None:
+                self.misses += 1
+            else:
+                self.near_hits += 1
+        return match
+
+    def _near_match(self, hebrew: str, exclude: Optional[Source]) -> Optional[MemoryMatch]:
+        if self.exact_only or len(words(hebrew)) < self.min_words:
+            return None
+        shingle_set = shingles(hebrew, self.shingle_size)
+        candidates: set[int] = set()
+        for band_key in self.band_keys(self.signature(shingle_set)):
+            candidates.update(self.buckets.get(band_key, ()))
+        best: Optional[tuple[float, int]] = None
+        for entry in candidates:
+            if self.sources[entry] == exclude:
+                continue
+            similarity = jaccard(shingle_set, self.shingle_sets[entry])
+            if similarity >= self.threshold and (best is None or similarity > best[0]):
+                best = (similarity, entry)
+        if best is None:
+            return None
+        similarity, entry = best
+        return MemoryMatch(self.english[entry], self.sources[entry], similarity, False)
+
+    def __len__(self) -> int:
+        return len(self.english)
+
+    def stats(self) -> str:
+        total = self.exact_hits + self.near_hits + self.misses
+        reused = self.exact_hits + self.near_hits
+        rate = reused / total if total else 0
+        return (
+            f"Translation memory: {len(self)} passages, {self.exact_hits} exact and "
+            f"{self.near_hits} near-duplicate reuses of {total} lookups ({rate:.1%})"
+        )
+
+    @classmethod
+    def from_corpus(
+        cls,
+        directory: Path,
+        title: str,
+        min_prompt_version: Optional[int] = None,
+        **options: float,
+    ) -> "TranslationMemory":
+        """
+        Builds a memory from every saved chapter of a title, in either JSON layout.
+
+        Args:
+            min_prompt_version: Leave out chapters saved with an older prompt version, or an unknown one
+        """
+        memory = cls(**options)  # type: ignore[arg-type]
+        for chapter_file in chapter_files(directory, title):
+            if min_prompt_version is not None:
+                prompt_version = chapter_file.data.get("prompt_version")
+                if not isinstance(prompt_version, int) or prompt_version < min_prompt_version:
+                    continue
+            for passage_num, (hebrew, english) in enumerate(chapter_file.passages, start=1):
+                memory.add(
+                    hebrew,
+                    english,
+                    (chapter_file.section_num, chapter_file.chapter_num, passage_num),
+                )
+        return memory
+
+
+if __name__ == "__main__":
+    # How many saved passages could have been served from the rest of the corpus
+    directory = Path("saved_translations_json/pardes_rimmonim")
+    memory = TranslationMemory.from_corpus(directory, "Pardes_Rimmonim")
+    for chapter_file in chapter_files(directory, "Pardes_Rimmonim"):
+        for passage_num, (hebrew, _) in enumerate(chapter_file.passages, start=1):
+            memory.lookup(hebrew, exclude=(*chapter_file.key, passage_num))
+    print(memory.stats())
@@ -1,14 +1,185 @@
-from sefaria_translation.sefaria_api.fetch_sefaria_text import format_text
-from sefaria_translation.text_reference import PassageReference
+import math
+import re
+from dataclasses import dataclass
+from typing import Optional
+from sefaria_translation.sefaria_api.fetch_sefaria_text import clean_text, join_text
+from sefaria_translation.text_reference import ChapterReference, PassageReference
 
+# Bump when the prompts change in a way that should invalidate cached responses (see llm_cache.py)
+PROMPT_VERSION: int = 2
 
-def translation_prompt(text_ref: PassageReference, chapter: list[str]) -> str:
+# Rough characters per token for pointed and unpointed Hebrew. Only used for budgeting, never for billing.
+CHARS_PER_TOKEN: float = 2.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap estimate of the number of tokens in a text, without calling a tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class TranslationPrompt(str):
+    """
+    A prompt string split into a stable prefix and a per-passage suffix.
+
+    The prefix holds the chapter context and is identical for every passage in a chapter,
+    so LLM backends that support prompt caching can cache it (see claude.prompt_content).
+    Everywhere else it behaves as the plain prompt string.
+    """
+
+    prefix_length: int
+
+    def __new__(cls, prefix: str, suffix: str) -> "TranslationPrompt":
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix_length = len(prefix)
+        return prompt
+
+    @property
+    def prefix(self) -> str:
+        return str(self[: self.prefix_length])
+
+    @property
+    def suffix(self) -> str:
+        return str(self[self.prefix_length :])
+
+
+@dataclass(frozen=True)
+class ContextPolicy:
+    """
+    How much of the chapter is sent as context with each passage.
+
+    The default sends the full chapter. With a window or a token budget only the passages around
+    the target are sent, unless the whole chapter fits in full_chapter_max_tokens.
+    The context is chosen per block of passages rather than per passage, so consecutive passages
+    share an identical context prefix and still get prompt cache hits.
+
+    Args:
+        window: Send at least this many passages either side of the target.
+        token_budget: Send about this many estimated tokens of Hebrew around the target.
+        full_chapter_max_tokens: Chapters with at most this many estimated tokens always get full context.
+    """
+
+    window: Optional[int] = None
+    token_budget: Optional[int] = None
+    full_chapter_max_tokens: int = 20_000
+
+    def __post_init__(self) -> None:
+        if self.window is not None and self.token_budget is not None:
+            raise ValueError("Set either window or token_budget, not both")
+        if self.window is not None and self.window < 1:
+            raise ValueError("window must be at least 1")
+        if self.token_budget is not None and self.token_budget < 1:
+            raise ValueError("token_budget must be at least 1")
+
+    @property
+    def is_full_chapter(self) -> bool:
+        return self.window is None and self.token_budget is None
+
+    def context_range(
+        self, chapter: list[str], first_index: int, last_index: int
+    ) -> tuple[int, int]:
+        """
+        Returns the [start, end) passage indices to send as context for the passages
+        first_index to last_index (0-based, inclusive).
+        """
+        passage_tokens = [estimate_tokens(passage) for passage in chapter]
+        if self.is_full_chapter or sum(passage_tokens) <= self.full_chapter_max_tokens:
+            return 0, len(chapter)
+
+        if self.window is not None:
+            # Blocks of `window` passages get the block plus `window` passages either side
+            start = first_index // self.window * self.window - self.window
+            end = (last_index // self.window + 1) * self.window + self.window
+            return max(0, start), min(len(chapter), end)
+
+        assert self.token_budget is not None
+        blocks = token_blocks(passage_tokens, self.token_budget // 3)
+        start = next(block_start for block_start, block_end in blocks if first_index < block_end)
+        end = next(block_end for block_start, block_end in blocks if last_index < block_end)
+        # Grow the context one passage at a time on alternate sides until the budget is used
+        tokens = sum(passage_tokens[start:end])
+        while start > 0 or end < len(chapter):
+            grew = False
+            if start > 0 and tokens + passage_tokens[start - 1] <= self.token_budget:
+                start -= 1
+                tokens += passage_tokens[start]
+                grew = True
+            if end < len(chapter) and tokens + passage_tokens[end] <= self.token_budget:
+                tokens += passage_tokens[end]
+                end += 1
+                grew = True
+            if not grew:
+                break
+        return start, end
+
+
+FULL_CHAPTER = ContextPolicy()
+
+
+def token_blocks(passage_tokens: list[int], block_tokens: int) -> list[tuple[int, int]]:
+    """Splits passages into consecutive [start, end) blocks of at most block_tokens, at least one passage each"""
+    blocks: list[tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, passage in enumerate(passage_tokens):
+        if i > start and tokens + passage > block_tokens:
+            blocks.append((start, i))
+            start, tokens = i, 0
+        tokens += passage
+    blocks.append((start, len(passage_tokens)))
+    return blocks
+
+
+def chapter_context_prompt(
+    chapter_ref: ChapterReference,
+    chapter: list[str],
+    context_range: Optional[tuple[int, int]] = None,
+) -> str:
+    """
+    Creates the part of the prompt that is shared by every passage in the chapter,
+    or by every passage with the same context_range.
+    This must not depend on the passage being translated, otherwise it cannot be cached.
+
+    Args:
+        context_range: [start, end) indices of the passages to include. Defaults to the full chapter.
+    """
+    start, end = context_range or (0, len(chapter))
+    if (start, end) == (0, len(chapter)):
+        description = "the full chapter in which the passage appears"
+    else:
+        description = (
+            f"{chapter_ref.passage_name}s {start + 1}-{end} of the {len(chapter)} in the chapter, "
+            "which surround the passage"
+        )
+    # Numbered by position in the chapter, to match the passage numbers in the suffix
+    passages = join_text([
+        f'<passage n="{n}">{passage}</passage>'
+        for n, passage in enumerate(clean_text(chapter[start:end]), start + 1)
+    ])
+    return f"""<system>You are translating Hebrew religious texts into English.</system>
+
+Context for this translation (text information and {description}, each numbered by its position in the chapter).
+
+<text-information>
+{chapter_ref.display_text(2)}
+</text-information>
+
+<context>
+{passages}
+</context>
+"""
+
+
+def translation_prompt(
+    text_ref: PassageReference,
+    chapter: list[str],
+    context_policy: ContextPolicy = FULL_CHAPTER,
+) -> TranslationPrompt:
     """
     Creates a translation prompt for a specific passage within its chapter context
 
     Args:
         text_ref: Reference containing section, chapter, and passage information
         chapter: List of passages in the chapter
+        context_policy: How much of the chapter to send as context
 
     Raises:
         ValueError: If passage number is missing or invalid
@@ -20,35 +191,94 @@ def translation_prompt(text_ref: PassageReference, chapter: list[str]) -> str:
         raise ValueError("Passage is not in chapter list")
 
     # Add XML tags to target passage
-    marked_chapter = chapter.copy()
-    marked_chapter[passage_index] = (
-        f"<passage-to-translate>{marked_chapter[passage_index]}</passage-to-translate>"
+    marked_passage = (
+        f"<passage-to-translate>{chapter[passage_index]}</passage-to-translate>"
     )
-    return f"""<system>You are translating Hebrew religious texts into English.</system>
+    passage_suffix = f"""
+Please translate the following specific passage from this chapter ({text_ref.passage_name} {text_ref.passage_num} of {len(chapter)}):
 
-Context for this translation (text information and the full chapter in which the passage appears).
+{marked_passage}
 
-<text-information>
-{text_ref.display_text()}
-</text-information>
+<guidelines>
+- Maintain a scholarly tone
+- Translate for clarity while preserving meaning
+- Preserve any html tags that may be present in the hebrew text
+- Do not output anything else before or after the translation.
+</guidelines>
 
-<context>
-{format_text(marked_chapter)}
-</context>
+Please begin your translation:\n\n
+"""
+    context_range = context_policy.context_range(chapter, passage_index, passage_index)
+    return TranslationPrompt(
+        chapter_context_prompt(text_ref, chapter, context_range), passage_suffix
+    )
 
-Please translate the following specific passage from this chapter:
 
-{marked_chapter[passage_index]}
+def packed_translation_prompt(
+    text_ref: PassageReference,
+    chapter: list[str],
+    passage_count: int,
+    context_policy: ContextPolicy = FULL_CHAPTER,
+) -> TranslationPrompt:
+    """
+    Creates a prompt that translates several consecutive passages in one call.
+    The chapter prefix is the same as translation_prompt, so both kinds of prompt share the prompt cache.
+
+    Args:
+        text_ref: Reference to the first passage in the group
+        chapter: List of passages in the chapter
+        passage_count: Number of consecutive passages to translate
+        context_policy: How much of the chapter to send as context, around all of the passages
+
+    Raises:
+        ValueError: If the passages are not all in the chapter
+    """
+    first_index = text_ref.passage_num - 1
+    last_index = first_index + passage_count - 1
+    if passage_count < 1 or first_index < 0 or last_index >= len(chapter):
+        raise ValueError("Passages are not in chapter list")
+
+    marked_passages = "\n\n".join(
+        f'<passage-to-translate passage="{i + 1}">{chapter[i]}</passage-to-translate>'
+        for i in range(first_index, last_index + 1)
+    )
+    passages_suffix = f"""
+Please translate the following specific passages from this chapter ({text_ref.passage_name}s {first_index + 1}-{last_index + 1} of {len(chapter)}):
+
+{marked_passages}
 
 <guidelines>
 - Maintain a scholarly tone
 - Translate for clarity while preserving meaning
 - Preserve any html tags that may be present in the hebrew text
-- Do not output anything else before or after the translation.
+- Translate each passage separately and wrap each translation in <translation passage="N"></translation> tags, where N is the passage number.
+- Do not output anything else before, between or after the translations.
 </guidelines>
 
-Please begin your translation:\n\n
+Please begin your translations:\n\n
 """
+    context_range = context_policy.context_range(chapter, first_index, last_index)
+    return TranslationPrompt(
+        chapter_context_prompt(text_ref, chapter, context_range), passages_suffix
+    )
+
+
+def parse_packed_translation(
+    response: str, passage_nums: list[int]
+) -> Optional[list[str]]:
+    """
+    Splits the response to a packed_translation_prompt into one translation per passage.
+
+    Returns:
+        The translations in passage order, or None if the response does not contain
+        exactly one translation for each passage, in order.
+    """
+    matches = re.findall(
+        r'<translation passage="(\d+)">(.*?)</translation>', response, flags=re.DOTALL
+    )
+    if [int(num) for num, _ in matches] != passage_nums:
+        return None
+    return [translation.strip() for _, translation in matches]
 
 
 # Old stuff
@@ -2,41 +2,14 @@
 from datetime import datetime
 from pathlib import Path
 from sefaria_translation.chapter_translator import TranslationState, ChapterTranslator
+from sefaria_translation.html_template import (
+    create_html_template,
+    format_translations,
+    get_disclaimer,
+)
 from typing import Literal, Optional, Union
 
 
-def create_html_template(
-    title: str, content: str, disclaimer: str, styles: str | None = None
-) -> str:
-    """
-    Creates an HTML document from components
-    """
-    default_styles = """
-        .passage { margin-bottom: 2em; }
-        .hebrew { direction: rtl; margin-bottom: 1em; }
-        footer { margin-top: 3em; font-size: 0.8em; color: #666; }
-    """
-
-    return f"""<!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>{title}</title>
-        <style>
-            {styles or default_styles}
-        </style>
-    </head>
-    <body>
-        <main>
-            <h3>{title}</h3>
-            {content}
-        </main>
-        {disclaimer}
-    </body>
-    </html>
-    """
-
-
 OverwriteChoice = Literal["y", "n", "Y", "N"]
 
 
@@ -85,27 +58,12 @@ class SaveTranslation:
         return file_path.exists()
 
     def get_disclaimer(self) -> str:
-        today = datetime.now().strftime("%Y-%m-%d")
-        return f"""
-        <footer>
-            <p>Disclaimer: The English text is translated by AI and may not be 100% accurate.
-            The original Hebrew text was retrieved from
-            <a href="https://sefaria.org" target="_blank">sefaria.org</a>
-            on {today}.</p>
-        </footer>
-        """
+        # Saved straight after the Hebrew is fetched
+        return get_disclaimer(datetime.now())
 
     def format_translations(self) -> str:
         """Format translations as HTML"""
-        translations = self.translator.get_translations()
-
-        return "\n\n".join(
-            f"<div class='passage'>\n"
-            f"<div class='hebrew'>{hebrew}</div>\n"
-            f"<div class='english'>{english}</div>\n"
-            "</div>"
-            for hebrew, english in translations
-        )
+        return format_translations(self.translator.get_translations())
 
     def prompt_overwrite(self, file_path: Path) -> OverwriteChoice:
         """
@@ -0,0 +1,369 @@
+# translation_store.py
+"""
+Single-file store of saved translations, keyed by reference.
+
+Every chapter is one row in `chapters` plus one row per passage in `passages`, written in a single
+transaction, so a chapter is either saved whole or not at all. Existence checks and bulk loads
+are one query each, instead of a stat or a file read per chapter.
+
+The JSON layouts are still supported for import and export:
+    legacy      saved_translations_json/<title>/<title>_<section>_<chapter>.json (see rimmonim_translation)
+    chapters    saved_translations/<title>/section_NNN/<title>_<section>_<chapter>.json (see SaveTranslation)
+
+Usage:
+    store = TranslationStore()
+    store.import_json(Path("saved_translations_json/pardes_rimmonim"), "Pardes_Rimmonim")
+    chapters = store.load_title("Pardes_Rimmonim")
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Literal, Optional
+from sefaria_translation.translation_prompt import PROMPT_VERSION
+
+if TYPE_CHECKING:
+    # The schemas are imported where they are used, so status checks do not load pydantic
+    from sefaria_translation.schemas.base_schema import TranslatedChapter
+
+STORE_PATH: Path = Path("saved_translations/translations.sqlite3")
+
+# What to do with a chapter that is already saved:
+#   skip      keep it
+#   replace   translate and save it again
+#   if-newer  translate it again only if it was saved with an older PROMPT_VERSION, or an unknown one
+OverwritePolicy = Literal["skip", "replace", "if-newer"]
+OVERWRITE_POLICIES: tuple[OverwritePolicy, ...] = ("skip", "replace", "if-newer")
+
+
+def saved_prompt_version(data: dict[str, Any]) -> Optional[int]:
+    """The prompt version recorded in a saved chapter, in either JSON layout or store metadata"""
+    version = data.get("prompt_version")
+    return version if isinstance(version, int) else None
+
+
+def should_overwrite(policy: OverwritePolicy, prompt_version: Optional[int]) -> bool:
+    """Whether a saved chapter, translated with prompt_version, is translated again"""
+    if policy == "replace":
+        return True
+    if policy == "if-newer":
+        return prompt_version is None or prompt_version < PROMPT_VERSION
+    return False
+
+
+@dataclass
+class StoredChapter:
+    title: str
+    section_num: int
+    chapter_num: int
+    passages: list[tuple[str, str]]  # (hebrew, english) in passage order
+    model: Optional[str] = None
+    translated_at: datetime = field(default_factory=datetime.now)
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return (self.section_num, self.chapter_num)
+
+    def to_legacy_json(self) -> dict[str, Any]:
+        """The dictionary written by rimmonim_translation.save_chapter_translation"""
+        data: dict[str, Any] = {
+            "title": self.title.replace("_", " "),
+            "gate_num": self.section_num,
+            "chapter_num": self.chapter_num,
+        }
+        if self.model is not None:
+            data["model"] = self.model
+        if "prompt_version" in self.metadata:
+            data["prompt_version"] = self.metadata["prompt_version"]
+        data["translation"] = [
+            {"hebrew": hebrew, "english": english} for hebrew, english in self.passages
+        ]
+        for passage, call in zip(data["translation"], self.metadata.get("calls") or []):
+            if call is not None:
+                passage["llm_call"] = call
+        return data
+
+    def to_translated_chapter(self) -> "TranslatedChapter":
+        from sefaria_translation.schemas.base_schema import TranslatedChapter, TranslatedPassage
+
+        passages = [
+            TranslatedPassage(hebrew=hebrew, english=english, passage_num=i + 1)
+            for i, (hebrew, english) in enumerate(self.passages)
+        ]
+        chapter = TranslatedChapter(
+            section_num=self.section_num,
+            chapter_num=self.chapter_num,
+            passages=passages,
+            translated_at=self.translated_at,
+            ai_model_version=self.model,
+            prompt_version=self.metadata.get("prompt_version"),
+        )
+        return chapter
+
+    @classmethod
+    def from_json(cls, title: str, data: dict[str, Any]) -> "StoredChapter":
+        """Reads either JSON layout"""
+        if data.get("type") == "TranslatedChapter":
+            from sefaria_translation.schemas.base_schema import TranslatedChapter
+
+            chapter = TranslatedChapter.model_validate(data)
+            return cls(
+                title,
+                chapter.section_num,
+                chapter.chapter_num,
+                [
+                    (passage.hebrew, passage.english)
+                    for passage in sorted(chapter.passages, key=lambda p: p.passage_num)
+                ],
+                model=chapter.ai_model_version,
+                translated_at=chapter.translated_at,
+                metadata=prompt_metadata(chapter.prompt_version),
+            )
+        metadata = prompt_metadata(data.get("prompt_version"))
+        calls = [passage.get("llm_call") for passage in data["translation"]]
+        if any(call is not None for call in calls):
+            metadata["calls"] = calls
+        return cls(
+            title,
+            data["gate_num"],
+            data["chapter_num"],
+            [(passage["hebrew"], passage["english"]) for passage in data["translation"]],
+            model=data.get("model"),
+            metadata=metadata,
+        )
+
+
+def prompt_metadata(prompt_version: Optional[int]) -> dict[str, Any]:
+    return {} if prompt_version is None else {"prompt_version": prompt_version}
+
+
+class TranslationStore:
+    """
+    SQLite store of translated chapters. Runs in WAL mode with one connection per thread,
+    so chapters can be saved from concurrent workers while others read.
+    """
+
+    def __init__(self, path: Path = STORE_PATH) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Opens this thread's connection on first use"""
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS chapters (
+                    title TEXT NOT NULL,
+                    section_num INTEGER NOT NULL,
+                    chapter_num INTEGER NOT NULL,
+                    passage_count INTEGER NOT NULL,
+                    model TEXT,
+                    translated_at TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    PRIMARY KEY (title, section_num, chapter_num)
+                ) WITHOUT ROWID"""
+            )
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS passages (
+                    title TEXT NOT NULL,
+                    section_num INTEGER NOT NULL,
+                    chapter_num INTEGER NOT NULL,
+                    passage_num INTEGER NOT NULL,
+                    hebrew TEXT NOT NULL,
+                    english TEXT NOT NULL,
+                    PRIMARY KEY (title, section_num, chapter_num, passage_num)
+                ) WITHOUT ROWID"""
+            )
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def transaction(self, mode: str = "IMMEDIATE") -> Iterator[sqlite3.Connection]:
+        """
+        Commits everything written inside the block together, or nothing if it raises.
+        Use mode DEFERRED for reads, so they do not take the write lock.
+        """
+        connection = self.connection
+        connection.execute(f"BEGIN {mode}")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _write_chapter(self, connection: sqlite3.Connection, chapter: StoredChapter) -> None:
+        key = (chapter.title, chapter.section_num, chapter.chapter_num)
+        connection.execute(
+            "DELETE FROM passages WHERE title = ? AND section_num = ? AND chapter_num = ?",
+            key,
+        )
+        connection.execute(
+            "INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                len(chapter.passages),
+                chapter.model,
+                chapter.translated_at.isoformat(),
+                json.dumps(chapter.metadata, ensure_ascii=False),
+            ),
+        )
+        connection.executemany(
+            "INSERT INTO passages VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (*key, passage_num, hebrew, english)
+                for passage_num, (hebrew, english) in enumerate(chapter.passages, start=1)
+            ),
+        )
+
+    def save_chapter(self, chapter: StoredChapter) -> None:
+        """Saves a chapter atomically, replacing any earlier version of it"""
+        with self.transaction() as connection:
+            self._write_chapter(connection, chapter)
+
+    def save_chapters(self, chapters: Iterable[StoredChapter]) -> int:
+        """Saves many chapters in one transaction. Returns the number saved."""
+        count = 0
+        with self.transaction() as connection:
+            for chapter in chapters:
+                self._write_chapter(connection, chapter)
+                count += 1
+        return count
+
+    def exists(self, title: str, section_num: int, chapter_num: int) -> bool:
+        row = self.connection.execute(
+            "SELECT 1 FROM chapters WHERE title = ? AND section_num = ? AND chapter_num = ?",
+            (title, section_num, chapter_num),
+        ).fetchone()
+        return row is not None
+
+    def chapter_keys(self, title: str) -> set[tuple[int, int]]:
+        """(section_num, chapter_num) of every saved chapter of the title"""
+        rows = self.connection.execute(
+            "SELECT section_num, chapter_num FROM chapters WHERE title = ?", (title,)
+        )
+        return {(section_num, chapter_num) for section_num, chapter_num in rows}
+
+    def prompt_versions(self, title: str) -> dict[tuple[int, int], Optional[int]]:
+        """The prompt version each saved chapter of the title was translated with, None if unknown"""
+        rows = self.connection.execute(
+            "SELECT section_num, chapter_num, json_extract(metadata, '$.prompt_version') "
+            "FROM chapters WHERE title = ?",
+            (title,),
+        )
+        return {
+            (section_num, chapter_num): version if isinstance(version, int) else None
+            for section_num, chapter_num, version in rows
+        }
+
+    def chapter(
+        self, title: str, section_num: int, chapter_num: int
+    ) -> Optional[StoredChapter]:
+        chapters = self._load(
+            "WHERE title = ? AND section_num = ? AND chapter_num = ?",
+            (title, section_num, chapter_num),
+        )
+        return chapters[0] if chapters else None
+
+    def load_title(
+        self, title: str, section_num: Optional[int] = None
+    ) -> list[StoredChapter]:
+        """Loads every saved chapter of a title, or of one section, with two queries"""
+        if section_num is None:
+            return self._load("WHERE title = ?", (title,))
+        return self._load("WHERE title = ? AND section_num = ?", (title, section_num))
+
+    def _load(self, where: str, params: tuple[Any, ...]) -> list[StoredChapter]:
+        # Read both tables from one snapshot, so a chapter saved in between is never half seen
+        with self.transaction("DEFERRED") as connection:
+            chapter_rows = connection.execute(
+                "SELECT title, section_num, chapter_num, model, translated_at, metadata "
+                f"FROM chapters {where} ORDER BY section_num, chapter_num",
+                params,
+            ).fetchall()
+            passage_rows = connection.execute(
+                "SELECT section_num, chapter_num, hebrew, english "
+                f"FROM passages {where} ORDER BY section_num, chapter_num, passage_num",
+                params,
+            ).fetchall()
+
+        chapters = {
+            (section_num, chapter_num): StoredChapter(
+                title,
+                section_num,
+                chapter_num,
+                [],
+                model,
+                datetime.fromisoformat(translated_at),
+                json.loads(metadata),
+            )
+            for title, section_num, chapter_num, model, translated_at, metadata in chapter_rows
+        }
+        for section_num, chapter_num, hebrew, english in passage_rows:
+            chapters[(section_num, chapter_num)].passages.append((hebrew, english))
+        return list(chapters.values())
+
+    def delete_chapter(self, title: str, section_num: int, chapter_num: int) -> None:
+        with self.transaction() as connection:
+            for table in ("chapters", "passages"):
+                connection.execute(
+                    f"DELETE FROM {table} WHERE title = ? AND section_num = ? AND chapter_num = ?",
+                    (title, section_num, chapter_num),
+                )
+
+    def import_json(self, directory: Path, title: str) -> int:
+        """
+        Imports every chapter file under a directory, in either JSON layout, in one transaction.
+        Returns the number of chapters imported.
+        """
+        chapters = [
+            StoredChapter.from_json(title, json.loads(path.read_text(encoding="utf-8")))
+            for path in sorted(directory.rglob(f"{title.lower()}_*.json"))
+        ]
+        return self.save_chapters(chapters)
+
+    def export_legacy_json(self, title: str, directory: Path) -> int:
+        """Writes every chapter of the title in the saved_translations_json layout"""
+        directory.mkdir(parents=True, exist_ok=True)
+        chapters = self.load_title(title)
+        for chapter in chapters:
+            path = directory / f"{title.lower()}_{chapter.section_num}_{chapter.chapter_num}.json"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(chapter.to_legacy_json(), f, ensure_ascii=False, indent=2)
+        return len(chapters)
+
+    def export_translated_chapters(self, title: str, directory: Path) -> int:
+        """Writes every chapter of the title in the SaveTranslation layout"""
+        chapters = self.load_title(title)
+        for chapter in chapters:
+            section_path = directory / f"section_{str(chapter.section_num).zfill(3)}"
+            section_path.mkdir(parents=True, exist_ok=True)
+            file_name = f"{title.lower()}_{chapter.section_num}_{chapter.chapter_num}.json"
+            chapter.to_translated_chapter().to_file(section_path / file_name)
+        return len(chapters)
+
+    def close(self) -> None:
+        """Closes this thread's connection"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+if __name__ == "__main__":
+    store = TranslationStore()
+    imported = store.import_json(
+        Path("saved_translations_json/pardes_rimmonim"), "Pardes_Rimmonim"
+    )
+    print(f"Imported {imported} chapters into {store.path}")
@@ -0,0 +1,178 @@
+# work_planner.py
+"""
+Works out what is left to translate for a whole title in one pass.
+
+The shape of the title (passages per chapter per section) comes from the local mirror if there is
+one, otherwise from the Sefaria shape API, which is cached on disk by the Sefaria client.
+A chapter counts as saved if it is in the TranslationStore or in either JSON layout (see translation_store).
+Saved chapters and checkpoints are found with one query or directory listing each, instead of a stat per chapter.
+
+Usage:
+    plan = plan_title("Pardes_Rimmonim")
+    print(plan.summary())
+"""
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Literal, Optional
+from sefaria_translation.checkpoint import CHECKPOINT_DIR
+from sefaria_translation.sefaria_api.corpus_mirror import get_mirror
+from sefaria_translation.sefaria_api.fetch_sefaria_text import fetch_sefaria_shape
+from sefaria_translation.translation_store import STORE_PATH, TranslationStore
+
+SAVED_DIR: Path = Path("saved_translations_json")
+CHAPTERS_DIR: Path = Path("saved_translations")
+
+UnitStatus = Literal["complete", "partial", "missing"]
+
+
+@dataclass
+class WorkUnit:
+    """One chapter of the title"""
+
+    section_num: int
+    chapter_num: int
+    passages: int
+    done_passages: int
+    status: UnitStatus
+
+
+@dataclass
+class WorkPlan:
+    title: str
+    units: list[WorkUnit] = field(default_factory=list)
+
+    def with_status(self, status: UnitStatus) -> list[WorkUnit]:
+        return [unit for unit in self.units if unit.status == status]
+
+    @property
+    def pending(self) -> list[WorkUnit]:
+        """Units that still need translating, partial ones first since they are part paid for"""
+        return self.with_status("partial") + self.with_status("missing")
+
+    @property
+    def pending_passages(self) -> int:
+        return sum(unit.passages - unit.done_passages for unit in self.pending)
+
+    def section_units(self, section_num: int) -> list[WorkUnit]:
+        return [unit for unit in self.units if unit.section_num == section_num]
+
+    def summary(self) -> str:
+        total_passages = sum(unit.passages for unit in self.units)
+        lines = [
+            f"{self.title.replace('_', ' ')}: "
+            f"{len(self.with_status('complete'))} complete, "
+            f"{len(self.with_status('partial'))} partial, "
+            f"{len(self.with_status('missing'))} missing chapters. "
+            f"{total_passages - self.pending_passages}/{total_passages} passages done."
+        ]
+        for section_num in sorted({unit.section_num for unit in self.units}):
+            units = self.section_units(section_num)
+            complete = sum(unit.status == "complete" for unit in units)
+            partial = sum(unit.status == "partial" for unit in units)
+            lines.append(
+                f"  Section {section_num}: {complete}/{len(units)} complete"
+                + (f", {partial} partial" if partial else "")
+            )
+        return "\n".join(lines)
+
+
+def title_shape(title: str) -> list[list[int]]:
+    """Passages per chapter for each section of the title"""
+    mirror = get_mirror(title)
+    if mirror is not None:
+        return mirror.shape
+    return fetch_sefaria_shape(title)["chapters"]
+
+
+def list_chapter_files(
+    directory: Path, title: str, suffix: str
+) -> dict[tuple[int, int], Path]:
+    """Finds files named like pardes_rimmonim_30_1.json with one directory listing"""
+    pattern = re.compile(rf"^{re.escape(title.lower())}_(\d+)_(\d+){re.escape(suffix)}$")
+    if not directory.is_dir():
+        return {}
+    found: dict[tuple[int, int], Path] = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match:
+                found[(int(match[1]), int(match[2]))] = Path(entry.path)
+    return found
+
+
+def saved_chapters(
+    title: str,
+    saved_dir: Optional[Path] = None,
+    chapters_dir: Optional[Path] = None,
+    store_path: Optional[Path] = STORE_PATH,
+) -> set[tuple[int, int]]:
+    """
+    (section_num, chapter_num) of every chapter saved in the store or in either JSON layout.
+
+    Args:
+        saved_dir: Legacy chapter files. Defaults to saved_translations_json/<title>.
+        chapters_dir: section_NNN directories of chapter files. Defaults to saved_translations/<title>.
+        store_path: The TranslationStore, None to leave it out. A store that does not exist is not created.
+    """
+    saved = set(list_chapter_files(saved_dir or SAVED_DIR / title.lower(), title, ".json"))
+    chapters_dir = chapters_dir or CHAPTERS_DIR / title.lower()
+    if chapters_dir.is_dir():
+        with os.scandir(chapters_dir) as entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name.startswith("section_"):
+                    saved.update(list_chapter_files(Path(entry.path), title, ".json"))
+    if store_path is not None and store_path.exists():
+        store = TranslationStore(store_path)
+        saved.update(store.chapter_keys(title))
+        store.close()
+    return saved
+
+
+def count_lines(path: Path) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def plan_title(
+    title: str,
+    saved_dir: Optional[Path] = None,
+    checkpoint_dir: Path = CHECKPOINT_DIR,
+    shape: Optional[list[list[int]]] = None,
+    chapters_dir: Optional[Path] = None,
+    store_path: Optional[Path] = STORE_PATH,
+) -> WorkPlan:
+    """
+    Compares the shape of a title with its saved chapters and checkpoints.
+
+    Args:
+        saved_dir, chapters_dir, store_path: Where chapters are saved, see saved_chapters
+        shape: Passages per chapter per section. Fetched if not given.
+    """
+    shape = shape if shape is not None else title_shape(title)
+    saved = saved_chapters(title, saved_dir, chapters_dir, store_path)
+    checkpoints = list_chapter_files(checkpoint_dir, title, ".jsonl")
+
+    plan = WorkPlan(title)
+    for section_num, chapters in enumerate(shape, start=1):
+        for chapter_num, passages in enumerate(chapters, start=1):
+            key = (section_num, chapter_num)
+            if key in saved:
+                status: UnitStatus = "complete"
+                done = passages
+            elif key in checkpoints:
+                status = "partial"
+                # A checkpoint can repeat a passage, never count more than the chapter has
+                done = min(passages, count_lines(checkpoints[key]))
+            else:
+                status = "missing"
+                done = 0
+            plan.units.append(
+                WorkUnit(section_num, chapter_num, passages, done, status)
+            )
+    return plan
+
+
+if __name__ == "__main__":
+    print(plan_title("Pardes_Rimmonim").summary())
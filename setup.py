@@ -5,4 +5,7 @@ setup(
     name="sefaria_translation",
     packages=find_packages(),
     version="0.1.0",
+    entry_points={
+        "console_scripts": ["sefaria-translate=sefaria_translation.cli:main"],
+    },
 )
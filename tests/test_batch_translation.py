@@ -0,0 +1,88 @@
+# test_batch_translation.py
+import json
+from types import SimpleNamespace
+import pytest
+from sefaria_translation import batch_translation, rimmonim_translation
+from sefaria_translation.batch_translation import BatchJob, resume_batch, submit_gates
+from sefaria_translation.translation_store import TranslationStore
+
+GATE = [["<b>פרק א</b>", "פסקה א"], ["פסקה ב", "פסקה ג", "פסקה ד"]]
+
+
+class FakeBatches:
+    """Local stand-in for client.messages.batches that answers every request on retrieve"""
+
+    def __init__(self, fail_ids: frozenset[str] = frozenset()) -> None:
+        self.batches: dict[str, list[dict]] = {}
+        self.fail_ids = fail_ids
+        self.polls = 0
+
+    def create(self, requests: list[dict]) -> SimpleNamespace:
+        batch_id = f"msgbatch_{len(self.batches)}"
+        self.batches[batch_id] = requests
+        return SimpleNamespace(id=batch_id)
+
+    def retrieve(self, batch_id: str) -> SimpleNamespace:
+        self.polls += 1
+        status = "ended" if self.polls > 1 else "in_progress"
+        return SimpleNamespace(id=batch_id, processing_status=status)
+
+    def results(self, batch_id: str):
+        for request in self.batches[batch_id]:
+            if request["custom_id"] in self.fail_ids:
+                result = SimpleNamespace(type="errored")
+            else:
+                suffix = request["params"]["messages"][0]["content"][-1]["text"]
+                passage = suffix.split("<passage-to-translate>")[1].split("<")[0]
+                message = SimpleNamespace(
+                    content=[SimpleNamespace(text=f"EN: {passage}")],
+                    usage=SimpleNamespace(input_tokens=1, output_tokens=1),
+                    model="answering-model",
+                    stop_reason="end_turn",
+                )
+                result = SimpleNamespace(type="succeeded", message=message)
+            yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+
+
+def fake_client(batches: FakeBatches) -> SimpleNamespace:
+    return SimpleNamespace(messages=SimpleNamespace(batches=batches))
+
+
+@pytest.fixture(autouse=True)
+def offline_gate(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch_translation, "fetch_gate", lambda gate_num: GATE)
+    store = TranslationStore(tmp_path / "translations.sqlite3")
+    monkeypatch.setattr(rimmonim_translation, "get_translation_store", lambda: store)
+
+
+def test_submit_and_resume_saves_chapters(tmp_path):
+    batches = FakeBatches()
+    job = submit_gates([30], fake_client(batches))
+    assert job.chapters == [(30, 1), (30, 2)]
+    assert sum(len(r) for r in batches.batches.values()) == 5
+
+    # Resume from the saved job file, as a later process would
+    resumed = BatchJob.from_file(tmp_path / job.file_path)
+    assert resume_batch(resumed, fake_client(batches), wait=False) == []
+    saved = resume_batch(resumed, fake_client(batches), poll_interval=0)
+    assert saved == [(30, 1), (30, 2)]
+
+    saved_file = tmp_path / "saved_translations_json/pardes_rimmonim/pardes_rimmonim_30_2.json"
+    data = json.loads(saved_file.read_text(encoding="utf-8"))
+    assert [p["english"] for p in data["translation"]] == [
+        "EN: פסקה ב",
+        "EN: פסקה ג",
+        "EN: פסקה ד",
+    ]
+    # Saved with the model that answered and each passage's usage, like a live run
+    assert data["model"] == "answering-model"
+    assert data["prompt_version"] == rimmonim_translation.PROMPT_VERSION
+    assert [p["llm_call"]["output_tokens"] for p in data["translation"]] == [1, 1, 1]
+
+
+def test_failed_passage_leaves_chapter_pending(tmp_path):
+    batches = FakeBatches()
+    job = submit_gates([30], fake_client(batches))
+    batches.fail_ids = frozenset([batches.batches[job.batch_ids[0]][0]["custom_id"]])
+    assert resume_batch(job, fake_client(batches), poll_interval=0) == [(30, 2)]
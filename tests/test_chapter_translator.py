@@ -0,0 +1,226 @@
+# test_chapter_translator.py
+import random
+import re
+import threading
+import time
+import pytest
+from sefaria_translation.chapter_translator import (
+    ChapterTranslator,
+    TranslationInterrupted,
+)
+from sefaria_translation.checkpoint import PassageCheckpoint
+from sefaria_translation.text_reference import ChapterReference
+from sefaria_translation.translation_memory import TranslationMemory
+
+
+def passage_of(prompt: str) -> str:
+    """Pulls the marked passage out of a translation prompt"""
+    start = prompt.rindex("<passage-to-translate>") + len("<passage-to-translate>")
+    end = prompt.rindex("</passage-to-translate>")
+    return prompt[start:end]
+
+
+def fake_generation(prompt: str) -> str:
+    time.sleep(random.uniform(0, 0.01))
+    return f"EN: {passage_of(prompt)}"
+
+
+@pytest.fixture
+def chapter_ref():
+    ref = ChapterReference("Pardes_Rimmonim", 30, 1)
+    ref.section_name = "Gate"
+    return ref
+
+
+@pytest.fixture
+def chapter():
+    return [f"passage {i}" for i in range(1, 21)]
+
+
+def test_sequential_translation(chapter_ref, chapter):
+    translator = ChapterTranslator(chapter_ref, chapter, fake_generation)
+    result = translator.translate_chapter()
+    assert result == [(p, f"EN: {p}") for p in chapter]
+    assert chapter_ref.passage_num is None
+
+
+def test_concurrent_translation_keeps_passage_order(chapter_ref, chapter):
+    sequential = ChapterTranslator(chapter_ref, chapter, fake_generation)
+    concurrent = ChapterTranslator(chapter_ref, chapter, fake_generation)
+    assert concurrent.translate_chapter(max_concurrency=8) == (
+        sequential.translate_chapter()
+    )
+    assert chapter_ref.passage_num is None
+
+
+def test_concurrent_translation_resumes_partial_chapter(chapter_ref, chapter):
+    translator = ChapterTranslator(chapter_ref, chapter, fake_generation)
+    translator.translations = ["done 1", "done 2"]
+    result = translator.translate_chapter(max_concurrency=4)
+    assert result[:2] == [(chapter[0], "done 1"), (chapter[1], "done 2")]
+    assert result[2:] == [(p, f"EN: {p}") for p in chapter[2:]]
+
+
+def test_concurrent_failure_keeps_ordered_prefix(chapter_ref, chapter):
+    def failing_generation(prompt: str) -> str:
+        if passage_of(prompt) == "passage 5":
+            raise RuntimeError("boom")
+        return fake_generation(prompt)
+
+    translator = ChapterTranslator(chapter_ref, chapter, failing_generation)
+    with pytest.raises(Exception, match="boom"):
+        translator.translate_chapter(max_concurrency=4)
+    assert len(translator.translations) <= 4
+    assert translator.zip_translations() == [
+        (p, f"EN: {p}") for p in chapter[: len(translator.translations)]
+    ]
+
+
+def packed_generation(prompt: str) -> str:
+    """Answers packed prompts with tagged translations and single prompts like fake_generation"""
+    passages = re.findall(
+        r'<passage-to-translate passage="(\d+)">(.*?)</passage-to-translate>', prompt
+    )
+    if not passages:
+        return fake_generation(prompt)
+    return "\n".join(
+        f'<translation passage="{num}">EN: {text}</translation>'
+        for num, text in passages
+    )
+
+
+def test_packing_uses_fewer_calls(chapter_ref, chapter):
+    prompts: list[str] = []
+
+    def counting_generation(prompt: str) -> str:
+        prompts.append(prompt)
+        return packed_generation(prompt)
+
+    translator = ChapterTranslator(
+        chapter_ref, chapter, counting_generation, pack_token_budget=20
+    )
+    groups = translator.passage_groups()
+    result = translator.translate_chapter()
+    assert result == [(p, f"EN: {p}") for p in chapter]
+    assert len(prompts) == len(groups) < len(chapter)
+
+
+def test_packing_falls_back_when_response_is_misaligned(chapter_ref, chapter):
+    def misaligned_generation(prompt: str) -> str:
+        if 'passage="' in prompt:
+            return "<translation passage=\"1\">only one</translation>"
+        return fake_generation(prompt)
+
+    translator = ChapterTranslator(
+        chapter_ref, chapter, misaligned_generation, pack_token_budget=20
+    )
+    assert translator.translate_chapter(max_concurrency=4) == [
+        (p, f"EN: {p}") for p in chapter
+    ]
+
+
+def test_resume_from_checkpoint(chapter_ref, chapter, tmp_path):
+    checkpoint = PassageCheckpoint(tmp_path / "chapter.jsonl")
+    calls: list[str] = []
+
+    def failing_generation(prompt: str) -> str:
+        calls.append(passage_of(prompt))
+        if passage_of(prompt) == "passage 8":
+            raise RuntimeError("boom")
+        return fake_generation(prompt)
+
+    translator = ChapterTranslator(
+        chapter_ref, chapter, failing_generation, checkpoint=checkpoint
+    )
+    with pytest.raises(Exception, match="boom"):
+        translator.translate_chapter()
+    # Simulate a passage completed out of order and a line cut short by a crash
+    checkpoint.record(10, chapter[9], "EN: passage 10")
+    with open(checkpoint.path, "a", encoding="utf-8") as f:
+        f.write('{"passage_num": 11, "heb')
+
+    calls.clear()
+    fresh = ChapterTranslator(chapter_ref, chapter, failing_generation)
+    resumed = ChapterTranslator.resume(fresh, checkpoint)
+    assert len(resumed.translations) == 7
+    assert resumed.recovered == {10: "EN: passage 10"}
+
+    resumed.llm_generation = fake_generation
+    assert resumed.translate_chapter(max_concurrency=3) == [
+        (p, f"EN: {p}") for p in chapter
+    ]
+    assert len(checkpoint.load()) == len(chapter)
+
+
+def test_resume_restores_call_metadata_after_torn_line(chapter_ref, chapter, tmp_path):
+    checkpoint = PassageCheckpoint(tmp_path / "chapter.jsonl")
+    checkpoint.record(1, chapter[0], "EN: passage 1", {"calls": 1, "model": "claude-test"})
+    with open(checkpoint.path, "a", encoding="utf-8") as f:
+        f.write('{"passage_num": 2, "heb')
+    checkpoint.record(3, chapter[2], "EN: passage 3", {"calls": 1, "model": "claude-test"})
+    assert sorted(checkpoint.load()) == [1, 3]
+
+    resumed = ChapterTranslator.resume(
+        ChapterTranslator(chapter_ref, chapter, fake_generation), checkpoint
+    )
+    resumed.translate_chapter()
+    metadata = resumed.call_metadata()
+    assert metadata[0] == {"calls": 1, "model": "claude-test"}
+    assert metadata[2] == {"calls": 1, "model": "claude-test"}
+    assert all(call is not None for call in metadata)
+    assert len(checkpoint.load()) == len(chapter)
+
+
+def test_stop_event_stops_new_calls(chapter_ref, chapter, tmp_path):
+    stop_event = threading.Event()
+    checkpoint = PassageCheckpoint(tmp_path / "chapter.jsonl")
+
+    def stopping_generation(prompt: str) -> str:
+        if passage_of(prompt) == "passage 4":
+            stop_event.set()
+        return fake_generation(prompt)
+
+    translator = ChapterTranslator(
+        chapter_ref,
+        chapter,
+        stopping_generation,
+        checkpoint=checkpoint,
+        stop_event=stop_event,
+    )
+    with pytest.raises(TranslationInterrupted):
+        translator.translate_chapter(max_concurrency=2)
+    # Passages in flight when the event was set finish and are recorded
+    assert 4 <= len(checkpoint.load()) < len(chapter)
+    assert 4 in checkpoint.load()
+
+
+def test_translation_memory_reuses_repeated_passages():
+    memory = TranslationMemory(threshold=0.8, min_words=4)
+    long_passage = "ויאמר רבי שמעון בן יוחאי כי הספירות הן עשר ולא תשע עשר ולא אחת עשרה"
+    memory.add(long_passage, "Stored translation", (1, 1, 1))
+    calls: list[str] = []
+
+    def generation(prompt: str) -> str:
+        calls.append(prompt)
+        return f"translation {len(calls)}"
+
+    def translate(chapter_num: int, chapter: list[str]) -> ChapterTranslator:
+        translator = ChapterTranslator(
+            ChapterReference("Pardes_Rimmonim", 2, chapter_num),
+            chapter,
+            generation,
+            translation_memory=memory,
+        )
+        translator.translate_chapter()
+        return translator
+
+    first = translate(1, ["<b>פרק ראשון</b>", long_passage.replace("ויאמר", "אמר")])
+    assert first.translations == ["translation 1", "Stored translation"]
+    assert first.calls[2]["translation_memory"] == "near"
+    assert first.calls[2]["source"] == [1, 1, 1]
+
+    # New translations are remembered, so a later chapter repeating them makes no call
+    second = translate(2, ["<b>פרק ראשון</b>", "פסקה חדשה"])
+    assert second.translations == ["translation 1", "translation 2"]
+    assert second.calls[1]["translation_memory"] == "exact"
+    assert len(calls) == 2
@@ -0,0 +1,127 @@
+# test_cli.py
+import json
+import subprocess
+import sys
+import pytest
+from sefaria_translation import cli, rimmonim_translation
+from sefaria_translation.translation_prompt import PROMPT_VERSION
+from sefaria_translation.translation_store import TranslationStore
+
+GATE = [["פסקה א"], ["פסקה ב"], ["פסקה ג"]]
+
+
+@pytest.fixture(autouse=True)
+def offline_gate(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rimmonim_translation, "fetch_gate", lambda gate_num: GATE)
+    store = TranslationStore(tmp_path / "translations.sqlite3")
+    monkeypatch.setattr(rimmonim_translation, "get_translation_store", lambda: store)
+
+
+def test_parse_gates():
+    assert cli.parse_gates("21,27") == [21, 27]
+    assert cli.parse_gates("21-23,30") == [21, 22, 23, 30]
+
+
+@pytest.mark.parametrize(
+    "overwrite, translated",
+    [("skip", ["new"]), ("replace", ["old", "outdated", "new"]), ("if-newer", ["outdated", "new"])],
+)
+def test_run_overwrite_policies(monkeypatch, overwrite, translated):
+    rimmonim_translation.save_chapter_translation([("פסקה א", "old")], 30, 1)
+    rimmonim_translation.save_chapter_translation([("פסקה ב", "outdated")], 30, 2)
+    # Chapter 2 was saved by an older version of the prompts, and only in the JSON layout
+    rimmonim_translation.get_translation_store().delete_chapter("Pardes_Rimmonim", 30, 2)
+    path = rimmonim_translation.saved_json_path(30, 2)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    path.write_text(json.dumps({**data, "prompt_version": PROMPT_VERSION - 1}), encoding="utf-8")
+
+    names = {"פסקה א": "old", "פסקה ב": "outdated", "פסקה ג": "new"}
+    called: list[str] = []
+
+    def generation(prompt: str) -> str:
+        passage = prompt.split("<passage-to-translate>")[1].split("</passage-to-translate>")[0]
+        called.append(names[passage.strip()])
+        return "translation"
+
+    monkeypatch.setattr(rimmonim_translation, "cached_ask_claude", generation)
+
+    assert cli.main(["run", "--gates", "30", "--workers", "2", "--overwrite", overwrite]) == 0
+    assert sorted(called) == sorted(translated)
+
+
+def test_run_writes_traces_only_when_asked(monkeypatch, tmp_path):
+    from sefaria_translation import tracing
+
+    monkeypatch.setattr(rimmonim_translation, "cached_ask_claude", lambda prompt: "translation")
+    monkeypatch.setattr(tracing.tracer, "path", None)
+    assert cli.main(["run", "--gates", "30"]) == 0
+    assert not (tmp_path / "traces").exists()
+
+    rimmonim_translation.get_translation_store().delete_chapter("Pardes_Rimmonim", 30, 1)
+    rimmonim_translation.saved_json_path(30, 1).unlink()
+    assert cli.main(["run", "--gates", "30", "--trace", str(tmp_path / "spans.jsonl")]) == 0
+    assert tracing.summarize(tmp_path / "spans.jsonl")["chapter"]["count"] == 1
+
+
+def test_plan_and_status_agree_on_saved_chapters(monkeypatch, capsys, tmp_path):
+    from sefaria_translation import work_planner
+
+    monkeypatch.setattr(work_planner, "title_shape", lambda title: [[]] * 20 + [[1, 1]] + [[]] * 8 + [[1, 1, 1]])
+    rimmonim_translation.save_chapter_translation([("פסקה א", "a")], 30, 1)
+    rimmonim_translation.save_chapter_translation([("פסקה ב", "b")], 30, 2)
+    # Chapter 1 only in the store, chapter 2 only in the JSON layout
+    rimmonim_translation.saved_json_path(30, 1).unlink()
+    rimmonim_translation.get_translation_store().delete_chapter("Pardes_Rimmonim", 30, 2)
+    store = ["--store", str(tmp_path / "translations.sqlite3")]
+
+    assert cli.main(["status", *store]) == 0
+    assert "2 chapters saved" in capsys.readouterr().out
+    assert cli.main(["status", "--gates", "21", *store]) == 0
+    assert "0 chapters saved" in capsys.readouterr().out
+
+    assert cli.main(["plan", *store]) == 0
+    assert "2 complete, 0 partial, 3 missing chapters" in capsys.readouterr().out
+    assert cli.main(["plan", "--gates", "30", *store]) == 0
+    assert "2 complete, 0 partial, 1 missing chapters. 2/3 passages done" in capsys.readouterr().out
+
+
+def test_offline_commands_start_without_heavy_imports():
+    # A fresh interpreter, since the test session has imported everything already
+    probe = (
+        "import sys, sefaria_translation.cli, sefaria_translation.claude; "
+        "print([name for name in ('anthropic', 'pydantic', 'requests', 'numpy') if name in sys.modules])"
+    )
+    env = {"PATH": "", "PYTHONPATH": ":".join(sys.path)}
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True, env=env)
+    assert output.stdout.strip() == "[]"
+
+
+def test_replace_run_calls_the_llm_again(monkeypatch, tmp_path):
+    from sefaria_translation.llm_cache import LLMCache
+
+    cache = LLMCache(tmp_path / "responses.sqlite3")
+    monkeypatch.setattr(rimmonim_translation, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(rimmonim_translation, "get_client_pool", lambda: None)
+    monkeypatch.setattr(rimmonim_translation, "_cached_generation", None)
+    called: list[str] = []
+
+    def ask_claude(prompt: str) -> str:
+        called.append(prompt)
+        return f"translation {len(called)}"
+
+    monkeypatch.setattr(rimmonim_translation, "ask_claude", ask_claude)
+
+    assert cli.main(["run", "--gates", "30"]) == 0
+    assert len(called) == 3
+    assert cli.main(["run", "--gates", "30", "--overwrite", "replace"]) == 0
+    assert len(called) == 6
+    saved = rimmonim_translation.get_translation_store().chapter("Pardes_Rimmonim", 30, 1)
+    assert saved.passages == [("פסקה א", "translation 4")]
+    # The new responses were cached, so translating the chapter once more makes no call
+    rimmonim_translation.get_translation_store().delete_chapter("Pardes_Rimmonim", 30, 1)
+    rimmonim_translation.saved_json_path(30, 1).unlink()
+    assert cli.main(["run", "--gates", "30"]) == 0
+    assert len(called) == 6
+    saved = rimmonim_translation.get_translation_store().chapter("Pardes_Rimmonim", 30, 1)
+    assert saved.passages == [("פסקה א", "translation 4")]
@@ -0,0 +1,128 @@
+# test_client_pool.py
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from sefaria_translation.chapter_translator import ChapterTranslator
+from sefaria_translation.client_pool import ClientPool, MemberConfig
+from sefaria_translation.text_reference import ChapterReference
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int, headers: dict[str, str]) -> None:
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers)
+
+
+def pool(*limits: int, **options) -> ClientPool:
+    return ClientPool(
+        [MemberConfig(f"key{i}", api_key="test", max_concurrency=limit) for i, limit in enumerate(limits)],
+        **options,
+    )
+
+
+def test_routes_to_least_loaded_member():
+    client_pool = pool(1, 3)
+    started = threading.Barrier(5)  # The four calls and this thread
+    release = threading.Event()
+    used: list[str] = []
+
+    def call(member) -> None:
+        used.append(member.name)
+        started.wait()
+        release.wait()
+
+    threads = [threading.Thread(target=client_pool.call, args=(call,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    assert sorted(used) == ["key0", "key1", "key1", "key1"]
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert client_pool.utilization()["key1"]["calls"] == 3
+
+
+def test_rate_limited_member_cools_down_and_call_moves_on():
+    client_pool = pool(4, 4)
+    failing = {"key0"}
+    used: list[str] = []
+
+    def call(member) -> str:
+        used.append(member.name)
+        if member.name in failing:
+            raise APIError(429, {"retry-after": "30"})
+        return member.name
+
+    assert client_pool.call(call) == "key1"
+    assert used == ["key0", "key1"]
+    # key0 stays out of rotation for its retry-after, so later calls skip it
+    assert [client_pool.call(call) for _ in range(3)] == ["key1"] * 3
+    assert client_pool.utilization()["key0"]["cooldown_left"] > 25
+
+
+def test_single_member_recovers_after_cooldown():
+    client_pool = pool(2, cooldown=0.05, failure_threshold=1)
+    failures = [APIError(529, {})]
+
+    def call(member) -> str:
+        if failures:
+            raise failures.pop()
+        return "ok"
+
+    start = time.monotonic()
+    assert client_pool.call(call) == "ok"
+    assert time.monotonic() - start >= 0.04
+    assert client_pool.utilization()["key0"]["failures"] == 1
+
+
+def test_other_errors_are_raised():
+    client_pool = pool(2, 2)
+    with pytest.raises(APIError):
+        client_pool.call(lambda member: (_ for _ in ()).throw(APIError(400, {})))
+    assert all(usage["in_flight"] == 0 for usage in client_pool.utilization().values())
+    assert sum(usage["failures"] for usage in client_pool.utilization().values()) == 1
+
+
+def test_last_failed_retry_is_counted():
+    client_pool = pool(2, max_retries=1, cooldown=0.01, failure_threshold=10)
+    with pytest.raises(APIError):
+        client_pool.call(lambda member: (_ for _ in ()).throw(APIError(529, {})))
+    assert client_pool.utilization()["key0"]["failures"] == 2
+
+
+def test_rejected_key_without_another_member_is_raised_at_once():
+    client_pool = pool(2)
+    start = time.monotonic()
+    with pytest.raises(APIError):
+        client_pool.call(lambda member: (_ for _ in ()).throw(APIError(401, {})))
+    assert time.monotonic() - start < 1
+    assert client_pool.utilization()["key0"]["failures"] == 1
+
+
+def test_rejected_key_is_retried_on_another_member():
+    client_pool = pool(2, 2)
+
+    def call(member) -> str:
+        if member.name == "key0":
+            raise APIError(403, {})
+        return member.name
+
+    assert client_pool.call(call) == "key1"
+    assert client_pool.utilization()["key0"]["cooldown_left"] > 0
+
+
+def test_ask_is_an_llm_generation_function():
+    client_pool = pool(2, 2)
+    message = SimpleNamespace(
+        content=[SimpleNamespace(text="translation")],
+        usage=SimpleNamespace(input_tokens=10, output_tokens=2),
+        model="model",
+        stop_reason="end_turn",
+    )
+    for member in client_pool.members:
+        member._client = SimpleNamespace(messages=SimpleNamespace(create=lambda **params: message))
+    translator = ChapterTranslator(ChapterReference("Pardes_Rimmonim", 30, 1), ["א", "ב", "ג"], client_pool.ask)
+    assert translator.translate_chapter(max_concurrency=3) == [("א", "translation"), ("ב", "translation"), ("ג", "translation")]
+    assert sum(usage["calls"] for usage in client_pool.utilization().values()) == 3
@@ -0,0 +1,66 @@
+# test_concurrency.py
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+from sefaria_translation.concurrency import ConcurrencyGovernor, retry_after
+
+
+class OverloadedError(Exception):
+    status_code = 529
+
+    def __init__(self, headers: dict[str, str]) -> None:
+        super().__init__("overloaded_error")
+        self.response = SimpleNamespace(headers=headers)
+
+
+def test_retries_overload_and_cuts_limit():
+    governor = ConcurrencyGovernor(initial_limit=8, base_delay=0)
+    failures = [OverloadedError({}), OverloadedError({})]
+
+    def flaky() -> str:
+        if failures:
+            raise failures.pop()
+        return "ok"
+
+    assert governor.call(flaky) == "ok"
+    assert governor.retries == 2
+    assert governor.current_limit == 4  # Two overloads in one spike only cut once
+    assert governor.in_flight == 0
+
+
+def test_limit_grows_additively_on_success():
+    governor = ConcurrencyGovernor(initial_limit=2, max_limit=3)
+    for _ in range(10):
+        governor.call(lambda: None)
+    assert governor.current_limit == 3
+
+
+def test_other_errors_are_not_retried():
+    governor = ConcurrencyGovernor()
+    with pytest.raises(ValueError):
+        governor.call(lambda: int("x"))
+    assert governor.retries == 0
+
+
+def test_limit_bounds_in_flight_calls():
+    governor = ConcurrencyGovernor(initial_limit=2, max_limit=2)
+    peak = 0
+
+    def slow() -> None:
+        nonlocal peak
+        peak = max(peak, governor.in_flight)
+        time.sleep(0.01)
+
+    threads = [threading.Thread(target=governor.call, args=(slow,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+
+
+def test_retry_after_headers():
+    assert retry_after(OverloadedError({"retry-after": "3"})) == 3
+    assert retry_after(OverloadedError({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after(OverloadedError({})) is None
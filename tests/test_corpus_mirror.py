@@ -0,0 +1,76 @@
+# test_corpus_mirror.py
+import pytest
+from sefaria_translation.sefaria_api import corpus_mirror, fetch_sefaria_text
+from sefaria_translation.sefaria_api.corpus_mirror import build_mirror
+from sefaria_translation.text_reference import TextReference
+
+SECTIONS = [
+    [["<b>שער א</b>", "פסקה"], ["פרק ב"]],
+    [[], ["אחת", "שתים", "שלש"]],
+]
+
+
+@pytest.fixture(autouse=True)
+def mirror_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(corpus_mirror, "MIRROR_DIR", tmp_path)
+    monkeypatch.setattr(corpus_mirror, "_open_mirrors", {})
+    monkeypatch.setattr(
+        fetch_sefaria_text,
+        "fetch_sefaria_shape",
+        lambda title: {"title": title, "length": 2, "chapters": [[2, 1], [0, 3]]},
+    )
+
+
+def fake_fetch(text_ref, use_mirror=True):
+    assert not use_mirror
+    return SECTIONS[text_ref.section_num - 1]
+
+
+def test_build_and_serve_from_mirror(monkeypatch):
+    monkeypatch.setattr(fetch_sefaria_text, "fetch_sefaria_text", fake_fetch)
+    mirror = build_mirror("Pardes_Rimmonim", "Gate", workers=2)
+    assert mirror.passage(2, 2, 3) == "שלש"
+    assert mirror.section(2) == SECTIONS[1]
+
+
+def test_fetch_uses_mirror_first(monkeypatch):
+    original_fetch = fetch_sefaria_text.fetch_sefaria_text
+    monkeypatch.setattr(fetch_sefaria_text, "fetch_sefaria_text", fake_fetch)
+    build_mirror("Pardes_Rimmonim", "Gate")
+
+    # With the mirror built, the real fetch function answers without the network
+    assert original_fetch(TextReference("Pardes_Rimmonim", 1)) == SECTIONS[0]
+    assert original_fetch(TextReference("Pardes_Rimmonim", 1, 2)) == ["פרק ב"]
+    assert original_fetch(TextReference("Pardes_Rimmonim", 2, 2, 3)) == "שלש"
+
+
+def test_fetch_falls_back_to_api_outside_mirror(monkeypatch):
+    original_fetch = fetch_sefaria_text.fetch_sefaria_text
+    monkeypatch.setattr(fetch_sefaria_text, "fetch_sefaria_text", fake_fetch)
+    build_mirror("Pardes_Rimmonim", "Gate")
+
+    urls: list[str] = []
+
+    def get_json(url: str) -> dict:
+        urls.append(url)
+        return {"versions": [{"text": [["שער ג"]]}]}
+
+    monkeypatch.setattr(fetch_sefaria_text.sefaria_client, "get_json", get_json)
+    assert original_fetch(TextReference("Pardes_Rimmonim", 3)) == [["שער ג"]]
+    assert original_fetch(TextReference("Pardes_Rimmonim", 2, 2, 4)) == [["שער ג"]]
+    assert len(urls) == 2
+    # References inside the mirror still never reach the network
+    assert original_fetch(TextReference("Pardes_Rimmonim", 2, 2, 3)) == "שלש"
+    assert len(urls) == 2
+
+
+def test_rebuild_does_not_disturb_open_mirror(monkeypatch):
+    monkeypatch.setattr(fetch_sefaria_text, "fetch_sefaria_text", fake_fetch)
+    build_mirror("Pardes_Rimmonim", "Gate")
+    # Another process with the mirror open keeps reading the files it mapped
+    reader = corpus_mirror.CorpusMirror(corpus_mirror.CorpusMirror.title_directory("Pardes_Rimmonim"))
+    corpus_mirror.write_mirror(reader.directory, "Pardes_Rimmonim", "Gate", [[["short"]]])
+    assert reader.passage(2, 2, 3) == "שלש"
+    reader.close()
+    assert corpus_mirror.CorpusMirror(reader.directory).passage(1, 1, 1) == "short"
+    assert sorted(path.name for path in reader.directory.iterdir()) == ["index.bin", "meta.json", "passages.dat"]
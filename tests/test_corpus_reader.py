@@ -0,0 +1,40 @@
+# test_corpus_reader.py
+import json
+from pathlib import Path
+from sefaria_translation.corpus_reader import chapter_files, read_corpus
+from sefaria_translation.schemas.base_schema import TranslatedChapter, TranslatedPassage
+
+
+def test_reads_both_layouts_in_order(tmp_path: Path):
+    legacy = {
+        "title": "Pardes Rimmonim",
+        "gate_num": 2,
+        "chapter_num": 1,
+        "model": "claude-test",
+        "prompt_version": 3,
+        "translation": [
+            {"hebrew": "א", "english": "a", "llm_call": {"calls": 1}},
+            {"hebrew": "ב", "english": "b"},
+        ],
+    }
+    (tmp_path / "pardes_rimmonim_2_1.json").write_text(json.dumps(legacy), encoding="utf-8")
+    section_dir = tmp_path / "section_001"
+    section_dir.mkdir()
+    TranslatedChapter(
+        section_num=1,
+        chapter_num=3,
+        passages=[TranslatedPassage(hebrew="ג", english="c", passage_num=1)],
+    ).to_file(section_dir / "pardes_rimmonim_1_3.json")
+
+    files = chapter_files(tmp_path, "Pardes_Rimmonim")
+    assert [f.key for f in files] == [(1, 3), (2, 1)]
+    assert "data" not in files[0].__dict__  # Nothing read yet
+    assert files[1].passages == [("א", "a"), ("ב", "b")]
+
+    chapters = read_corpus(tmp_path, "Pardes_Rimmonim")
+    assert [c.chapter_num for c in chapters] == [3, 1]
+    assert [p.passage_num for p in chapters[1].passages] == [1, 2]
+    assert chapters[1].passages[1].english == "b"
+    assert chapters[1].ai_model_version == "claude-test"
+    assert chapters[1].prompt_version == 3
+    assert [p.llm_call for p in chapters[1].passages] == [{"calls": 1}, None]
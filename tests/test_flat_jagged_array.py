@@ -0,0 +1,35 @@
+# test_flat_jagged_array.py
+import pytest
+from sefaria_translation.schemas.flat_jagged_array import FlatJaggedArray
+
+CONTENT = [
+    [["a", "bb"], ["ccc"]],
+    [],
+    [[], ["dddd", "e", "ff"]],
+]
+
+
+def test_round_trip_and_lookup():
+    flat = FlatJaggedArray.from_nested(CONTENT)
+    assert flat.depth == 3
+    assert flat.to_nested() == CONTENT
+    assert flat.passage((2, 1, 2)) == "ff"
+    assert flat.passage((0, 1, 0)) == "ccc"
+    assert flat.node((2,)) == CONTENT[2]
+    assert flat.node((0, 0)) == ["a", "bb"]
+    assert flat.passage_range((2, 1)) == (3, 6)
+    with pytest.raises(IndexError):
+        flat.passage((1, 0, 0))
+
+
+def test_vectorized_counts():
+    flat = FlatJaggedArray.from_nested(CONTENT)
+    assert flat.passage_counts(0).tolist() == [3, 0, 3]
+    assert flat.passage_counts(1).tolist() == [2, 1, 0, 3]
+    assert flat.child_counts(0).tolist() == [2, 0, 2]
+    assert flat.passage_lengths(0).tolist() == [6, 0, 7]
+
+
+def test_rejects_branches_of_different_depths():
+    with pytest.raises(ValueError):
+        FlatJaggedArray.from_nested([["a"], "b"])
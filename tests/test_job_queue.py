@@ -0,0 +1,87 @@
+# test_job_queue.py
+import threading
+import time
+import pytest
+from pathlib import Path
+from sefaria_translation.job_queue import JobQueue
+
+TITLE = "Pardes_Rimmonim"
+
+
+@pytest.fixture
+def queue(tmp_path: Path) -> JobQueue:
+    return JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=60, max_attempts=2)
+
+
+def test_claims_biggest_first_and_never_twice(queue: JobQueue):
+    assert queue.enqueue(TITLE, [(30, 1, 10), (30, 2, 50), (30, 3, 20)]) == 3
+    # Enqueueing again leaves existing chapters alone
+    assert queue.enqueue(TITLE, [(30, 1, 10), (30, 4, 5)]) == 1
+
+    claimed: list[tuple[int, int]] = []
+
+    def worker(index: int) -> None:
+        while (lease := queue.claim(f"worker-{index}")) is not None:
+            claimed.append(lease.key)
+            queue.complete(lease)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == [(30, 1), (30, 2), (30, 3), (30, 4)]
+    assert queue.counts(TITLE)["done"] == 4
+
+
+def test_failures_retry_then_go_dead(queue: JobQueue):
+    queue.enqueue(TITLE, [(30, 1, 10)])
+    lease = queue.claim("a")
+    queue.fail(lease, "bad passage")
+    lease = queue.claim("b")
+    assert lease.attempt == 2
+    queue.fail(lease, "bad passage")
+    assert queue.claim("c") is None
+    assert queue.dead_jobs(TITLE) == [(TITLE, 30, 1, "bad passage")]
+
+    assert queue.retry_dead(TITLE) == 1
+    assert queue.claim("c").attempt == 1
+
+
+def test_expired_lease_is_claimed_again(tmp_path: Path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=0.05)
+    queue.enqueue(TITLE, [(30, 1, 10)])
+    crashed = queue.claim("crashed")
+    assert queue.claim("other") is None
+    time.sleep(0.1)
+    lease = queue.claim("other")
+    assert lease.worker == "other" and lease.attempt == 2
+    # The first worker lost its lease and can not finish the chapter
+    assert not queue.heartbeat(crashed)
+    assert not queue.complete(crashed)
+    assert queue.complete(lease)
+
+
+def test_keep_alive_holds_lease(tmp_path: Path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=0.15)
+    queue.enqueue(TITLE, [(30, 1, 10)])
+    lease = queue.claim("a")
+    with queue.keep_alive(lease) as lost:
+        time.sleep(0.4)
+        assert queue.claim("b") is None
+    assert not lost.is_set()
+    assert queue.complete(lease)
+
+
+def test_counts_do_not_wait_for_the_write_lock(tmp_path: Path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3", lease_seconds=0.05, max_attempts=1)
+    queue.enqueue(TITLE, [(30, 1, 10), (30, 2, 5)])
+    queue.claim("crashed")
+    time.sleep(0.1)
+    # Another worker holds the write lock, as claim does
+    writer = JobQueue(queue.path)
+    with writer.transaction():
+        start = time.monotonic()
+        assert queue.counts(TITLE) == {"pending": 1, "leased": 0, "done": 0, "dead": 1}
+        assert queue.dead_jobs(TITLE) == [(TITLE, 30, 1, "lease expired")]
+        assert time.monotonic() - start < 1
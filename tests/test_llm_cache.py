@@ -0,0 +1,43 @@
+# test_llm_cache.py
+from datetime import timedelta
+from sefaria_translation.llm_cache import LLMCache
+
+
+def counting_generation(calls: list[str]):
+    def generation(prompt: str) -> str:
+        calls.append(prompt)
+        return f"response to {prompt}"
+
+    return generation
+
+
+def test_cached_responses_are_reused_across_instances(tmp_path):
+    calls: list[str] = []
+    path = tmp_path / "cache.sqlite3"
+    cache = LLMCache(path)
+    generation = cache.wrap(counting_generation(calls), "model", 1024)
+    assert generation("a") == generation("a") == "response to a"
+    assert calls == ["a"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A new process sees the same cache, but a different model or prompt version misses
+    assert LLMCache(path).wrap(counting_generation(calls), "model", 1024)("a")
+    LLMCache(path).wrap(counting_generation(calls), "other-model", 1024)("a")
+    LLMCache(path, prompt_version=-1).wrap(counting_generation(calls), "model", 1024)("a")
+    assert calls == ["a", "a", "a"]
+
+
+def test_eviction_by_age_and_size(tmp_path):
+    cache = LLMCache(tmp_path / "cache.sqlite3", max_bytes=10, max_age=None)
+    for key in ["k1", "k2", "k3"]:
+        cache.put(key, "12345")
+    cache.get("k1")  # k1 is now more recently used than k2
+    cache.evict()
+    assert cache.get("k2") is None
+    assert cache.get("k1") == cache.get("k3") == "12345"
+
+    cache.max_age = timedelta(seconds=-1)
+    assert cache.get("k1") is None
+    cache.evict()
+    count = cache.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert count == 0
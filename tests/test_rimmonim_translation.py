@@ -0,0 +1,121 @@
+# test_rimmonim_translation.py
+import subprocess
+import sys
+import threading
+import pytest
+from pathlib import Path
+from sefaria_translation import rimmonim_translation
+from sefaria_translation.rimmonim_translation import check_translation_exists, translate_gate
+from sefaria_translation.job_queue import JobQueue
+from sefaria_translation.translation_store import TranslationStore
+
+GATE = [["פסקה א", "פסקה ב"], ["נכשל"], ["פסקה ג"], ["פסקה ד", "פסקה ה"]]
+
+
+def fake_generation(prompt: str) -> str:
+    if "<passage-to-translate>נכשל" in prompt:
+        raise RuntimeError("bad passage")
+    return "translation"
+
+
+@pytest.fixture(autouse=True)
+def offline_gate(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(rimmonim_translation, "fetch_gate", lambda gate_num: GATE)
+    monkeypatch.setattr(rimmonim_translation, "cached_ask_claude", fake_generation)
+    store = TranslationStore(tmp_path / "translations.sqlite3")
+    monkeypatch.setattr(rimmonim_translation, "get_translation_store", lambda: store)
+
+
+def test_parallel_gate_collects_failures_and_saves_the_rest():
+    failures = translate_gate(30, workers=3)
+    assert list(failures) == [(30, 2)]
+    assert [check_translation_exists(30, c) for c in range(1, 5)] == [
+        True,
+        False,
+        True,
+        True,
+    ]
+
+    # Saved chapters are skipped up front on the next run
+    assert list(translate_gate(30, workers=3)) == [(30, 2)]
+
+
+def test_saved_chapters_go_to_store_and_json():
+    translate_gate(30)
+    store = rimmonim_translation.get_translation_store()
+    assert store.chapter_keys("Pardes_Rimmonim") == {(30, 1), (30, 3), (30, 4)}
+    assert store.chapter("Pardes_Rimmonim", 30, 4).passages == [
+        ("פסקה ד", "translation"),
+        ("פסקה ה", "translation"),
+    ]
+    assert Path("saved_translations_json/pardes_rimmonim/pardes_rimmonim_30_4.json").exists()
+
+
+def test_workers_sharing_a_queue_translate_each_chapter_once(monkeypatch, tmp_path):
+    prompts: list[str] = []
+
+    def counting_generation(prompt: str) -> str:
+        prompts.append(prompt)
+        return fake_generation(prompt)
+
+    monkeypatch.setattr(rimmonim_translation, "cached_ask_claude", counting_generation)
+    queue = JobQueue(tmp_path / "jobs.sqlite3", max_attempts=2)
+    failures = translate_gate(30, workers=3, queue=queue)
+    assert list(failures) == [(30, 2)]
+    # The chapter that failed is retried until it runs out of attempts
+    assert queue.counts("Pardes_Rimmonim") == {"pending": 0, "leased": 0, "done": 3, "dead": 1}
+    assert len(prompts) == 5 + 2
+
+    # A second machine joining the same run finds nothing left to do
+    assert list(translate_gate(30, workers=3, queue=queue)) == []
+    assert len(prompts) == 7
+
+
+def test_translation_memory_reuses_near_duplicates_only_when_asked():
+    long_passage = (
+        "ויאמר רבי שמעון בן יוחאי כי הספירות הן עשר ולא תשע עשר ולא אחת עשרה "
+        "והן נאצלות מן המאציל העליון כסדר הזה ואין בהן שינוי כלל ועיקר"
+    )
+    rimmonim_translation.save_chapter_translation([(long_passage, "Stored translation")], 30, 1)
+    near_passage = long_passage.replace("ויאמר", "אמר")
+
+    exact_only = rimmonim_translation.load_translation_memory()
+    assert exact_only.lookup(long_passage).english == "Stored translation"
+    assert exact_only.lookup(near_passage) is None
+
+    near = rimmonim_translation.load_translation_memory(near_duplicates=True)
+    assert near.lookup(near_passage).english == "Stored translation"
+
+
+def test_lost_lease_stops_chapter_without_saving(monkeypatch):
+    lost = threading.Event()
+    lost.set()
+    job = rimmonim_translation.ChapterJob(30, 1, GATE[0])
+    with pytest.raises(rimmonim_translation.TranslationInterrupted):
+        rimmonim_translation.run_chapter(job, lease_lost=lost)
+    assert not check_translation_exists(30, 1)
+
+    # Lost after the last passage was translated, the chapter is still not saved
+    def losing_generation(prompt: str) -> str:
+        lost.set()
+        return "translation"
+
+    lost.clear()
+    monkeypatch.setattr(rimmonim_translation, "cached_ask_claude", losing_generation)
+    with pytest.raises(rimmonim_translation.LeaseLost):
+        rimmonim_translation.run_chapter(rimmonim_translation.ChapterJob(30, 3, GATE[2]), lease_lost=lost)
+    assert not check_translation_exists(30, 3)
+
+
+def test_import_creates_nothing_and_skips_heavy_packages(tmp_path):
+    probe = (
+        "import sys, sefaria_translation.rimmonim_translation; "
+        "print([name for name in ('anthropic', 'pydantic', 'requests', 'numpy') if name in sys.modules])"
+    )
+    workdir = tmp_path / "fresh"
+    workdir.mkdir()
+    env = {"PATH": "", "PYTHONPATH": ":".join(sys.path)}
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True, env=env, cwd=workdir)
+    assert output.stdout.strip() == "[]"
+    assert list(workdir.iterdir()) == []
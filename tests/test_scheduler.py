@@ -0,0 +1,49 @@
+# test_scheduler.py
+import heapq
+from sefaria_translation.scheduler import (
+    ETATracker,
+    estimate_chapter_tokens,
+    longest_first,
+)
+from sefaria_translation.text_reference import ChapterReference
+from sefaria_translation.translation_prompt import ContextPolicy
+
+
+def makespan(sizes: list[int], workers: int) -> int:
+    """Finish time when each job goes to the first free worker, in list order"""
+    free_at = [0] * workers
+    for size in sizes:
+        heapq.heappush(free_at, heapq.heappop(free_at) + size)
+    return max(free_at)
+
+
+def test_estimate_grows_quadratically_with_chapter_length():
+    ref = ChapterReference("Pardes_Rimmonim", 22, 1)
+    small = estimate_chapter_tokens(ref, ["פסקה ארוכה למדי"] * 10)
+    large = estimate_chapter_tokens(ref, ["פסקה ארוכה למדי"] * 100)
+    assert large.output_tokens == 10 * small.output_tokens
+    assert large.input_tokens > 20 * small.input_tokens
+    assert estimate_chapter_tokens(ref, []).total_tokens == 0
+
+
+def test_windowed_estimate_grows_linearly():
+    ref = ChapterReference("Pardes_Rimmonim", 22, 1)
+    policy = ContextPolicy(window=5, full_chapter_max_tokens=0)
+    small = estimate_chapter_tokens(ref, ["פסקה ארוכה למדי"] * 100, policy)
+    large = estimate_chapter_tokens(ref, ["פסקה ארוכה למדי"] * 1000, policy)
+    assert large.input_tokens < 11 * small.input_tokens
+    assert small.input_tokens < estimate_chapter_tokens(ref, ["פסקה ארוכה למדי"] * 100).input_tokens
+
+
+def test_longest_first_shortens_makespan():
+    sizes = [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 10]
+    assert makespan(longest_first(sizes, lambda s: s), 4) < makespan(sizes, 4)
+
+
+def test_eta_uses_throughput():
+    tracker = ETATracker(100)
+    assert tracker.eta is None
+    tracker.start -= 10
+    tracker.complete(25)
+    assert 29 < tracker.eta < 31
+    assert tracker.progress().startswith("25% of estimated tokens done")
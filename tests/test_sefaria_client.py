@@ -0,0 +1,80 @@
+# test_sefaria_client.py
+import subprocess
+import sys
+from types import SimpleNamespace
+import pytest
+import requests
+from sefaria_translation.sefaria_api.sefaria_client import (
+    SefariaClient,
+    SefariaOfflineError,
+    SefariaRequestError,
+)
+
+URL = "https://www.sefaria.org/api/v3/texts/Pardes_Rimmonim_30"
+
+
+class FakeSession:
+    """Serves one JSON body with an ETag and answers matching conditional requests with 304"""
+
+    def __init__(self) -> None:
+        self.requests: list[dict[str, str]] = []
+
+    def get(self, url: str, headers: dict[str, str], timeout) -> SimpleNamespace:
+        self.requests.append(headers)
+        status = 304 if headers.get("If-None-Match") == '"v1"' else 200
+        return SimpleNamespace(
+            status_code=status,
+            headers={"ETag": '"v1"'},
+            json=lambda: {"versions": [{"text": ["א"]}]},
+            raise_for_status=lambda: None,
+        )
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = SefariaClient(cache_dir=tmp_path, max_age=0)
+    client.session = FakeSession()
+    return client
+
+
+def test_revalidates_with_etag(client):
+    assert client.get_json(URL) == client.get_json(URL)
+    assert client.session.requests == [{}, {"If-None-Match": '"v1"'}]
+
+
+def test_fresh_cache_skips_network(client):
+    client.get_json(URL)
+    client.max_age = 60
+    client.get_json(URL)
+    assert len(client.session.requests) == 1
+
+
+def test_offline_mode_serves_cache_only(client, tmp_path):
+    client.get_json(URL)
+    offline = SefariaClient(cache_dir=tmp_path, offline=True)
+    assert offline.get_json(URL) == {"versions": [{"text": ["א"]}]}
+    with pytest.raises(SefariaOfflineError):
+        offline.get_json(URL + "_1")
+
+
+def test_request_failures_raise_the_client_error(client):
+    def fail(url: str, headers: dict[str, str], timeout) -> None:
+        raise requests.ConnectionError("unreachable")
+
+    client.session.get = fail
+    with pytest.raises(SefariaRequestError, match="unreachable"):
+        client.get_json(URL)
+
+
+def test_cached_fetch_does_not_import_requests(client, tmp_path):
+    client.get_json(URL)
+    # A fresh interpreter, since the test session has imported requests already
+    probe = (
+        "import sys; from sefaria_translation.sefaria_api import fetch_sefaria_text as f; "
+        f"f.sefaria_client.cache_dir = f.Path({str(tmp_path)!r}); f.sefaria_client.offline = True; "
+        "f.fetch_sefaria_text(f.TextReference('Pardes_Rimmonim', 30), use_mirror=False); "
+        "print('requests' in sys.modules)"
+    )
+    env = {"PATH": "", "PYTHONPATH": ":".join(sys.path)}
+    output = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True, env=env, cwd=tmp_path)
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,83 @@
+# test_site_builder.py
+import json
+from pathlib import Path
+from sefaria_translation import site_builder
+from sefaria_translation.site_builder import build_site
+
+
+def save_chapter(saved_dir: Path, gate_num: int, chapter_num: int, english: str) -> None:
+    data = {
+        "title": "Pardes Rimmonim",
+        "gate_num": gate_num,
+        "chapter_num": chapter_num,
+        "translation": [{"hebrew": "שלום", "english": english}],
+    }
+    path = saved_dir / f"pardes_rimmonim_{gate_num}_{chapter_num}.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+
+def test_rebuild_only_renders_changed_chapters(tmp_path: Path, monkeypatch):
+    saved_dir = tmp_path / "saved"
+    saved_dir.mkdir()
+    for gate_num, chapter_num in [(1, 1), (1, 2), (2, 1)]:
+        save_chapter(saved_dir, gate_num, chapter_num, f"peace {gate_num}.{chapter_num}")
+    site_dir = tmp_path / "site"
+
+    first = build_site(saved_dir=saved_dir, site_dir=site_dir, workers=2)
+    assert (first.rendered, first.skipped, first.index_pages) == (3, 0, 3)
+    page = site_dir / "pardes_rimmonim" / "Gate_1" / "pardes_rimmonim_1_2.html"
+    assert "peace 1.2" in page.read_text(encoding="utf-8")
+    book_index = (site_dir / "pardes_rimmonim" / "index.html").read_text(encoding="utf-8")
+    assert "Gate_2/index.html" in book_index
+
+    unchanged = build_site(saved_dir=saved_dir, site_dir=site_dir)
+    assert (unchanged.rendered, unchanged.skipped, unchanged.index_pages) == (0, 3, 0)
+
+    save_chapter(saved_dir, 1, 2, "fixed passage")
+    fixed = build_site(saved_dir=saved_dir, site_dir=site_dir)
+    assert (fixed.rendered, fixed.index_pages) == (1, 0)
+    assert "fixed passage" in page.read_text(encoding="utf-8")
+
+    monkeypatch.setattr(site_builder, "template_fingerprint", lambda: "new template")
+    assert build_site(saved_dir=saved_dir, site_dir=site_dir).rendered == 3
+
+
+def test_removed_chapters_lose_their_pages(tmp_path: Path):
+    saved_dir = tmp_path / "saved"
+    saved_dir.mkdir()
+    for gate_num, chapter_num in [(1, 1), (1, 2), (2, 1)]:
+        save_chapter(saved_dir, gate_num, chapter_num, "peace")
+    site_dir = tmp_path / "site"
+    build_site(saved_dir=saved_dir, site_dir=site_dir, workers=1)
+
+    (saved_dir / "pardes_rimmonim_1_2.json").unlink()
+    (saved_dir / "pardes_rimmonim_2_1.json").unlink()
+    rebuilt = build_site(saved_dir=saved_dir, site_dir=site_dir, workers=1)
+
+    title_dir = site_dir / "pardes_rimmonim"
+    assert rebuilt.removed == 3  # Two chapters and the index of gate 2
+    assert sorted(p.relative_to(title_dir).as_posix() for p in title_dir.rglob("*.html")) == [
+        "Gate_1/index.html",
+        "Gate_1/pardes_rimmonim_1_1.html",
+        "index.html",
+    ]
+    manifest = json.loads((title_dir / "manifest.json").read_text(encoding="utf-8"))
+    assert sorted(manifest) == ["Gate_1/index.html", "Gate_1/pardes_rimmonim_1_1.html", "index.html"]
+    assert "Gate_2" not in (title_dir / "index.html").read_text(encoding="utf-8")
+
+
+def test_disclaimer_uses_retrieval_date(tmp_path: Path):
+    saved_dir = tmp_path / "saved"
+    saved_dir.mkdir()
+    save_chapter(saved_dir, 1, 1, "peace")
+    data = json.loads((saved_dir / "pardes_rimmonim_1_1.json").read_text(encoding="utf-8"))
+    data["retrieved_at"] = "2024-03-05T10:00:00"
+    (saved_dir / "pardes_rimmonim_1_1.json").write_text(json.dumps(data), encoding="utf-8")
+    save_chapter(saved_dir, 1, 2, "peace")
+    site_dir = tmp_path / "site"
+    build_site(saved_dir=saved_dir, site_dir=site_dir, workers=1)
+
+    gate_dir = site_dir / "pardes_rimmonim" / "Gate_1"
+    assert "on 2024-03-05" in (gate_dir / "pardes_rimmonim_1_1.html").read_text(encoding="utf-8")
+    # Not recorded, so no date rather than the build date
+    assert "sefaria.org</a>." in (gate_dir / "pardes_rimmonim_1_2.html").read_text(encoding="utf-8")
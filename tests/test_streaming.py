@@ -0,0 +1,105 @@
+# test_streaming.py
+import threading
+import time
+import pytest
+from sefaria_translation.streaming import (
+    PartialFileWriter,
+    StreamConsumer,
+    StreamStalled,
+    StreamStats,
+    streaming_generation,
+)
+
+
+def fake_stream(delays: list[float]):
+    def stream(prompt: str):
+        for i, delay in enumerate(delays):
+            time.sleep(delay)
+            yield f"{i} "
+
+    return stream
+
+
+class RecordingConsumer(StreamConsumer):
+    def __init__(self) -> None:
+        self.deltas: list[str] = []
+        self.stats: list[StreamStats] = []
+
+    def on_delta(self, prompt: str, delta: str) -> None:
+        self.deltas.append(delta)
+
+    def on_complete(self, prompt: str, text: str, stats: StreamStats) -> None:
+        self.stats.append(stats)
+
+
+def test_streamed_text_is_delivered_and_returned():
+    consumer = RecordingConsumer()
+    generation = streaming_generation(fake_stream([0.05, 0, 0]), consumer)
+    assert generation("prompt") == "0 1 2 "
+    assert consumer.deltas == ["0 ", "1 ", "2 "]
+    assert consumer.stats[0].time_to_first_token >= 0.05
+    assert consumer.stats[0].deltas == 3
+
+
+def test_stalled_stream_is_cut():
+    generation = streaming_generation(fake_stream([0, 1]), stall_timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(StreamStalled):
+        generation("prompt")
+    assert time.monotonic() - start < 0.5
+
+
+def test_stalled_stream_is_closed():
+    class BlockingStream:
+        """Blocks in its first read until closed, like an HTTP response that stopped sending"""
+
+        def __init__(self) -> None:
+            self.closed = threading.Event()
+
+        def __iter__(self):
+            return self
+
+        def __next__(self) -> str:
+            self.closed.wait()
+            raise ConnectionError("response closed")
+
+        def close(self) -> None:
+            self.closed.set()
+
+    stream = BlockingStream()
+    generation = streaming_generation(lambda prompt: stream, stall_timeout=0.1)
+    with pytest.raises(StreamStalled):
+        generation("prompt")
+    assert stream.closed.is_set()
+
+
+def test_stalled_generator_cleans_up_when_it_resumes():
+    cleaned_up = threading.Event()
+
+    def stream(prompt: str):
+        try:
+            time.sleep(0.3)
+            yield "late"
+            yield "never read"
+        finally:
+            cleaned_up.set()
+
+    generation = streaming_generation(stream, stall_timeout=0.1)
+    with pytest.raises(StreamStalled):
+        generation("prompt")
+    assert cleaned_up.wait(timeout=2)
+
+
+def test_partial_file_is_removed_on_completion(tmp_path):
+    partial_texts: list[str] = []
+
+    class CheckingWriter(PartialFileWriter):
+        def on_delta(self, prompt: str, delta: str) -> None:
+            super().on_delta(prompt, delta)
+            partial_texts.append(self.partial_path(prompt).read_text(encoding="utf-8"))
+
+    writer = CheckingWriter(tmp_path)
+    generation = streaming_generation(lambda prompt: iter(["partial ", "output"]), writer)
+    assert generation("prompt") == "partial output"
+    assert partial_texts == ["partial ", "partial output"]
+    assert not writer.partial_path("prompt").exists()
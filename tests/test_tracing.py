@@ -0,0 +1,45 @@
+# test_tracing.py
+import json
+from pathlib import Path
+from sefaria_translation import chapter_translator, tracing
+from sefaria_translation.chapter_translator import ChapterTranslator
+from sefaria_translation.text_reference import ChapterReference
+from sefaria_translation.tracing import Tracer, annotate
+
+
+def test_spans_nest_and_are_written(tmp_path: Path):
+    tracer = Tracer(tmp_path / "spans.jsonl")
+    with tracer.span("chapter", gate=30) as chapter:
+        with tracer.span("llm_call"):
+            annotate(input_tokens=10, model="model-a")
+    annotate(ignored=True)  # Outside any span
+
+    lines = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    assert [line["name"] for line in lines] == ["llm_call", "chapter"]
+    assert lines[0]["parent_id"] == lines[1]["span_id"] == lines[0]["trace_id"]
+    assert lines[0]["input_tokens"] == 10 and lines[1]["gate"] == 30
+    assert chapter.child_attributes("llm_call")[0]["model"] == "model-a"
+    assert tracing.summarize(tmp_path / "spans.jsonl")["llm_call"]["input_tokens"] == 10
+
+
+def test_translator_keeps_call_metadata(tmp_path: Path, monkeypatch):
+    tracer = Tracer(tmp_path / "spans.jsonl")
+    monkeypatch.setattr(chapter_translator, "tracer", tracer)
+
+    def generation(prompt: str) -> str:
+        with tracer.span("llm_call"):
+            annotate(model="model-b", input_tokens=100, output_tokens=20, stop_reason="end_turn")
+        return "translation"
+
+    chapter = ["פסקה א", "פסקה ב", "פסקה ג"]
+    translator = ChapterTranslator(ChapterReference("Pardes_Rimmonim", 30, 1), chapter, generation)
+    translator.translate_chapter(max_concurrency=2)
+
+    calls = translator.call_metadata()
+    assert len(calls) == 3
+    assert all(call["model"] == "model-b" and call["input_tokens"] == 100 for call in calls)
+    assert translator.model_version == "model-b"
+    spans = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    groups = {s["span_id"] for s in spans if s["name"] == "translate_group"}
+    # The LLM calls run on executor threads but still nest under their group
+    assert {s["parent_id"] for s in spans if s["name"] == "llm_call"} == groups
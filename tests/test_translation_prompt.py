@@ -0,0 +1,65 @@
+# test_translation_prompt.py
+from sefaria_translation.text_reference import PassageReference
+from sefaria_translation.translation_prompt import (
+    ContextPolicy,
+    TranslationPrompt,
+    translation_prompt,
+)
+
+chapter = ["<b>השער הראשון</b>", "פסקה שניה", "פסקה שלישית"]
+
+
+def passage_prompt(passage_num: int) -> TranslationPrompt:
+    return translation_prompt(
+        PassageReference("Pardes_Rimmonim", 30, 1, passage_num), chapter
+    )
+
+
+def test_prompt_prefix_is_shared_across_passages():
+    prompts = [passage_prompt(n) for n in range(1, len(chapter) + 1)]
+    assert len({p.prefix for p in prompts}) == 1
+    assert all(chapter[0] in p.prefix for p in prompts)
+    assert '<passage n="2">פסקה שניה</passage>' in prompts[0].prefix
+
+
+def test_prompt_suffix_marks_the_passage():
+    prompt = passage_prompt(2)
+    assert "<passage-to-translate>פסקה שניה</passage-to-translate>" in prompt.suffix
+    assert "<passage-to-translate>" not in prompt.prefix
+    assert prompt == prompt.prefix + prompt.suffix
+
+
+def test_window_policy_sends_surrounding_passages():
+    long_chapter = [f"פסקה מספר {n}" for n in range(1, 101)]
+    policy = ContextPolicy(window=5, full_chapter_max_tokens=10)
+    prompts = [
+        translation_prompt(
+            PassageReference("Pardes_Rimmonim", 22, 1, n), long_chapter, policy
+        )
+        for n in range(1, 101)
+    ]
+    prompt = prompts[49]  # Passage 50
+    assert "פסקה מספר 45" in prompt.prefix and "פסקה מספר 55" in prompt.prefix
+    assert "פסקה מספר 30" not in prompt.prefix
+    assert '<passage n="45">פסקה מספר 45</passage>' in prompt.prefix
+    assert "Passage 50 of 100" in prompt.suffix
+    assert "<passage-to-translate>פסקה מספר 50</passage-to-translate>" in prompt.suffix
+    # Passages in the same block share a cacheable prefix
+    assert len({p.prefix for p in prompts}) == 20
+
+
+def test_small_chapters_keep_full_context():
+    policy = ContextPolicy(token_budget=1)
+    prompt = translation_prompt(
+        PassageReference("Pardes_Rimmonim", 30, 1, 1), chapter, policy
+    )
+    assert prompt.prefix == passage_prompt(1).prefix
+
+
+def test_token_budget_policy_stays_within_budget():
+    long_chapter = ["פסקה ארוכה למדי"] * 200
+    policy = ContextPolicy(token_budget=100, full_chapter_max_tokens=10)
+    for index in (0, 100, 199):
+        start, end = policy.context_range(long_chapter, index, index)
+        assert start <= index < end
+        assert 0 < end - start <= 100 // 6 + 1
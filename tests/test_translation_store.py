@@ -0,0 +1,71 @@
+# test_translation_store.py
+import json
+import pytest
+from pathlib import Path
+from sefaria_translation.translation_store import StoredChapter, TranslationStore
+
+TITLE = "Pardes_Rimmonim"
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> TranslationStore:
+    return TranslationStore(tmp_path / "translations.sqlite3")
+
+
+def test_save_replaces_whole_chapter(store: TranslationStore):
+    store.save_chapter(StoredChapter(TITLE, 30, 1, [("א", "a"), ("ב", "b"), ("ג", "c")]))
+    store.save_chapter(
+        StoredChapter(TITLE, 30, 1, [("א", "A")], model="model", metadata={"prompt_version": 2})
+    )
+    chapter = store.chapter(TITLE, 30, 1)
+    assert chapter.passages == [("א", "A")]
+    assert chapter.model == "model" and chapter.metadata == {"prompt_version": 2}
+    assert store.chapter(TITLE, 30, 2) is None
+
+
+def test_failed_bulk_save_commits_nothing(store: TranslationStore):
+    def chapters():
+        yield StoredChapter(TITLE, 1, 1, [("א", "a")])
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        store.save_chapters(chapters())
+    assert store.chapter_keys(TITLE) == set()
+
+
+def test_legacy_json_round_trip(store: TranslationStore, tmp_path: Path):
+    legacy_dir = tmp_path / "legacy"
+    legacy_dir.mkdir()
+    for chapter_num in (1, 2):
+        data = {
+            "title": "Pardes Rimmonim",
+            "gate_num": 4,
+            "chapter_num": chapter_num,
+            "translation": [{"hebrew": "שלום", "english": f"peace {chapter_num}"}],
+        }
+        if chapter_num == 2:
+            # Written by save_chapter_translation, with what if-newer and the site need
+            data = {
+                **{key: data[key] for key in ("title", "gate_num", "chapter_num")},
+                "model": "claude-test",
+                "prompt_version": 3,
+                "translation": [
+                    {"hebrew": "שלום", "english": "peace 2", "llm_call": {"calls": 1, "model": "claude-test"}},
+                    {"hebrew": "עולם", "english": "world"},
+                ],
+            }
+        (legacy_dir / f"pardes_rimmonim_4_{chapter_num}.json").write_text(
+            json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+    assert store.import_json(legacy_dir, TITLE) == 2
+    assert [c.key for c in store.load_title(TITLE, 4)] == [(4, 1), (4, 2)]
+
+    assert store.export_legacy_json(TITLE, tmp_path / "out") == 2
+    for path in legacy_dir.iterdir():
+        assert (tmp_path / "out" / path.name).read_text(encoding="utf-8") == path.read_text(encoding="utf-8")
+
+    assert store.export_translated_chapters(TITLE, tmp_path / "chapters") == 2
+    other = TranslationStore(tmp_path / "other.sqlite3")
+    assert other.import_json(tmp_path / "chapters", TITLE) == 2
+    assert other.chapter(TITLE, 4, 2).passages == [("שלום", "peace 2"), ("עולם", "world")]
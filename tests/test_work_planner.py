@@ -0,0 +1,65 @@
+# test_work_planner.py
+from pathlib import Path
+from sefaria_translation.work_planner import plan_title
+
+SHAPE = [[2, 3], [1, 4, 2]]
+
+
+def test_plan_reports_complete_partial_and_missing(tmp_path):
+    saved_dir = tmp_path / "saved"
+    checkpoint_dir = tmp_path / "checkpoints"
+    saved_dir.mkdir()
+    checkpoint_dir.mkdir()
+    (saved_dir / "pardes_rimmonim_1_1.json").write_text("{}")
+    (saved_dir / "pardes_rimmonim_2_3.json").write_text("{}")
+    (saved_dir / "other_title_1_2.json").write_text("{}")
+    (checkpoint_dir / "pardes_rimmonim_2_2.jsonl").write_text('{"a": 1}\n{"a": 2}\n')
+
+    plan = plan_title("Pardes_Rimmonim", saved_dir, checkpoint_dir, SHAPE)
+
+    statuses = {(u.section_num, u.chapter_num): u.status for u in plan.units}
+    assert statuses == {
+        (1, 1): "complete",
+        (1, 2): "missing",
+        (2, 1): "missing",
+        (2, 2): "partial",
+        (2, 3): "complete",
+    }
+    assert [(u.section_num, u.chapter_num) for u in plan.pending] == [
+        (2, 2),
+        (1, 2),
+        (2, 1),
+    ]
+    assert plan.pending_passages == 3 + 1 + 2
+    assert "2 complete, 1 partial, 2 missing" in plan.summary()
+
+
+def test_plan_of_saved_translations_in_repo():
+    from sefaria_translation.sefaria_api.fetch_sefaria_text import sdfsd
+
+    saved_dir = Path(__file__).parent.parent / "saved_translations_json" / "pardes_rimmonim"
+    plan = plan_title("Pardes_Rimmonim", saved_dir, saved_dir, sdfsd[0]["chapters"])
+    assert len(plan.with_status("complete")) == len(list(saved_dir.glob("*.json")))
+
+
+def test_plan_counts_store_and_section_layout(tmp_path):
+    from sefaria_translation.translation_store import StoredChapter, TranslationStore
+
+    store = TranslationStore(tmp_path / "translations.sqlite3")
+    store.save_chapter(StoredChapter("Pardes_Rimmonim", 1, 2, [("א", "a")] * 3))
+    store.close()
+    section_dir = tmp_path / "chapters" / "section_002"
+    section_dir.mkdir(parents=True)
+    (section_dir / "pardes_rimmonim_2_1.json").write_text("{}")
+
+    plan = plan_title(
+        "Pardes_Rimmonim",
+        tmp_path / "saved",
+        tmp_path / "checkpoints",
+        SHAPE,
+        chapters_dir=tmp_path / "chapters",
+        store_path=tmp_path / "translations.sqlite3",
+    )
+
+    complete = [(u.section_num, u.chapter_num) for u in plan.with_status("complete")]
+    assert complete == [(1, 2), (2, 1)]